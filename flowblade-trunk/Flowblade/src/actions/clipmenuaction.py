@@ -1024,6 +1024,9 @@ def _update_seq_link(data):
         # TODO: info
         return 
 
+    if projectaction.build_sequence(link_sequence) == False:
+        return
+
     # Create unique file path in hidden render folder
     folder = userfolders.get_render_dir()
     uuid_str = hashlib.md5(str(os.urandom(32)).encode('utf-8')).hexdigest()
@@ -248,12 +248,7 @@ class LoadThread(threading.Thread):
     def _exit_on_file_not_found_error(self, e, ticker):
         print("LoadThread.run() - FileProducerNotFoundError")
         self._error_stop(self.dialog, ticker)
-        primary_txt = _("Media asset was missing!")
-        secondary_txt = _("Path of missing asset:") + "\n   <b>" + e.value + "</b>\n\n" + \
-                        _("Relative search for replacement file in sub folders of project file failed.") + "\n\n" + \
-                        _("To load the project you will need to either:") + "\n" + \
-                        "\u2022" + " " + _("Open project in 'Media Relinker' tool to relink media assets to new files, or") + "\n" + \
-                        "\u2022" + " " + _("Place a file with the same exact name and path on the hard drive")
+        primary_txt, secondary_txt = _get_missing_media_texts(e)
         open_label = Gtk.Label(label=_("Open project in Media Relinker tool"))
         self.open_check = Gtk.CheckButton()
         self.open_check.set_active(True)
@@ -314,64 +309,70 @@ class AddMediaFilesThread(threading.Thread):
         succes_new_file = None
         filenames = self.filenames
 
-        for new_file in filenames:
-            (folder, file_name) = os.path.split(new_file)
+        # Write thumbnails for new files concurrently, add_media_file() below then uses them.
+        try:
+            projectdata.thumbnailer.prepare_images(self._get_thumbnail_files(filenames))
+
+            for new_file in filenames:
+                (folder, file_name) = os.path.split(new_file)
             
-            # Refuse to load animated gifs
-            extension = os.path.splitext(file_name)[1].lower()
-            if extension == ".gif":
-                 if Image.open(new_file).is_animated == True:
-                     anim_gif_name = file_name
-                     continue
-
-            if extension == "" or extension == None:
-                extension_refused.append(new_file)
-                continue
+                # Refuse to load animated gifs
+                extension = os.path.splitext(file_name)[1].lower()
+                if extension == ".gif":
+                     if Image.open(new_file).is_animated == True:
+                         anim_gif_name = file_name
+                         continue
+
+                if extension == "" or extension == None:
+                    extension_refused.append(new_file)
+                    continue
             
-            media_type = utils.get_media_type(new_file)
-            if media_type == appconsts.UNKNOWN:
-                extension_refused.append(new_file)
-                continue
+                media_type = utils.get_media_type(new_file)
+                if media_type == appconsts.UNKNOWN:
+                    extension_refused.append(new_file)
+                    continue
 
-            if PROJECT().media_file_exists(new_file):
-                duplicates.append(file_name)
-            else:
-                was_transcode_target_file = False 
+                if PROJECT().media_file_exists(new_file):
+                    duplicates.append(file_name)
+                else:
+                    was_transcode_target_file = False 
                 
-                # See if file to be transcoded on add.
-                if PROJECT().ingest_data != None and PROJECT().ingest_data.get_action() == appconsts.INGEST_ACTION_TRANSCODE_ALL:
-                    if media_type == appconsts.VIDEO or media_type == appconsts.IMAGE_SEQUENCE:
-                        was_transcode_target_file = True
-                if PROJECT().ingest_data != None and PROJECT().ingest_data.get_action() == appconsts.INGEST_ACTION_TRANSCODE_SELECTED:
-                    producer = mlt.Producer(PROJECT().profile, new_file)
-                    if producer.is_valid() == True:
-                        producer.probe()
-                        info = utils.get_file_producer_info(producer)
-                        if media_type == appconsts.VIDEO and info["progressive"] ==False:
+                    # See if file to be transcoded on add.
+                    if PROJECT().ingest_data != None and PROJECT().ingest_data.get_action() == appconsts.INGEST_ACTION_TRANSCODE_ALL:
+                        if media_type == appconsts.VIDEO or media_type == appconsts.IMAGE_SEQUENCE:
                             was_transcode_target_file = True
-
-                if was_transcode_target_file == True:
-                    try:
-                        transcode_media_object = PROJECT().add_transcode_target_media_file(new_file, None, target_bin)
-                        to_be_transcoded.append(transcode_media_object)
-                        audio_levels_render_files.append(new_file)
-                        succes_new_file = new_file
-                    except projectdata.ProducerNotValidError as err:
-                        GLib.idle_add(self._not_valid_producer, err)
+                    if PROJECT().ingest_data != None and PROJECT().ingest_data.get_action() == appconsts.INGEST_ACTION_TRANSCODE_SELECTED:
+                        producer = mlt.Producer(PROJECT().profile, new_file)
+                        if producer.is_valid() == True:
+                            producer.probe()
+                            info = utils.get_file_producer_info(producer)
+                            if media_type == appconsts.VIDEO and info["progressive"] ==False:
+                                was_transcode_target_file = True
+
+                    if was_transcode_target_file == True:
+                        try:
+                            transcode_media_object = PROJECT().add_transcode_target_media_file(new_file, None, target_bin)
+                            to_be_transcoded.append(transcode_media_object)
+                            audio_levels_render_files.append(new_file)
+                            succes_new_file = new_file
+                        except projectdata.ProducerNotValidError as err:
+                            GLib.idle_add(self._not_valid_producer, err)
                         
-                if was_transcode_target_file == False:
-                    # Main case, no transcode.
-                    try:
-                        PROJECT().add_media_file(new_file, self.compound_clip_name, target_bin)
-                        audio_levels_render_files.append(new_file)
-                        succes_new_file = new_file
-                    except projectdata.ProducerNotValidError as err:
-                        GLib.idle_add(self._not_valid_producer, err)
-
-            self.list_view_update_done = False
-            GLib.idle_add(self._list_view_update)
-            while self.list_view_update_done == False:
-                time.sleep(0.05)
+                    if was_transcode_target_file == False:
+                        # Main case, no transcode.
+                        try:
+                            PROJECT().add_media_file(new_file, self.compound_clip_name, target_bin)
+                            audio_levels_render_files.append(new_file)
+                            succes_new_file = new_file
+                        except projectdata.ProducerNotValidError as err:
+                            GLib.idle_add(self._not_valid_producer, err)
+
+                self.list_view_update_done = False
+                GLib.idle_add(self._list_view_update)
+                while self.list_view_update_done == False:
+                    time.sleep(0.05)
+        finally:
+            projectdata.thumbnailer.clear_prepared_images()
 
         add_count = len(filenames) - len(duplicates)
         project_event = projectdata.ProjectEvent(projectdata.EVENT_MEDIA_ADDED, str(add_count))
@@ -435,6 +436,26 @@ class AddMediaFilesThread(threading.Thread):
 
         self.post_load_update_done = True
         
+    def _get_thumbnail_files(self, filenames):
+        # Files that the loop in run() adds with add_media_file() and that need thumbnails.
+        # Videos and image sequences may be transcode targets if a transcode ingest action is set.
+        transcode_action = False
+        if PROJECT().ingest_data != None and PROJECT().ingest_data.get_action() in (appconsts.INGEST_ACTION_TRANSCODE_ALL, appconsts.INGEST_ACTION_TRANSCODE_SELECTED):
+            transcode_action = True
+
+        thumbnail_files = []
+        for new_file in filenames:
+            media_type = utils.get_media_type(new_file)
+            if media_type == appconsts.AUDIO or media_type == appconsts.UNKNOWN or PROJECT().media_file_exists(new_file):
+                continue
+            if transcode_action == True and (media_type == appconsts.VIDEO or media_type == appconsts.IMAGE_SEQUENCE):
+                continue
+            if os.path.splitext(new_file)[1].lower() == ".gif" and Image.open(new_file).is_animated == True:
+                continue
+            thumbnail_files.append(new_file)
+
+        return thumbnail_files
+
     def _change_cursor_watch(self):
         watch = Gdk.Cursor.new_for_display(Gdk.Display.get_default(), Gdk.CursorType.WATCH)
         gui.editor_window.window.get_window().set_cursor(watch)
@@ -502,6 +523,29 @@ class UpdateMediaLengthsThread(threading.Thread):
         
         print("Updating media lengths done.")
         
+def _get_missing_media_texts(e):
+    primary_txt = _("Media asset was missing!")
+    secondary_txt = _("Path of missing asset:") + "\n   <b>" + e.value + "</b>\n\n" + \
+                    _("Relative search for replacement file in sub folders of project file failed.") + "\n\n" + \
+                    _("To load the project you will need to either:") + "\n" + \
+                    "\u2022" + " " + _("Open project in 'Media Relinker' tool to relink media assets to new files, or") + "\n" + \
+                    "\u2022" + " " + _("Place a file with the same exact name and path on the hard drive")
+    return (primary_txt, secondary_txt)
+
+def build_sequence(seq):
+    """
+    Creates MLT objects for sequence if needed.
+    Returns False and shows info if media for sequence is missing.
+    """
+    try:
+        persistance.build_sequence(seq)
+    except persistance.FileProducerNotFoundError as e:
+        print("projectaction.build_sequence() - FileProducerNotFoundError")
+        primary_txt, secondary_txt = _get_missing_media_texts(e)
+        dialogutils.warning_message(primary_txt, secondary_txt, gui.editor_window.window)
+        return False
+    return True
+
 def _duplicates_info(duplicates):
     primary_txt = _("Media files already present in project were opened!")
     MAX_DISPLAYED_ITEMS = 3
@@ -1367,7 +1411,7 @@ def delete_media_files(force_delete=False):
     
     # Delete from project
     for file_id in file_ids:
-        PROJECT().media_files.pop(file_id)
+        PROJECT().remove_media_file(file_id)
 
     gui.media_list_view.fill_data_model()
     _enable_save()
@@ -1890,6 +1934,8 @@ def _do_create_sequence_compound_clip_from_selected(dialog, response_id, name_en
     (model, rows) = selection.get_selected_rows()
     row = max(rows[0])
     selected_sequence = PROJECT().sequences[row]
+    if build_sequence(selected_sequence) == False:
+        return
 
     render_player = renderconsumer.XMLRenderPlayer( write_file, _sequence_xml_compound_render_done_callback, 
                                                     (write_file, media_name), selected_sequence, 
@@ -1903,6 +1949,8 @@ def create_sequence_link_container_clip_from_selected():
     (model, rows) = selection.get_selected_rows()
     row = max(rows[0])
     selected_sequence = PROJECT().sequences[row]
+    if build_sequence(selected_sequence) == False:
+        return
 
     media_name = selected_sequence.name + _(" LINK")
 
@@ -1963,6 +2011,9 @@ def _do_create_sequence_link_container(dialog, response_id, data):
 
     dialog.destroy()
 
+    if build_sequence(selected_sequence) == False:
+        return
+
     # Create unique file path in hidden render folder
     folder = userfolders.get_render_dir()
     uuid_str = hashlib.md5(str(os.urandom(32)).encode('utf-8')).hexdigest()
@@ -2328,6 +2379,7 @@ def sequence_name_edited(cell, path, new_text, user_data):
     liststore, column = user_data
     liststore[path][column] = new_text
     PROJECT().sequences[int(path)].name = new_text
+    persistance.sequence_changed(PROJECT().sequences[int(path)])
     gui.editor_window.monitor_tc_info.monitor_source.set_text(new_text + " - ")
     
     _enable_save()
@@ -2435,6 +2487,9 @@ def _combine_sequences_dialog_callback(dialog, response_id, action_select, seq_s
     seq = selectable_seqs[seq_select.get_active()]
     
     dialog.destroy()
+
+    if build_sequence(seq) == False:
+        return
     
     if action == 0:
         _append_sequence(seq)
@@ -75,6 +75,7 @@ import editorlayout
 import editorpersistance
 import editorstate
 import editorwindow
+import filmstrip
 import glassbuttons
 import gmic
 import gtkevents
@@ -90,6 +91,7 @@ import loaddialog
 import medialinker
 import medialog
 import mediaplugin
+import memorycache
 import menubar
 import mltenv
 import mltfilters
@@ -152,6 +154,7 @@ BATCH_DIR = "batchrender/"
 autosave_timeout_id = -1
 disk_cache_timeout_id = -1
 loaded_autosave_file = None
+autosave_thread = None
 recovery_in_progress = False
 
 exit_timeout_id = -1
@@ -213,6 +216,9 @@ def main(root_path):
 
     editorpersistance.save()
 
+    memorycache.set_capacity_mb(editorpersistance.prefs.memory_cache_mb)
+    undo.set_limits(editorpersistance.prefs.undos_max, editorpersistance.prefs.undo_memory_mb)
+
     # Create app.
     app = FlowbladeApplication()
     global _app
@@ -752,6 +758,8 @@ def open_project(new_project):
 
     audiomonitoring.close_audio_monitor()
     audiowaveformrenderer.clear_cache()
+    memorycache.get_cache().clear_namespace(memorycache.CLIP_THUMBNAIL)
+    filmstrip.clear_cache()
 
     editorstate.project = new_project
     editorstate.media_view_filter = appconsts.SHOW_ALL_FILES
@@ -813,9 +821,14 @@ def _do_window_resized_update():
     updater.window_resized()
     
 def change_current_sequence(index):
+    # Sequence may have been left unbuilt on load, current sequence is kept if its media is missing.
+    if projectaction.build_sequence(editorstate.project.sequences[index]) == False:
+        return
+
     edit.do_gui_update = False  # This should not be necessary but we are doing this signal intention that GUI updates are disabled.
     
     stop_autosave()
+    persistance.sequence_changed(editorstate.project.c_seq) # Edits done when sequence was current are not all tracked.
     editorstate.project.c_seq = editorstate.project.sequences[index]
 
     # Inits widgets with current sequence data
@@ -925,8 +938,7 @@ def start_autosave():
     if autosave_delay_millis > 0:
         print("Autosave started...")
         autosave_timeout_id = GLib.timeout_add(autosave_delay_millis, do_autosave)
-        autosave_file = userfolders.get_cache_dir() + get_instance_autosave_file()
-        persistance.save_project(editorstate.PROJECT(), autosave_file)
+        do_autosave()
     else:
         print("Autosave disabled...")
         stop_autosave()
@@ -943,10 +955,28 @@ def stop_autosave():
     autosave_timeout_id = -1
 
 def do_autosave():
+    global autosave_thread
+    if autosave_thread != None and autosave_thread.is_alive():
+        # Previous write still in progress, writing same file again could replace newer data with older.
+        print("Autosave skipped, previous autosave still writing.")
+        return True
+
     autosave_file = userfolders.get_cache_dir() + get_instance_autosave_file()
-    persistance.save_project(editorstate.PROJECT(), autosave_file)
+    try:
+        autosave_thread = persistance.save_project_in_thread(editorstate.PROJECT(), autosave_file, _autosave_done)
+    except Exception as e:
+        print("Autosave failed creating save data:", e)
     return True
 
+def _autosave_done(autosave_file, error):
+    if error != None:
+        print("Autosave failed writing " + autosave_file + ":", error)
+    return False
+
+def _wait_autosave_write():
+    if autosave_thread != None:
+        autosave_thread.join()
+
 # ------------------------------------------------------- disk cache size check
 def check_disk_cache_size():
     GLib.source_remove(disk_cache_timeout_id)
@@ -1204,8 +1234,10 @@ def _app_destroy():
     # Close threads and stop mlt consumers
     editorstate.player.shutdown() # has ticker thread and player threads running
     audiomonitoring.close()
+    jobs.shutdown_render_workers()
 
-    # Delete autosave file
+    # Delete autosave file, an autosave being written would create it again.
+    _wait_autosave_write()
     try:
         os.remove(userfolders.get_cache_dir() + get_instance_autosave_file())
     except:
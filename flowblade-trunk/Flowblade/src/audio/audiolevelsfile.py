@@ -0,0 +1,209 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <https://github.com/jliljebl/flowblade/>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Audio levels cache file format.
+
+Levels are saved as one unsigned byte per frame after a fixed size header and
+read back by memory mapping the file, so opening a levels file does not
+create any per-frame Python objects.
+
+Header layout (little endian, 16 bytes):
+    magic (6 bytes), format version (uint16), frames count (uint32), mip levels count (uint8), reserved (3 bytes)
+
+After per-frame levels file has mip levels for zoomed out drawing, each mip level
+has max, min and RMS values for bins of MIP_BIN_FRAMES[i] frames, in that order.
+Version 1 files and old style files have no mip levels, application rewrites them
+in current format in background and uses per-frame levels until that is done.
+
+Files that do not start with magic bytes are old style pickled lists of floats.
+"""
+
+import array
+import math
+import mmap
+import struct
+
+import atomicfile
+import utils
+
+LEVELS_FILE_MAGIC = b"FBALVL"
+LEVELS_FILE_VERSION = 2
+
+_HEADER_FORMAT = "<6sHIB3x"
+HEADER_SIZE = struct.calcsize(_HEADER_FORMAT)
+
+LEVEL_MAX_VALUE = 255
+
+MIP_BIN_FRAMES = (4, 16, 64) # Frames per bin for each mip level, every level is built from previous one.
+
+
+class LevelsData:
+    """
+    Read only sequence of per-frame audio levels in range 0.0 - 1.0 backed by
+    a memory mapped levels file or bytes object.
+    """
+    def __init__(self, levels_bytes, mip_levels=None):
+        self.levels_bytes = levels_bytes # memoryview or bytes, one byte per frame
+        self.frame_level = MipLevel(1, levels_bytes, levels_bytes, levels_bytes)
+        self.mip_levels = mip_levels # list of MipLevel objects or None if not yet computed
+
+    def __len__(self):
+        return len(self.levels_bytes)
+
+    def __getitem__(self, frame):
+        return self.levels_bytes[frame] / LEVEL_MAX_VALUE
+
+    def get_bytes(self):
+        return bytes(self.levels_bytes)
+
+    def get_size_bytes(self):
+        size_bytes = len(self.levels_bytes)
+        if self.mip_levels != None:
+            for mip in self.mip_levels:
+                size_bytes += 3 * len(mip)
+        return size_bytes
+
+    def get_mip_level(self, frames_per_pixel):
+        """
+        Returns MipLevel with largest bins that are not wider then one pixel,
+        or per-frame levels if mip levels are not available.
+        """
+        mip_level = self.frame_level
+        if self.mip_levels == None:
+            return mip_level
+
+        for mip in self.mip_levels:
+            if mip.bin_frames <= frames_per_pixel:
+                mip_level = mip
+        return mip_level
+
+
+class MipLevel:
+    def __init__(self, bin_frames, max_bytes, min_bytes, rms_bytes):
+        self.bin_frames = bin_frames
+        self.max_bytes = max_bytes
+        self.min_bytes = min_bytes
+        self.rms_bytes = rms_bytes
+
+    def __len__(self):
+        return len(self.max_bytes)
+
+    def get_max(self, bin_index):
+        return self.max_bytes[bin_index] / LEVEL_MAX_VALUE
+
+    def get_min(self, bin_index):
+        return self.min_bytes[bin_index] / LEVEL_MAX_VALUE
+
+    def get_rms(self, bin_index):
+        return self.rms_bytes[bin_index] / LEVEL_MAX_VALUE
+
+
+def build_mip_levels(levels_bytes):
+    mip_levels = []
+    prev = MipLevel(1, levels_bytes, levels_bytes, levels_bytes)
+    for bin_frames in MIP_BIN_FRAMES:
+        factor = bin_frames // prev.bin_frames
+        prev_count = len(prev)
+        bins_count = -(-prev_count // factor)
+        max_bytes = bytearray(bins_count)
+        min_bytes = bytearray(bins_count)
+        rms_bytes = bytearray(bins_count)
+        for i in range(0, bins_count):
+            start = i * factor
+            end = min(start + factor, prev_count)
+            max_bytes[i] = max(prev.max_bytes[start:end])
+            min_bytes[i] = min(prev.min_bytes[start:end])
+            squares_sum = sum(v * v for v in prev.rms_bytes[start:end])
+            rms_bytes[i] = int(round(math.sqrt(squares_sum / (end - start))))
+
+        prev = MipLevel(bin_frames, bytes(max_bytes), bytes(min_bytes), bytes(rms_bytes))
+        mip_levels.append(prev)
+
+    return mip_levels
+
+
+def quantize_levels(frame_levels):
+    # Float levels to one byte per frame.
+    quantized = array.array("B", bytes(len(frame_levels)))
+    for i in range(0, len(frame_levels)):
+        val = frame_levels[i]
+        if val > 1.0:
+            val = 1.0
+        elif val < 0.0:
+            val = 0.0
+        quantized[i] = int(round(val * LEVEL_MAX_VALUE))
+    return quantized.tobytes()
+
+def write_levels_file(file_path, frame_levels, write_mip_levels=True):
+    write_levels_bytes_file(file_path, quantize_levels(frame_levels), write_mip_levels)
+
+def write_levels_bytes_file(file_path, levels_bytes, write_mip_levels=True):
+    # Partial files that get combined later do not need mip levels.
+    if write_mip_levels == True:
+        mip_levels = build_mip_levels(levels_bytes)
+    else:
+        mip_levels = []
+
+    header = struct.pack(_HEADER_FORMAT, LEVELS_FILE_MAGIC, LEVELS_FILE_VERSION, len(levels_bytes), len(mip_levels))
+    with atomicfile.AtomicFileWriter(file_path, "wb") as afw:
+        write_file = afw.get_file()
+        write_file.write(header)
+        write_file.write(levels_bytes)
+        for mip in mip_levels:
+            write_file.write(mip.max_bytes)
+            write_file.write(mip.min_bytes)
+            write_file.write(mip.rms_bytes)
+
+def load_levels_file(file_path):
+    """
+    Returns LevelsData object, old style pickled files are converted in memory.
+    """
+    with open(file_path, "rb") as f:
+        header_bytes = f.read(HEADER_SIZE)
+        if len(header_bytes) < HEADER_SIZE or header_bytes[0:len(LEVELS_FILE_MAGIC)] != LEVELS_FILE_MAGIC:
+            return LevelsData(quantize_levels(utils.unpickle(file_path)))
+
+        magic, version, frames_count, mip_levels_count = struct.unpack(_HEADER_FORMAT, header_bytes)
+        if version > LEVELS_FILE_VERSION:
+            raise ValueError("Unknown audio levels file version " + str(version) + " " + file_path)
+
+        if frames_count == 0:
+            return LevelsData(b"")
+
+        # Mapping stays valid after file is closed.
+        levels_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    data_view = memoryview(levels_map)
+    levels_bytes = data_view[HEADER_SIZE:HEADER_SIZE + frames_count]
+    if mip_levels_count == 0:
+        return LevelsData(levels_bytes)
+
+    mip_levels = []
+    offset = HEADER_SIZE + frames_count
+    for bin_frames in MIP_BIN_FRAMES[0:mip_levels_count]:
+        bins_count = -(-frames_count // bin_frames)
+        max_bytes = data_view[offset:offset + bins_count]
+        min_bytes = data_view[offset + bins_count:offset + 2 * bins_count]
+        rms_bytes = data_view[offset + 2 * bins_count:offset + 3 * bins_count]
+        mip_levels.append(MipLevel(bin_frames, max_bytes, min_bytes, rms_bytes))
+        offset += 3 * bins_count
+
+    return LevelsData(levels_bytes, mip_levels)
@@ -81,8 +81,14 @@ def _write_offsets(video_file_path, audio_file_path, completed_callback):
 
     FLOG = open(userfolders.get_cache_dir() + "log_clapperless", 'w')
     
+    # Audio envelopes are cached with project audio levels data so that files are decoded only once.
+    cache_args = []
+    envelopes_cache_dir = userfolders.get_audio_levels_dir()
+    if os.path.isdir(envelopes_cache_dir):
+        cache_args = ["--use-cache", "--cache-dir", envelopes_cache_dir]
+
     # clapperless.py computes offsets and writes them to file clapperless.OFFSETS_DATA_FILE
-    p = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeclapperless", video_file_path, audio_file_path, "--rate", fps, "--idstr", idstr], stdin=FLOG, stdout=FLOG, stderr=FLOG)
+    p = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeclapperless", video_file_path, audio_file_path, "--rate", fps, "--idstr", idstr] + cache_args, stdin=FLOG, stdout=FLOG, stderr=FLOG)
     p.wait()
     
     # Offsets are now available
@@ -98,13 +104,15 @@ def _read_offsets(idstr):
     file_lines = [x.rstrip("\n") for x in file_lines]
     
     _files_offsets = {}
+    _files_confidences = {}
     for line in file_lines:
         tokens = line.split(clapperless.MAGIC_SEPARATOR)
         _files_offsets[tokens[0]] = tokens[1]
+        _files_confidences[tokens[0]] = float(tokens[2])
     
     os.remove(offsets_file)
 
-    return _files_offsets
+    return (_files_offsets, _files_confidences)
 
 
 # ------------------------------------------------------- tline audio sync
@@ -196,9 +204,13 @@ def _tline_sync_offsets_computed_callback(clapperless_data):
     _compare_dialog_thread.compare_done()
     
     file_path_1, file_path_2, idstr = clapperless_data
-    files_offsets = _read_offsets(idstr)
+    files_offsets, files_confidences = _read_offsets(idstr)
     
     _tline_sync_data.media_offset_frames = int(float(files_offsets[file_path_2]) + 0.5)
+    _tline_sync_data.offset_confidence = files_confidences[file_path_2]
+    _tline_sync_data.offset_confidence_is_low = (_tline_sync_data.offset_confidence < clapperless.LOW_CONFIDENCE)
+    if _tline_sync_data.offset_confidence_is_low == True:
+        print("Low confidence for tline sync offset:", _tline_sync_data.offset_confidence)
     
     dialogs.tline_audio_sync_dialog(_tline_audio_sync_dialog_callback, _tline_sync_data)
 
@@ -250,6 +262,8 @@ class TLineSyncData:
     
         # Media offset from clapperless
         self.media_offset_frames = None
+        self.offset_confidence = None # normalized correlation of clips audio envelopes at offset, 1.0 is perfect match
+        self.offset_confidence_is_low = False # Offset is likely wrong, see clapperless.LOW_CONFIDENCE
         
         
 # ------------------------------------------------------- compound clip audio sync
@@ -300,9 +314,15 @@ def _compound_offsets_complete(data):
     _compare_dialog_thread.compare_done()
     
     video_file_path, audio_file_path, idstr = data
-    files_offsets = _read_offsets(idstr)
+    files_offsets, files_confidences = _read_offsets(idstr)
     sync_data = (files_offsets, data)
 
+    if files_confidences[audio_file_path] < clapperless.LOW_CONFIDENCE:
+        dialogutils.warning_message(_("Audio Sync match is unreliable!"), 
+                                    _("Media items may not have the same audio, check sync of created Compound Clip."),
+                                    gui.editor_window.window,
+                                    True)
+
     # lets's just set default name to something unique-ish 
     default_name = _("SYNC_CLIP_") +  str(datetime.date.today()) + "_" + time.strftime("%H%M%S") + ".xml"
     dialogs.compound_clip_name_dialog(_do_create_sync_compound_clip, default_name, _("Save Sync Compound Clip XML"), sync_data)
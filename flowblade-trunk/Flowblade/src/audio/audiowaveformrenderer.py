@@ -35,17 +35,20 @@ try:
     import mlt7 as mlt
 except:
     import mlt
+from collections import OrderedDict
+import multiprocessing
 import os
-import pickle
+import queue
 import subprocess
 import sys
 import threading
 
-import atomicfile
+import audiolevelsfile
 import callbackbridge
 import editorpersistance
 import editorstate
 import gui
+import memorycache
 import mltinit
 import mltprofiles
 import projectdatavault
@@ -60,35 +63,47 @@ FILE_SEPARATOR = "#&#file:"
 
 OLD_STYLE_DATA_LAYOUT_PROJECT = "#&#OLD_STYLE_DATA_LAYOUT_PROJECT#&#"
 
-_waveforms = {} # Memory cache for waveform data
+# Render process prints this followed by media file path to stdout when levels file for media is ready.
+LEVELS_FILE_DONE_MSG = "#&#levels_file_done:"
+
+LEVELS_RENDER_CHUNK_LENGTH = 5000 # Long media files are split into frame ranges of this length that are rendered in parallel.
+MAX_RENDER_PROCESSES = 8
+MAX_OPEN_PRODUCERS = 2 # Producers kept open in each render process, chunks of a file are mostly rendered one after another.
+
+# Worker process -> render process messages
+_CHUNKS_COUNT = 0
+_CHUNK_DONE = 1
+_CHUNK_FAILED = 2
+
 _queued_waveform_renders = [] # Media queued for render during one timeline repaint
 _render_already_requested = [] # Files that have been sent to rendering since last project load
+_mip_levels_upgrades = set() # Files which have levels files without mip levels being rewritten in background
 
 
 # ------------------------------------------------- waveform cache
 def clear_cache():
-    global _waveforms, _queued_waveform_renders, _render_already_requested
+    global _queued_waveform_renders, _render_already_requested
 
-    _waveforms = {}
+    memorycache.get_cache().clear_namespace(memorycache.WAVEFORM)
+    _mip_levels_upgrades.clear()
     _queued_waveform_renders = []
     _render_already_requested = []
 
 def get_waveform_data(clip):
-    # Return from memory if present
-    global _waveforms
-    try:
-        waveform = _waveforms[clip.path]
+    # Return from memory if present, waveforms dropped from memory cache get reloaded from disk.
+    waveform = memorycache.get_cache().get((memorycache.WAVEFORM, clip.path))
+    if waveform != None:
         return waveform
-    except:
-        pass
         
     # Load from disk if found, otherwise queue for levels render
     levels_file_path = _get_levels_file_path(clip.path, editorstate.PROJECT().profile)
     if os.path.isfile(levels_file_path):
         if os.path.getsize(levels_file_path) == 0:
              print( "Size zero Audio levels file, this is error!", levels_file_path)
-        waveform = utils.unpickle(levels_file_path)
-        _waveforms[clip.path] = waveform
+        waveform = audiolevelsfile.load_levels_file(levels_file_path)
+        memorycache.get_cache().put((memorycache.WAVEFORM, clip.path), waveform, waveform.get_size_bytes())
+        if waveform.mip_levels == None:
+            _launch_levels_file_upgrade(clip.path, levels_file_path, waveform)
         return waveform
     else:
         # We keep queueing everything that does not have waveform data.
@@ -99,6 +114,35 @@ def get_waveform_data(clip):
 
         return None
     
+def _launch_levels_file_upgrade(clip_path, levels_file_path, waveform):
+    # Building mip levels is too slow to do when drawing timeline.
+    if clip_path in _mip_levels_upgrades:
+        return
+    _mip_levels_upgrades.add(clip_path)
+
+    upgrade_thread = threading.Thread(target=_upgrade_levels_file, args=(clip_path, levels_file_path, waveform))
+    upgrade_thread.daemon = True
+    upgrade_thread.start()
+
+def _upgrade_levels_file(clip_path, levels_file_path, waveform):
+    try:
+        audiolevelsfile.write_levels_bytes_file(levels_file_path, waveform.get_bytes())
+        upgraded_waveform = audiolevelsfile.load_levels_file(levels_file_path)
+    except Exception as e:
+        print("Audio levels file could not be rewritten with mip levels,", levels_file_path, e)
+        upgraded_waveform = audiolevelsfile.LevelsData(waveform.get_bytes(), audiolevelsfile.build_mip_levels(waveform.get_bytes()))
+
+    GLib.idle_add(_levels_file_upgraded, clip_path, upgraded_waveform)
+
+def _levels_file_upgraded(clip_path, waveform):
+    if not(clip_path in _mip_levels_upgrades):
+        return False # Cache was cleared after upgrade was launched.
+    _mip_levels_upgrades.discard(clip_path)
+
+    memorycache.get_cache().put((memorycache.WAVEFORM, clip_path), waveform, waveform.get_size_bytes())
+    callbackbridge.updater_repaint_tline()
+    return False
+
 # ------------------------------------------------- launching render
 def launch_queued_renders():
     # Render files that were not found when timeline was displayed
@@ -156,8 +200,19 @@ class AudioRenderLaunchThread(threading.Thread):
 
         self.process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeaudiorender", \
                   self.rendered_media, self.profile_desc, respaths.ROOT_PATH, project_data_path], \
-                  stdin=FLOG, stdout=FLOG, stderr=FLOG)
+                  stdin=FLOG, stdout=subprocess.PIPE, stderr=FLOG, universal_newlines=True)
+
+        # Repaint timeline every time a levels file gets completed so that
+        # waveforms appear progressively instead of after all files are done.
+        for line in self.process.stdout:
+            if line.startswith(LEVELS_FILE_DONE_MSG):
+                Gdk.threads_add_timeout(GLib.PRIORITY_HIGH_IDLE, 10, _repaint)
+            else:
+                FLOG.write(line)
+                FLOG.flush()
+
         self.process.wait()
+        FLOG.close()
 
         Gdk.threads_add_timeout(GLib.PRIORITY_HIGH_IDLE, 10, _repaint)
 
@@ -200,36 +255,155 @@ def main(root_path):
     
     files = files_paths.split(FILE_SEPARATOR)
 
+    _render_levels_files(files, profile_desc)
+
+
+def _render_levels_files(files, profile_desc):
+    # Files are put in a shared task queue and worker processes split long files into
+    # frame range chunks that are pushed back in the queue, so that both many files and 
+    # single long files get rendered using all workers.
+    # Chunk counts are kept per path, so same file must not be rendered twice.
+    files = list(OrderedDict.fromkeys(files))
+
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
     for f in files:
-       t = WaveformCreator(f, profile_desc)
-       t.start()
-       t.join()
+        task_queue.put((f, 0, 0, None))
+
+    workers = []
+    for i in range(_get_render_processes_count()):
+        p = multiprocessing.Process(target=_levels_render_process_launch, args=(profile_desc, task_queue, result_queue))
+        workers.append(p)
+        p.start()
+
+    chunks_counts = {}
+    chunks_done = {}
+    failed = set()
+    files_left = set(files)
+    while len(files_left) > 0:
+        try:
+            msg, clip_path, value = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            # If all workers have crashed no more results are coming.
+            if not any(p.is_alive() for p in workers):
+                print("All audio levels render processes exited with files left:", files_left)
+                break
+            continue
 
+        # Chunks rendered by other workers can be reported before chunks count.
+        if msg == _CHUNKS_COUNT:
+            chunks_counts[clip_path] = value
+        else:
+            if msg == _CHUNK_FAILED:
+                failed.add(clip_path)
+                if value == 0 and not clip_path in chunks_counts:
+                    chunks_counts[clip_path] = 1 # Failed when opening file, no more chunks coming.
+            chunks_done[clip_path] = chunks_done.get(clip_path, 0) + 1
+
+        if clip_path in files_left and chunks_done.get(clip_path, 0) == chunks_counts.get(clip_path):
+            files_left.discard(clip_path)
+            _levels_file_chunks_done(clip_path, profile_desc, chunks_counts[clip_path], clip_path in failed)
+
+    for p in workers:
+        task_queue.put(None)
+    for p in workers:
+        p.join()
+
+def _get_render_processes_count():
+    # Leave one core for GUI, single files get their chunks rendered in parallel
+    # so we may use all processes even for one file.
+    processes = multiprocessing.cpu_count() - 1
+    if processes < 1:
+        processes = 1
+    if processes > MAX_RENDER_PROCESSES:
+        processes = MAX_RENDER_PROCESSES
+    return processes
+
+def _levels_file_chunks_done(clip_path, profile_desc, chunks_count, render_failed):
+    profile = mltprofiles.get_profile(profile_desc)
+    file_cache_path = _get_levels_file_path(clip_path, profile)
+
+    levels_bytes = bytearray()
+    for chunk_index in range(0, chunks_count):
+        chunk_path = _get_chunk_file_path(file_cache_path, chunk_index)
+        if render_failed == False:
+            levels_bytes.extend(audiolevelsfile.load_levels_file(chunk_path).get_bytes())
+        if os.path.isfile(chunk_path):
+            os.remove(chunk_path)
+
+    if render_failed == True:
+        print("Audio levels render failed for", clip_path)
+        return
 
-class WaveformCreator(threading.Thread):    
+    audiolevelsfile.write_levels_bytes_file(file_cache_path, bytes(levels_bytes))
+
+    print(LEVELS_FILE_DONE_MSG + clip_path, flush=True)
+
+def _get_chunk_file_path(file_cache_path, chunk_index):
+    return file_cache_path + ".part" + str(chunk_index)
+
+def _levels_render_process_launch(profile_desc, task_queue, result_queue):
+    waveform_creators = OrderedDict() # clip_path -> WaveformCreator, most recently used last
+    while True:
+        task = task_queue.get()
+        if task == None:
+            return
+        clip_path, chunk_index, start_frame, end_frame = task
+        try:
+            try:
+                wc = waveform_creators[clip_path]
+                waveform_creators.move_to_end(clip_path)
+            except KeyError:
+                wc = WaveformCreator(clip_path, profile_desc)
+                waveform_creators[clip_path] = wc
+                if len(waveform_creators) > MAX_OPEN_PRODUCERS:
+                    waveform_creators.popitem(last=False)
+
+            # First task for a file has no end frame, split file into chunks and 
+            # put the rest of chunks back in queue for any worker to pick up.
+            if end_frame == None:
+                chunks_count = max(1, -(-wc.clip_media_length // LEVELS_RENDER_CHUNK_LENGTH))
+                result_queue.put((_CHUNKS_COUNT, clip_path, chunks_count))
+                for i in range(1, chunks_count):
+                    chunk_start = i * LEVELS_RENDER_CHUNK_LENGTH
+                    chunk_end = min(chunk_start + LEVELS_RENDER_CHUNK_LENGTH, wc.clip_media_length)
+                    task_queue.put((clip_path, i, chunk_start, chunk_end))
+                end_frame = min(LEVELS_RENDER_CHUNK_LENGTH, wc.clip_media_length)
+
+            wc.render_range(chunk_index, start_frame, end_frame)
+
+            # Last chunk of file is usually rendered last.
+            if end_frame == wc.clip_media_length:
+                del waveform_creators[clip_path]
+
+            result_queue.put((_CHUNK_DONE, clip_path, chunk_index))
+        except Exception as e:
+            print("Audio levels render failed for", clip_path, "chunk", chunk_index, e)
+            waveform_creators.pop(clip_path, None)
+            result_queue.put((_CHUNK_FAILED, clip_path, chunk_index))
+
+
+class WaveformCreator:
     def __init__(self, clip_path, profile_desc):
-        threading.Thread.__init__(self)
         self.clip_path = clip_path
         profile = mltprofiles.get_profile(profile_desc)
         self.temp_clip = self._get_temp_producer(clip_path, profile)
         self.file_cache_path =_get_levels_file_path(clip_path, profile)
         self.last_rendered_frame = 0
 
-    def run(self):
-        frame_levels = [None] * self.clip_media_length 
+    def render_range(self, chunk_index, start_frame, end_frame):
+        frame_levels = [None] * (end_frame - start_frame)
 
-        for frame in range(0, len(frame_levels)):
+        for frame in range(start_frame, end_frame):
             self.temp_clip.seek(frame)
             mlt.frame_get_waveform(self.temp_clip.get_frame(), 10, 50)
             val = self.levels.get(RIGHT_CHANNEL)
             if val == None:
                 val = 0.0
-            frame_levels[frame] = float(val)
+            frame_levels[frame - start_frame] = float(val)
             self.last_rendered_frame = frame
 
-        with atomicfile.AtomicFileWriter(self.file_cache_path, "wb") as afw:
-            write_file = afw.get_file()
-            pickle.dump(frame_levels, write_file)
+        audiolevelsfile.write_levels_file(_get_chunk_file_path(self.file_cache_path, chunk_index), frame_levels, False)
 
     def _get_temp_producer(self, clip_path, profile):
         temp_producer = mlt.Producer(profile, str(clip_path))
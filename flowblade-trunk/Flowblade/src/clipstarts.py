@@ -0,0 +1,135 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <https://github.com/jliljebl/flowblade/>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Clip start frame tables for sequence tracks.
+
+MLT Playlist clip_start() and get_clip_index_at() walk all preceding clips on every call.
+Sequence tracks replace them with functions here that use a cached table of cumulative
+clip lengths computed from python side 'track.clips' list. Table is dropped
+when clips on track change and is created again when next needed.
+
+Can also be run as a stand-alone script to benchmark table lookups against
+walking clips.
+"""
+
+import bisect
+import itertools
+import random
+import sys
+import time
+
+
+def clips_changed(track):
+    track.clip_starts = None
+
+def get_clip_start(track, index):
+    """
+    Returns start frame of clip at index, same values as mlt.Playlist.clip_start().
+    """
+    clip_starts = _get_clip_starts(track)
+    if index < 0:
+        return 0
+    if index >= len(clip_starts):
+        return clip_starts[-1] # Track length
+    return clip_starts[index]
+
+def get_clip_index_at(track, frame):
+    """
+    Returns index of clip at frame or clips count if frame is after last clip,
+    same values as mlt.Playlist.get_clip_index_at().
+    """
+    clip_starts = _get_clip_starts(track)
+    # First clip that ends after frame.
+    return bisect.bisect_right(clip_starts, frame, 1) - 1
+
+def _get_clip_starts(track):
+    # clip_starts[i] is start frame of clip i and last item is track length.
+    if track.clip_starts == None:
+        lengths = (clip.clip_out - clip.clip_in + 1 for clip in track.clips) # +1, end inclusive
+        track.clip_starts = [0] + list(itertools.accumulate(lengths))
+    return track.clip_starts
+
+
+# ------------------------------------------------------- command-line mode for benchmarking
+class _BenchmarkClip:
+    def __init__(self, length):
+        self.clip_in = 0
+        self.clip_out = length - 1
+
+
+class _BenchmarkTrack:
+    def __init__(self, clips_count):
+        self.clips = [_BenchmarkClip(random.randint(1, 250)) for i in range(0, clips_count)]
+        self.clip_starts = None
+
+    def walk_clip_start(self, index):
+        start = 0
+        for clip in self.clips[0:index]:
+            start += clip.clip_out - clip.clip_in + 1
+        return start
+
+    def walk_clip_index_at(self, frame):
+        end = 0
+        for i in range(0, len(self.clips)):
+            clip = self.clips[i]
+            end += clip.clip_out - clip.clip_in + 1
+            if frame < end:
+                return i
+        return len(self.clips)
+
+def main():
+    clips_count = 10000
+    if len(sys.argv) == 2:
+        clips_count = int(sys.argv[1])
+    queries_count = 1000
+    edit_interval = 50 # Table is dropped after this many queries to simulate edits.
+
+    track = _BenchmarkTrack(clips_count)
+    track_length = track.walk_clip_start(clips_count)
+    indexes = [random.randint(0, clips_count - 1) for i in range(0, queries_count)]
+    frames = [random.randint(0, track_length - 1) for i in range(0, queries_count)]
+
+    start_time = time.perf_counter()
+    walk_starts = [track.walk_clip_start(index) for index in indexes]
+    walk_indexes = [track.walk_clip_index_at(frame) for frame in frames]
+    walk_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    table_starts = []
+    table_indexes = []
+    for i in range(0, queries_count):
+        if i % edit_interval == 0:
+            clips_changed(track)
+        table_starts.append(get_clip_start(track, indexes[i]))
+        table_indexes.append(get_clip_index_at(track, frames[i]))
+    table_time = time.perf_counter() - start_time
+
+    if walk_starts != table_starts or walk_indexes != table_indexes:
+        sys.stderr.write("clip start table gives different results than walking clips\n")
+        sys.exit(1)
+
+    print("clips:", clips_count, "queries:", 2 * queries_count, "table rebuilt every", edit_interval, "queries")
+    print("walking clips: %.4f s" % walk_time)
+    print("clip start table: %.4f s" % table_time)
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
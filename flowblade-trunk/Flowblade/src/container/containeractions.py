@@ -1214,7 +1214,7 @@ class CommandLauncherThread(threading.Thread):
         for arg in self.args:
             command_list.append(arg)
 
-        process = subprocess.Popen(command_list)
+        process = jobs.start_status_channel_process(command_list)
         process.wait()
 
 class ProcessCommandListRunner(threading.Thread):
@@ -1223,6 +1223,6 @@ class ProcessCommandListRunner(threading.Thread):
         self.command_list = command_list
         
     def run(self):
-        process = subprocess.Popen(self.command_list)
+        process = jobs.start_status_channel_process(self.command_list)
         process.wait()
         
\ No newline at end of file
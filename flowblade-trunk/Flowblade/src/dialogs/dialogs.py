@@ -1845,9 +1845,18 @@ def tline_audio_sync_dialog(callback, data):
     action_label_text = _("To audio sync clips you need move action origin clip by ") + str(data.clip_tline_media_offset - data.media_offset_frames) + _(" frames.")
     action_label = Gtk.Label(label=action_label_text)
     
+    label_text = _("<b>Audio Match Confidence</b> is ") + str(int(round(data.offset_confidence * 100))) + "%."
+    confidence_label = Gtk.Label(label=label_text)
+    confidence_label.set_use_markup(True)
+    
     panel_vbox = Gtk.VBox(False, 2)
     panel_vbox.pack_start(guiutils.get_left_justified_box([media_offsets_label]), False, False, 0)
     panel_vbox.pack_start(guiutils.get_left_justified_box([tline_offsets_label]), False, False, 0)
+    panel_vbox.pack_start(guiutils.get_left_justified_box([confidence_label]), False, False, 0)
+    if data.offset_confidence_is_low == True:
+        warning_icon = Gtk.Image.new_from_icon_name("dialog-warning", Gtk.IconSize.BUTTON)
+        warning_label = Gtk.Label(label=_("Clips may not have the same audio, computed offset is likely wrong."))
+        panel_vbox.pack_start(guiutils.get_left_justified_box([warning_icon, guiutils.pad_label(4, 4), warning_label]), False, False, 0)
 
     panel_vbox.pack_start(guiutils.get_pad_label(24, 12), False, False, 0)
     panel_vbox.pack_start(guiutils.get_left_justified_box([action_label]), False, False, 0)
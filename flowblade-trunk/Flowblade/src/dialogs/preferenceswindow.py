@@ -30,7 +30,9 @@ import editorpersistance
 import gui
 import guiutils
 import gtkbuilder
+import memorycache
 import mltprofiles
+import undo
 import utilsgtk
 
 
@@ -81,6 +83,8 @@ def _preferences_dialog_callback(dialog, response_id, all_widgets):
     if response_id == Gtk.ResponseType.ACCEPT:
         editorpersistance.update_prefs_from_widgets(all_widgets)
         editorpersistance.save()
+        memorycache.set_capacity_mb(editorpersistance.prefs.memory_cache_mb)
+        undo.set_limits(editorpersistance.prefs.undos_max, editorpersistance.prefs.undo_memory_mb)
         dialog.destroy()
         primary_txt = _("Restart required for some setting changes to take effect.")
         secondary_txt = _("If requested change is not in effect, restart application.")
@@ -109,6 +113,11 @@ def _general_options_panel():
     undo_max_spin.set_adjustment(spin_adj)
     undo_max_spin.set_numeric(True)
 
+    undo_memory_adj = Gtk.Adjustment(value=prefs.undo_memory_mb, lower=editorpersistance.UNDO_MEMORY_MB_MIN, upper=editorpersistance.UNDO_MEMORY_MB_MAX, step_increment=64)
+    undo_memory_spin = Gtk.SpinButton(adjustment=undo_memory_adj)
+    undo_memory_spin.set_numeric(True)
+    undo_memory_spin.set_tooltip_text(_("Oldest undos are removed when memory used by removed clips and effects exceeds this"))
+
     autosave_combo = Gtk.ComboBoxText()
     # Aug-2019 - SvdB - AS - This is now initialized in app.main
     # Using editorpersistance.prefs.AUTO_SAVE_OPTS as source
@@ -146,6 +155,7 @@ def _general_options_panel():
     row1 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Default Profile:")), default_profile_combo, PREFERENCES_LEFT))
     row2 = _row(guiutils.get_checkbox_row_box(open_in_last_opened_check, Gtk.Label(label=_("Remember last media directory"))))
     row3 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Undo stack size:")), undo_max_spin, PREFERENCES_LEFT))
+    row4 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Undo stack memory (MB):")), undo_memory_spin, PREFERENCES_LEFT))
     row5 = _row(guiutils.get_checkbox_row_box(open_in_last_rendered_check, Gtk.Label(label=_("Remember last render directory"))))
     row6 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Autosave for crash recovery every:")), autosave_combo, PREFERENCES_LEFT))
     row9 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Media look-up order on load:")), load_order_combo, PREFERENCES_LEFT))
@@ -159,6 +169,7 @@ def _general_options_panel():
     vbox.pack_start(row10, False, False, 0)
     vbox.pack_start(row5, False, False, 0)
     vbox.pack_start(row3, False, False, 0)
+    vbox.pack_start(row4, False, False, 0)
     vbox.pack_start(row9, False, False, 0)
     vbox.pack_start(row11, False, False, 0)
     vbox.pack_start(Gtk.Label(), True, True, 0)
@@ -167,7 +178,8 @@ def _general_options_panel():
 
     # Aug-2019 - SvdB - AS - Added autosave_combo
     return vbox, ( default_profile_combo, open_in_last_opened_check, open_in_last_rendered_check,
-                    undo_max_spin, load_order_combo, autosave_combo, render_folder_select, disk_cache_warning_combo)
+                    undo_max_spin, load_order_combo, autosave_combo, render_folder_select, disk_cache_warning_combo,
+                    undo_memory_spin)
 
 def _edit_prefs_panel():
     prefs = editorpersistance.prefs
@@ -472,24 +484,31 @@ def _performance_panel():
     perf_drop_frames = Gtk.CheckButton()
     perf_drop_frames.set_active(prefs.perf_drop_frames)
 
+    cache_adj = Gtk.Adjustment(value=prefs.memory_cache_mb, lower=editorpersistance.MEMORY_CACHE_MB_MIN, upper=editorpersistance.MEMORY_CACHE_MB_MAX, step_increment=32)
+    memory_cache_spin = Gtk.SpinButton(adjustment=cache_adj)
+    memory_cache_spin.set_numeric(True)
+
     # Tooltips
     perf_render_threads.set_tooltip_text(_("Between 1 and the number of CPU Cores"))
     perf_drop_frames.set_tooltip_text(_("Allow Frame Dropping for real-time rendering, when needed"))
+    memory_cache_spin.set_tooltip_text(_("Memory used to keep audio waveforms and timeline thumbnails loaded"))
 
     # Layout
     row0 = _row(guiutils.get_left_justified_box([warning_icon, guiutils.pad_label(4, 4), warning_label]))
     row1 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Render Threads:")), perf_render_threads, PREFERENCES_LEFT))
     row2 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Render Interpolation:")), render_interpolation_combo, PREFERENCES_LEFT))
+    row3 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Waveforms and Thumbnails Memory Cache (MB):")), memory_cache_spin, PREFERENCES_LEFT))
 
     vbox = Gtk.VBox(False, 2)
     vbox.pack_start(row0, False, False, 0)
     vbox.pack_start(row1, False, False, 0)
     vbox.pack_start(row2, False, False, 0)
+    vbox.pack_start(row3, False, False, 0)
     vbox.pack_start(Gtk.Label(), True, True, 0)
 
     guiutils.set_margins(vbox, 12, 0, 12, 12)
 
-    return vbox, (perf_render_threads, render_interpolation_combo)
+    return vbox, (perf_render_threads, render_interpolation_combo, memory_cache_spin)
 
 def _jog_shuttle_panel():
     prefs = editorpersistance.prefs
@@ -44,6 +44,7 @@ import guicomponents
 import guiutils
 import gtkbuilder
 import persistance
+import projectdata
 import projectdatavault
 import userfolders
 import utils
@@ -937,6 +938,7 @@ class ProjectCloneWindow(Gtk.Window):
                     mediafile.second_file_path = self.get_clone_data_store_path(mediafile.second_file_path, source_data_folder, clone_project_data_folder_path)
                 if mediafile.container_data != None:
                     mediafile.container_data.unrendered_media = self.get_clone_data_store_path(mediafile.container_data.unrendered_media, source_data_folder, clone_project_data_folder_path)
+            projectdata.media_paths_changed()
 
             # Clips.
             for seq in cloneproject.sequences:
@@ -40,6 +40,7 @@ from editorstate import PROJECT
 import mltfilters
 import movemodes
 import mediaplugin
+import persistance
 import resync
 import trackaction
 import trimmodes
@@ -64,6 +65,7 @@ def append_clip(track, clip, clip_in, clip_out):
     clip.clip_out = clip_out
     track.clips.append(clip) # py
     track.append(clip, clip_in, clip_out) # mlt
+    track.sequence.clip_added_to_track(clip, track)
     resync.clip_added_to_timeline(clip, track)
 
 def _insert_clip(track, clip, index, clip_in, clip_out):
@@ -74,6 +76,7 @@ def _insert_clip(track, clip, index, clip_in, clip_out):
     clip.clip_out = clip_out
     track.clips.insert(index, clip) # py
     track.insert(clip, index, clip_in, clip_out) # mlt
+    track.sequence.clip_added_to_track(clip, track)
     resync.clip_added_to_timeline(clip, track)
 
 def _insert_blank(track, index, length):
@@ -84,6 +87,7 @@ def _insert_blank(track, index, length):
     blank_clip.clip_out = length - 1 # -1, end inclusive
     blank_clip.is_blanck_clip = True
     track.clips.insert(index, blank_clip)
+    track.sequence.clip_added_to_track(blank_clip, track)
     
 def _remove_clip(track, index):
     """
@@ -91,6 +95,7 @@ def _remove_clip(track, index):
     """
     track.remove(index)
     clip = track.clips.pop(index)
+    track.sequence.clip_removed_from_track(clip, track)
     resync.clip_removed_from_timeline(clip)
     
     return clip
@@ -131,6 +136,7 @@ def _add_blank_to_py(track, index, length):
     blank_clip.clip_out = length - 1 # -1, end inclusive
     blank_clip.is_blanck_clip = True
     track.clips.insert(index, blank_clip)
+    track.sequence.clip_added_to_track(blank_clip, track)
     return blank_clip
 
 # --------------------------------- util methods
@@ -367,6 +373,7 @@ class EditAction:
         undo.force_revert_if_cyclic_seq_links(PROJECT())
         
     def undo(self):
+        persistance.sequence_changed(current_sequence())
         resync.start_edit()
         
         PLAYER().stop_playback()
@@ -389,6 +396,7 @@ class EditAction:
 
         
     def redo(self):
+        persistance.sequence_changed(current_sequence())
         resync.start_edit()
         
         PLAYER().stop_playback()
@@ -26,6 +26,11 @@ import gi
 from gi.repository import GLib
 
 import copy
+try:
+    import mlt7 as mlt
+except:
+    import mlt
+import sys
 import time
 #import traceback
 
@@ -42,8 +47,18 @@ _first_action = None
 set_post_undo_redo_edit_mode = None # This is set at startup to avoid circular imports.
 repaint_tline = None
 
-# Max stack size.
+# Max stack size and memory budget, set from preferences with set_limits().
 MAX_UNDOS = 35
+MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+
+# Memory used by MLT objects is not visible to Python, these are rough per object estimates.
+# Producers of removed media clips keep decoder contexts and buffers alive.
+MLT_PRODUCER_SIZE_ESTIMATE = 1024 * 1024
+MLT_SERVICE_SIZE_ESTIMATE = 16 * 1024 # blanks, filters, transitions
+
+# Eviction counters for get_stats().
+_evictions = 0
+_evicted_bytes = 0
 
 # EditActions are placed in this stack after their do_edit()
 # method has been called.
@@ -72,6 +87,12 @@ def clear_undos():
     undo_stack = []
     index = 0
 
+def set_limits(max_undos, memory_budget_mb):
+    global MAX_UNDOS, MEMORY_BUDGET_BYTES
+    MAX_UNDOS = int(max_undos)
+    MEMORY_BUDGET_BYTES = int(memory_budget_mb) * 1024 * 1024
+    _enforce_limits()
+
 def set_post_undo_redo_callback(undo_redo_callback):
     global set_post_undo_redo_edit_mode
     set_post_undo_redo_edit_mode = undo_redo_callback
@@ -91,18 +112,16 @@ def register_edit(undo_edit):
     # New edit action clears all redos(== undos after index)
     if index != len(undo_stack) and (len(undo_stack) != 0):
         del undo_stack[index:]
- 
-    # Keep stack in size, if too big remove undo at 0
-    if len(undo_stack) > MAX_UNDOS:
-        del undo_stack[0]
-        index = index - 1
-        # TODO: clear from _editor_for_property all edtable_property objects and editors 
-        # not referenced in current undo stacknot referenced in current undo stack.
-        # or we'll leak memory.
-        
+
+    # Size is computed after edit has been done so that removed clips are included.
+    undo_edit.undo_size_bytes = get_edit_size_bytes(undo_edit)
+
     # Add to stack and grow index
     undo_stack.append(undo_edit)
     index = index + 1
+
+    # Keep stack in size and memory budget, if too big remove undos from 0
+    _enforce_limits()
     
     if editorstate.PROJECT().last_save_path != None:
         _enable_save_func() # Disabled at load and save, first edit enables if project has been saved.
@@ -172,6 +191,95 @@ def do_redo():
 
     _undo_item_set_sensitive_func(True)
 
+def _enforce_limits():
+    global index, _evictions, _evicted_bytes
+
+    if len(undo_stack) == 0:
+        return
+
+    size_bytes = get_stack_size_bytes()
+    # Latest edit is always kept even if it alone exceeds memory budget.
+    while index > 1 and (len(undo_stack) > MAX_UNDOS or size_bytes > MEMORY_BUDGET_BYTES):
+        undo_edit = undo_stack.pop(0)
+        index = index - 1
+        size_bytes -= undo_edit.undo_size_bytes
+        _evictions += 1
+        _evicted_bytes += undo_edit.undo_size_bytes
+
+def get_stack_size_bytes():
+    size_bytes = 0
+    for undo_edit in undo_stack:
+        size_bytes += undo_edit.undo_size_bytes
+    return size_bytes
+
+def get_edit_size_bytes(undo_edit):
+    """
+    Returns estimate of memory kept alive by edit action being in undo stack. 
+    Clips, tracks and compositors still in current sequence are not counted.
+    """
+    return _get_size_bytes(undo_edit, set(), editorstate.current_sequence())
+
+def _get_size_bytes(obj, seen, seq):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, mlt.Properties):
+        return _get_mlt_object_size_bytes(obj, seen, seq)
+
+    size_bytes = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size_bytes += _get_size_bytes(key, seen, seq) + _get_size_bytes(value, seen, seq)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size_bytes += _get_size_bytes(item, seen, seq)
+    elif hasattr(obj, "undo") and hasattr(obj, "redo") and hasattr(obj, "__dict__"):
+        # Edit actions, data of other objects is either shared with sequence or small.
+        size_bytes += _get_size_bytes(obj.__dict__, seen, seq)
+    elif hasattr(obj, "destroy_id") and hasattr(obj, "transition"):
+        # Compositors wrap mlt.Transition objects.
+        if seq == None or not(obj in seq.compositors):
+            size_bytes += MLT_SERVICE_SIZE_ESTIMATE
+
+    return size_bytes
+
+def _get_mlt_object_size_bytes(mlt_obj, seen, seq):
+    if isinstance(mlt_obj, (mlt.Playlist, mlt.Tractor, mlt.Multitrack)):
+        return 0 # Tracks and sequence objects are not kept alive by undo stack.
+    if seq != None and isinstance(mlt_obj, mlt.Producer) and seq.clip_is_in_sequence(mlt_obj):
+        return 0
+
+    if isinstance(mlt_obj, mlt.Producer) and getattr(mlt_obj, "is_blanck_clip", False) == False:
+        size_bytes = MLT_PRODUCER_SIZE_ESTIMATE
+    else:
+        size_bytes = MLT_SERVICE_SIZE_ESTIMATE
+
+    # Clip filters are freed with clip.
+    try:
+        for mlt_filter in mlt_obj.filters:
+            size_bytes += _get_size_bytes(mlt_filter, seen, seq)
+    except AttributeError:
+        pass
+
+    return size_bytes
+
+def get_stats():
+    return {"undos": len(undo_stack), "index": index, "size_bytes": get_stack_size_bytes(),
+            "max_undos": MAX_UNDOS, "memory_budget_bytes": MEMORY_BUDGET_BYTES,
+            "evictions": _evictions, "evicted_bytes": _evicted_bytes,
+            "property_editors": len(_editor_for_property)}
+
+def print_stats():
+    stats = get_stats()
+    print("undo stack:", stats["undos"], "/", stats["max_undos"], "edits,", \
+          stats["size_bytes"] // 1024, "/", stats["memory_budget_bytes"] // 1024, "kB,", \
+          stats["evictions"], "evicted", stats["evicted_bytes"] // 1024, "kB,", \
+          stats["property_editors"], "property editors")
+    for i in range(0, len(undo_stack)):
+        undo_edit = undo_stack[i]
+        print("    ", i, type(undo_edit).__name__, undo_edit.undo_size_bytes // 1024, "kB")
+
 def _set_post_edit_mode():
     if editorstate.edit_mode != editorstate.INSERT_MOVE:
         set_post_undo_redo_edit_mode()
@@ -238,12 +346,13 @@ def _property_edit_poll_event(property_edit_action):
 
 def set_editor_for_property(editable_property, editor):
     global _editor_for_property
+    _remove_replaced_editors(editable_property)
     _editor_for_property[editable_property] = editor
 
 def get_editor_for_property(editable_property):
     global _editor_for_property
 
-    if str(type(editable_property)) == "<class 'propertyedit.KeyFrameHCSTransitionProperty'>":
+    if _is_compositor_property(editable_property):
         # These need different equality testing.
         return _get_compositor_editor_for_property(editable_property)
 
@@ -271,6 +380,32 @@ def clear_editors_dict():
     global _editor_for_property
     _editor_for_property = {}
 
+def _remove_replaced_editors(editable_property):
+    # Editor GUIs are created again for properties every time clip or compositor is loaded into editor.
+    # Editors for same property identity values are replaced so that they do not accumulate.
+    # Properties created for editors share a dummy index, those are cleared when editor loads a new clip.
+    global _editor_for_property
+    key = _get_editable_property_key(editable_property)
+    if key == None:
+        return
+
+    for ep in list(_editor_for_property.keys()):
+        if _get_editable_property_key(ep) == key:
+            del _editor_for_property[ep]
+
+def _get_editable_property_key(editable_property):
+    try:
+        if editable_property.property_index == INDEX_FOR_PROPERTY_CREATED_FOR_EDITOR:
+            return None
+        if _is_compositor_property(editable_property):
+            return ("compositor", editable_property.compositor_destroy_id, editable_property.property_index)
+        return (editable_property.clip, editable_property.filter_index, editable_property.property_index)
+    except AttributeError:
+        return None
+
+def _is_compositor_property(editable_property):
+    return str(type(editable_property)) == "<class 'propertyedit.KeyFrameHCSTransitionProperty'>"
+
 class PropertyEditAction:
     
     def __init__(self, value_set_func, undo_val):
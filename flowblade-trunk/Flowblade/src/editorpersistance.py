@@ -47,6 +47,10 @@ EDIT_PANEL_WIDTH_MIN = appconsts.PANEL_MULTI_EDIT_MINIMUM_SIZE
 EDIT_PANEL_WIDTH_MAX = 650
 MEDIA_PANEL_WIDTH_MIN = appconsts.PANEL_MEDIA_MINIMUM_SIZE
 MEDIA_PANEL_WIDTH_MAX = 510
+MEMORY_CACHE_MB_MIN = 32
+MEMORY_CACHE_MB_MAX = 4096
+UNDO_MEMORY_MB_MIN = 64
+UNDO_MEMORY_MB_MAX = 8192
 
 GLASS_STYLE = 0
 SIMPLE_STYLE = 1
@@ -186,7 +190,7 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     gen_opts_widgets, edit_prefs_widgets, playback_prefs_widgets, view_prefs_widgets, performance_widgets, jog_shuttle_widgets = widgets_tuples_tuple
     
     default_profile_combo, open_in_last_opened_check, open_in_last_rendered_check, undo_max_spin, load_order_combo, \
-    autosave_combo, render_folder_select, disk_cache_warning_combo = gen_opts_widgets
+    autosave_combo, render_folder_select, disk_cache_warning_combo, undo_memory_spin = gen_opts_widgets
 
     gfx_length_spin, cover_delete, mouse_scroll_action, hide_file_ext_button, \
     hor_scroll_dir, hor_scroll_speed, effects_editor_clip_load, auto_render_plugins, dnd_action = edit_prefs_widgets
@@ -198,7 +202,7 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     edit_panel_width_spin, media_panel_width_spin, layout_monitor, filter_select_width_spin, \
     show_bins_and_seqs_titles, wide_audio_master, use_headerbar, theme_select, system_accent_color = view_prefs_widgets
 
-    perf_render_threads, render_interpolation_combo = performance_widgets
+    perf_render_threads, render_interpolation_combo, memory_cache_spin = performance_widgets
 
     usbhid_enabled_check, usbhid_config_combo = jog_shuttle_widgets
 
@@ -207,6 +211,7 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     prefs.remember_last_render_dir = open_in_last_rendered_check.get_active()
     prefs.default_profile_name = databridge.mltprofiles_get_profile_name_for_index(default_profile_combo.get_active())
     prefs.undos_max = undo_max_spin.get_adjustment().get_value()
+    prefs.undo_memory_mb = int(undo_memory_spin.get_adjustment().get_value())
     prefs.media_load_order = load_order_combo.get_active()
 
     prefs.auto_center_on_play_stop = auto_center_check.get_active()
@@ -229,6 +234,7 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     prefs.perf_render_threads = int(perf_render_threads.get_adjustment().get_value())
     options = ["nearest", "bilinear","bicubic"]
     prefs.render_interpolation = options[render_interpolation_combo.get_active()]
+    prefs.memory_cache_mb = int(memory_cache_spin.get_adjustment().get_value())
     prefs.show_full_file_names = full_names.get_active()
     prefs.show_bins_and_sequences_titles = show_bins_and_seqs_titles.get_active()
     prefs.wide_audio_master = wide_audio_master.get_active()
@@ -415,4 +421,6 @@ class EditorPreferences:
         self.render_interpolation = "bilinear"
         self.use_gpu_decode = True
         self.use_headerbar = True
-        self.system_accent_color = (0.063, 0.341, 0.659)
\ No newline at end of file
+        self.system_accent_color = (0.063, 0.341, 0.659)
+        self.memory_cache_mb = 256 # Memory budget for waveforms and timeline thumbnails, see memorycache.py.
+        self.undo_memory_mb = 512 # Memory budget for undo stack, see undo.py.
@@ -30,9 +30,11 @@ import math
 
 import animatedvalue
 import appconsts
+import audiowaveformrenderer
 import clipeffectseditor
 import dialogutils
 import edit
+import editorstate
 from editorstate import current_sequence
 from editorstate import PLAYER
 import gui
@@ -551,7 +553,12 @@ class TLineKeyFrameEditor:
         ex, ey, ew, eh = self._get_edit_area_rect()
         
         # Maybe draw audio levels
-        if self.edit_type == VOLUME_KF_EDIT and clip.is_blanck_clip == False and clip.waveform_data != None:
+        waveform_data = None
+        if self.edit_type == VOLUME_KF_EDIT and clip.is_blanck_clip == False and editorstate.display_all_audio_levels == True \
+            and clip.media_type != appconsts.IMAGE and clip.media_type != appconsts.IMAGE_SEQUENCE and clip.media_type != appconsts.PATTERN_PRODUCER:
+            waveform_data = audiowaveformrenderer.get_waveform_data(clip)
+
+        if waveform_data != None:
 
             cr.set_source_rgba(*AUDIO_LEVELS_COLOR)
         
@@ -583,7 +590,7 @@ class TLineKeyFrameEditor:
             for f in range(draw_first, draw_last, step):
                 try:
                     xf = media_start_pos_pix + f * pix_per_frame
-                    hf = bar_height * clip.waveform_data[f] * 0.5
+                    hf = bar_height * waveform_data[f] * 0.5
                     if h < 1:
                         h = 1
                     cr.rectangle(xf, mid_y - hf, draw_pix_per_frame, hf * 2.0)
@@ -0,0 +1,176 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <https://github.com/jliljebl/flowblade/>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module creates and caches filmstrip images for video clips on timeline.
+
+Filmstrip is a sprite sheet of FILMSTRIP_FRAMES low resolution frames taken at even
+intervals from media file. Sheets are saved in project thumbnails folder and
+both creating and loading sheets is done in a background thread so that timeline
+drawing never waits for them.
+"""
+
+from gi.repository import GLib
+
+import cairo
+import hashlib
+try:
+    import mlt7 as mlt
+except:
+    import mlt
+import os
+import queue
+import threading
+
+import appconsts
+import atomicfile
+import callbackbridge
+import editorstate
+import memorycache
+import projectdata
+import userfolders
+
+FILMSTRIP_FRAMES = 16
+FRAME_WIDTH = appconsts.THUMB_WIDTH
+FRAME_HEIGHT = appconsts.THUMB_HEIGHT
+
+_requested = set() # Media paths that have been sent to worker since last project load.
+_filmstrip_queue = queue.Queue()
+_worker_thread = None
+
+
+# ------------------------------------------------------- interface
+def get_filmstrip(media_path):
+    """
+    Returns Filmstrip for media or None if not yet available, in which case
+    it is loaded or created in background and timeline is repainted when done.
+    """
+    filmstrip = memorycache.get_cache().get((memorycache.FILMSTRIP, media_path))
+    if filmstrip != None:
+        return filmstrip
+
+    if not(media_path in _requested):
+        _requested.add(media_path)
+        _filmstrip_queue.put((media_path, editorstate.PROJECT().profile))
+        _start_worker()
+
+    return None
+
+def clear_cache():
+    global _requested
+    memorycache.get_cache().clear_namespace(memorycache.FILMSTRIP)
+    _requested = set()
+
+def _get_filmstrip_path(media_path, profile):
+    # Media files replaced at same path and profile changes get new filmstrips.
+    file_stat = os.stat(media_path)
+    key = "%s|%d|%d|%s|%d|%d" % (media_path, file_stat.st_size, file_stat.st_mtime_ns,
+                                 profile.description(), profile.width(), profile.height())
+    md_str = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return userfolders.get_thumbnail_dir() + md_str + "_filmstrip.png"
+
+def _start_worker():
+    global _worker_thread
+    if _worker_thread == None:
+        _worker_thread = FilmstripWorkerThread()
+        _worker_thread.start()
+
+def _filmstrip_done(media_path, filmstrip):
+    # Called in GTK thread. After this memory cache decides if filmstrip needs to be reloaded.
+    _requested.discard(media_path)
+    memorycache.get_cache().put((memorycache.FILMSTRIP, media_path), filmstrip, memorycache.get_surface_size_bytes(filmstrip.surface))
+    callbackbridge.updater_repaint_tline()
+    return False
+
+def _filmstrip_failed(media_path):
+    # We can try again after cache is cleared.
+    print("Filmstrip creation failed for", media_path)
+    return False
+
+
+# ------------------------------------------------------- filmstrip
+class Filmstrip:
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.frames_count = surface.get_width() // FRAME_WIDTH
+
+    def draw(self, cr, x, y, clip_in, pix_per_frame, media_length, clip_x_end, canvas_width):
+        # Tiles are aligned to clip start so that they don't move relative to clip when scrolling,
+        # and only tiles inside canvas are drawn.
+        draw_start = max(x, 0)
+        draw_end = min(clip_x_end, canvas_width)
+        if draw_end <= draw_start or media_length <= 0:
+            return
+
+        first_tile = int((draw_start - x) // FRAME_WIDTH)
+        tile_x = x + first_tile * FRAME_WIDTH
+        while tile_x < draw_end:
+            media_frame = clip_in + (tile_x + FRAME_WIDTH / 2.0 - x) / pix_per_frame
+            index = int(media_frame * self.frames_count / media_length)
+            if index < 0:
+                index = 0
+            elif index >= self.frames_count:
+                index = self.frames_count - 1
+            cr.set_source_surface(self.surface, tile_x - index * FRAME_WIDTH, y)
+            cr.rectangle(tile_x, y, FRAME_WIDTH, FRAME_HEIGHT)
+            cr.fill()
+            tile_x += FRAME_WIDTH
+
+
+class FilmstripWorkerThread(threading.Thread):
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def run(self):
+        while True:
+            media_path, profile = _filmstrip_queue.get()
+            try:
+                filmstrip_path = _get_filmstrip_path(media_path, profile)
+                if os.path.isfile(filmstrip_path):
+                    surface = cairo.ImageSurface.create_from_png(filmstrip_path)
+                else:
+                    surface = self._create_filmstrip_surface(media_path, profile)
+                    with atomicfile.AtomicFileWriter(filmstrip_path, "wb") as afw:
+                        surface.write_to_png(afw.get_file())
+                GLib.idle_add(_filmstrip_done, media_path, Filmstrip(surface))
+            except Exception as e:
+                print(e)
+                GLib.idle_add(_filmstrip_failed, media_path)
+
+    def _create_filmstrip_surface(self, media_path, profile):
+        producer = mlt.Producer(profile, str(media_path))
+        length = producer.get_length()
+        producer.set_speed(0)
+
+        sheet = cairo.ImageSurface(cairo.FORMAT_RGB24, FRAME_WIDTH * FILMSTRIP_FRAMES, FRAME_HEIGHT)
+        cr = cairo.Context(sheet)
+        for i in range(0, FILMSTRIP_FRAMES):
+            producer.seek(int((i + 0.5) * length / FILMSTRIP_FRAMES))
+            frame = producer.get_frame()
+            frame.set("consumer_deinterlace", 1)
+            frame_surface = projectdata.get_mlt_frame_cairo_surface(frame, FRAME_WIDTH, FRAME_HEIGHT)
+
+            cr.set_source_surface(frame_surface, i * FRAME_WIDTH, 0)
+            cr.paint()
+
+        return sheet
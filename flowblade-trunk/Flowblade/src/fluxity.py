@@ -220,13 +220,17 @@ from gi.repository import Pango
 from gi.repository import PangoCairo
 
 import array
+import bisect
 import cairo
 import json
 import math
 import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
 import os
 from PIL import Image, ImageFilter
 import sys
+import time
 import traceback
 
 
@@ -246,6 +250,13 @@ DEFAULT_FONT_SIZE = 40
 
 FLUXITY_ERROR_MSG = "ERROR"
 FLUXITY_LOG_MSG = "LOG"
+FLUXITY_PROCESS_STATS = "PROCESS_STATS"
+
+# Frame range rendering.
+RENDER_CHUNK_FRAMES = 4 # Frames given to a render process at a time.
+STREAM_CHUNK_FRAMES = 1 # Frames given to a render process at a time when frames are streamed to a callback, keeps frames in buffer close to each other.
+DEFAULT_MAX_PROCESSES = 8
+STREAM_BUFFER_FRAMES_PER_PROCESS = 2 # Shared memory frame slots per render process when frames are streamed to a callback.
 
 VERTICAL = 0
 HORIZONTAL = 1
@@ -1162,10 +1173,15 @@ class AnimatedValue:
       * **`KEYFRAME_DISCRETE`** Value after keyframe is value at keyframe.
 
     Implementation assumes there always being a keyframe at frame 0, and removing that will result in undefined behaviour. It is of course possible to overwrite existing keyframe at frame 0 using method *add_keyframe_at_frame().*
+    
+    Scripts animating a lot of values can call *precompute_values()* in *init_render()* after keyframes have been added to make *get_value()* a table lookup during rendering.
     """
     def __init__(self, value=0.0):
         # We enforce a keyframe always existing in frame 0
         self.keyframes = [(0, value, KEYFRAME_LINEAR)]
+        self._keyframe_frames = [0] # Keyframe frames in same order as self.keyframes for bisect lookups.
+        self._values_table = None # Values list for frames starting from self._values_table_start, see precompute_values().
+        self._values_table_start = 0
 
     def add_keyframe_at_frame(self, frame, value, kf_type):
         """
@@ -1182,35 +1198,37 @@ class AnimatedValue:
         If frame is between two keyframes a new keyframe is added between keyframes.
 
         If frame is after last keyframe a new keyframe is appended.
-        """
         
+        Values computed with *precompute_values()* are discarded.
+        """
+        self._values_table = None
+
         # Replace if kf in frame exists.
         new_kf = (frame, value, kf_type)
         kf_index_on_frame = self._frame_has_keyframe(frame)
         if kf_index_on_frame != -1:
-            self.keyframes.pop(kf_index_on_frame)
-            self.keyframes.insert(kf_index_on_frame, new_kf)
+            self.keyframes[kf_index_on_frame] = new_kf
             return
 
-        # Insert between if frame between two kfs.
-        for i in range(0, len(self.keyframes)):
-            kf_frame, kf_value, kf_type = self.keyframes[i]
-            if kf_frame > frame:
-                prev_frame, prev_value, prev_type = self.keyframes[i - 1]
-                self.keyframes.insert(i, new_kf)
-                self.active_kf_index = i
-                return
-
-        # Append last if after last kf.
-        self.keyframes.append(new_kf)
+        # Insert between if frame between two kfs, or append last if after last kf.
+        i = bisect.bisect_right(self._keyframe_frames, frame)
+        self.keyframes.insert(i, new_kf)
+        self._keyframe_frames.insert(i, frame)
 
     def _frame_has_keyframe(self, frame):
-        for i in range(0, len(self.keyframes)):
-            kf_frame, kf_value, type = self.keyframes[i]
-            if frame == kf_frame:
-                return i
+        keyframe_frames = self._get_keyframe_frames()
+        i = bisect.bisect_left(keyframe_frames, frame)
+        if i < len(keyframe_frames) and keyframe_frames[i] == frame:
+            return i
 
         return -1
+
+    def _get_keyframe_frames(self):
+        # Scripts may have edited self.keyframes list directly.
+        if len(self._keyframe_frames) != len(self.keyframes):
+            self._keyframe_frames = [kf[0] for kf in self.keyframes]
+            self._values_table = None
+        return self._keyframe_frames
         
     def get_value(self, frame):
         """
@@ -1220,27 +1238,84 @@ class AnimatedValue:
 
         **Returns:** (float) value at frame.
         """
+        keyframe_frames = self._get_keyframe_frames()
+        if self._values_table != None:
+            table_index = frame - self._values_table_start
+            if table_index >= 0 and table_index < len(self._values_table) and table_index == int(table_index):
+                return self._values_table[int(table_index)]
+
         last_frame, last_value, last_type  = self.keyframes[-1]
         if frame >= last_frame: # This also handles case len(self.keyframes) == 1 because first keyframe always at frame 0.
             return last_value
 
-        for i in range(0, len(self.keyframes) - 1):
-            kf_frame, kf_value, kf_type = self.keyframes[i]
-            if frame == kf_frame:
-                return kf_value
-            next_frame, next_value, next_type = self.keyframes[i + 1]
-            if frame == next_frame:
-                return next_value
-            if frame > kf_frame and frame < next_frame:
-                if kf_type == KEYFRAME_LINEAR:
-                    fract = (frame - kf_frame) / (next_frame - kf_frame)
-                    return kf_value + fract * (next_value - kf_value)
-                elif kf_type == KEYFRAME_SMOOTH:
-                    return self._get_smooth_value(i, frame)
-                else: # KEYFRAME_DISCRETE
-                    return kf_value
-                    
-        return None # We absolutely want to crash if somehow we hit this.
+        i = bisect.bisect_right(keyframe_frames, frame) - 1
+        if i < 0:
+            return None # We absolutely want to crash if somehow we hit this.
+
+        kf_frame, kf_value, kf_type = self.keyframes[i]
+        if frame == kf_frame:
+            return kf_value
+        next_frame, next_value, next_type = self.keyframes[i + 1]
+        if kf_type == KEYFRAME_LINEAR:
+            fract = (frame - kf_frame) / (next_frame - kf_frame)
+            return kf_value + fract * (next_value - kf_value)
+        elif kf_type == KEYFRAME_SMOOTH:
+            return self._get_smooth_value(i, frame)
+        else: # KEYFRAME_DISCRETE
+            return kf_value
+
+    def get_values(self, start_frame, end_frame):
+        """
+        **`start_frame(int)`** First frame of range.
+        
+        **`end_frame(int)`** Last frame of range, exclusive.
+        
+        Computes values for all frames in range at once. Values are same as values returned by *get_value()* for each frame, except that frames before first keyframe get value *NaN*.
+
+        **Returns:** (numpy.ndarray) float64 array of values for frames *start_frame - (end_frame - 1)*.
+        """
+        keyframe_frames = self._get_keyframe_frames()
+        frames = np.arange(start_frame, end_frame, dtype=np.float64)
+        kf_frames = np.array(keyframe_frames, dtype=np.float64)
+        kf_values = np.array([kf[1] for kf in self.keyframes], dtype=np.float64)
+        kf_types = np.array([kf[2] for kf in self.keyframes])
+        last = len(self.keyframes) - 1
+
+        if last == 0:
+            values = np.full(len(frames), kf_values[0])
+        else:
+            # Index of keyframe before or on frame and the three other keyframes that affect smooth values.
+            i = np.clip(np.searchsorted(kf_frames, frames, side="right") - 1, 0, last - 1)
+            prev_prev = np.maximum(i - 1, 0)
+            next_next = np.minimum(i + 2, last)
+            y0 = kf_values[prev_prev]
+            y1 = kf_values[i]
+            y2 = kf_values[i + 1]
+            y3 = kf_values[next_next]
+            
+            fract = (frames - kf_frames[i]) / (kf_frames[i + 1] - kf_frames[i])
+            linear_values = y1 + fract * (y2 - y1)
+            smooth_values = self._catmull_rom_interpolate(y0, y1, y2, y3, fract)
+            
+            types = kf_types[i]
+            values = np.where(types == KEYFRAME_LINEAR, linear_values, np.where(types == KEYFRAME_SMOOTH, smooth_values, y1))
+            values[frames >= kf_frames[last]] = kf_values[last]
+
+        values[frames < kf_frames[0]] = np.nan
+        return values
+
+    def precompute_values(self, start_frame, end_frame):
+        """
+        **`start_frame(int)`** First frame of range.
+        
+        **`end_frame(int)`** Last frame of range, exclusive.
+        
+        Computes values for all frames in range at once, after which *get_value()* returns values for frames in range from a table. 
+        
+        Call this in *init_render()* after all keyframes have been added. Adding keyframes discards computed values.
+        """
+        self._values_table = self.get_values(start_frame, end_frame).tolist()
+        self._values_table_start = start_frame
  
     def _get_smooth_value(self, i, frame):
         # Get indexes of the four keyframes that affect the drawn curve. 
@@ -1320,6 +1395,17 @@ class AffineTransform:
         self.scale_y = AnimatedValue(1.0)
         self.rotation = AnimatedValue()
 
+    def precompute_values(self, start_frame, end_frame):
+        """
+        **`start_frame(int)`** First frame of range.
+        
+        **`end_frame(int)`** Last frame of range, exclusive.
+        
+        Calls *`fluxity.AnimatedValue.precompute_values()`* for all animated attributes.
+        """
+        for animated_value in (self.x, self.y, self.anchor_x, self.anchor_y, self.scale_x, self.scale_y, self.rotation):
+            animated_value.precompute_values(start_frame, end_frame)
+
     def apply_transform(self, cr, frame):
         """
         **`cr(cairo.Context)`** a `cairo.Context` object.
@@ -1447,7 +1533,7 @@ def render_preview_frame(script, script_file, frame, generator_length, out_folde
         fctx.error = str(e) + traceback.format_exc(6,True)
         return fctx
 
-def render_frame_sequence(script, script_file, generator_length, in_frame, out_frame, out_folder, profile_file_path, editors_data_json=None, start_out_from_frame_one=False):
+def render_frame_sequence(script, script_file, generator_length, in_frame, out_frame, out_folder, profile_file_path, editors_data_json=None, start_out_from_frame_one=False, frame_callback=None, processes_count=None, progress_callback=None):
     """
     **script(str)** Script to be rendered as a string.
     
@@ -1465,15 +1551,91 @@ def render_frame_sequence(script, script_file, generator_length, in_frame, out_f
     
     **start_out_from_frame_one(boolean)** Setting this *True* will cause numbering of rendered frame sequence to start from *1*, otherwise it will start from *in_frame*. 
     
+    **frame_callback(function)** Optional function *frame_callback(frame, frame_data)* that receives rendered frames in frame order instead of frames being written as PNG files into *out_folder*. *frame_data* is a memoryview with pixel data of a *cairo.FORMAT_ARGB32* image with stride *4 * width*, it is only valid until callback returns. Returning *False* from callback aborts rendering.
+    
+    **processes_count(int)** Optional number of render processes, not providing this will decide number of processes from number of CPU cores and length of rendered range.
+    
+    **progress_callback(function)** Optional function *progress_callback(frames_done)* that is called each time a frame has been written into *out_folder*. Returning *False* from callback aborts rendering. Not called when *frame_callback* is used.
+    
     Renders a range of frames from provided script.
     
+    Frames are given to render processes in chunks of *fluxity.RENDER_CHUNK_FRAMES* frames, or *fluxity.STREAM_CHUNK_FRAMES* frames when *frame_callback* is used, from a shared queue so processes that get cheap frames render more of them.
+    
     **Returns:** (dict) Dictionary object created during rendering with the following information:
     
-    * for each process it has *key -> value* pair *process number(str) -> path to first frame rendered by process(str)*.
+    * for each process it has *key -> value* pair *process number(str) -> path to first frame rendered by process(str)*. Process *0* always renders first frame of range.
+    * *key -> value* pair *fluxity.FLUXITY_PROCESS_STATS -> dict* with *process number(int) -> dict* of render statistics for each process that completed, see *fluxity.get_process_stats_message()*.
     * if errors occurred during rendering it has *key -> value* pair *fluxity.FLUXITY_ERROR_MSG -> error message(str)*.
     * if script created log messages it has *key -> value* pair *fluxity.FLUXITY_LOG_MSG -> log message(str)*.
     """
+    if processes_count == None:
+        processes_count = get_default_processes_count(in_frame, out_frame)
+
+    if frame_callback != None:
+        chunk_frames = STREAM_CHUNK_FRAMES
+    else:
+        chunk_frames = RENDER_CHUNK_FRAMES
+
+    # First chunk is rendered by process 0, rest are taken from queue by which ever process is free.
+    chunks = [(chunk_in, min(chunk_in + chunk_frames, out_frame)) for chunk_in in range(in_frame, out_frame, chunk_frames)]
+    processes_count = max(1, min(processes_count, len(chunks)))
+    chunk_queue = multiprocessing.Queue()
+    for chunk in chunks[1:]:
+        chunk_queue.put(chunk)
+    for i in range(processes_count):
+        chunk_queue.put(None) # Tells process that there are no more chunks.
+    # Chunks are left in queue if a process fails, that must not block this process from exiting.
+    chunk_queue.cancel_join_thread()
+
+    result_queue = multiprocessing.Queue()
+
+    frame_buffer = None
+    if frame_callback != None:
+        w, h = _get_profile_dimensions(profile_file_path)
+        frame_buffer = _SharedFrameBuffer(w * h * 4, processes_count * STREAM_BUFFER_FRAMES_PER_PROCESS, in_frame)
 
+    jobs = []
+    for i in range(processes_count):
+        
+        render_data = ( script, script_file, generator_length, in_frame, out_frame, out_folder, \
+                        profile_file_path, editors_data_json, start_out_from_frame_one)
+        
+        if i == 0 and len(chunks) > 0:
+            first_chunk = chunks[0]
+        else:
+            first_chunk = None
+        proc_info = (i, first_chunk, chunk_queue, result_queue, frame_buffer, progress_callback != None)
+        p = multiprocessing.Process(target=_render_process_launch, args=(render_data, proc_info))
+        jobs.append(p)
+        p.start()
+
+    if frame_buffer != None:
+        try:
+            return _stream_rendered_frames(jobs, result_queue, frame_buffer, in_frame, out_frame, frame_callback)
+        finally:
+            frame_buffer.close()
+
+    # Render processes send frame numbers as frames get written if progress is reported, and results dict when done.
+    proc_fctx_dict = {}
+    frames_done = 0
+    done_count = 0
+    while done_count < len(jobs):
+        msg = result_queue.get()
+        if type(msg) == dict:
+            done_count += 1
+            _add_process_results(proc_fctx_dict, msg)
+        else:
+            frames_done += 1
+            if progress_callback(frames_done) == False:
+                _terminate_render_processes(jobs)
+                return proc_fctx_dict
+
+    for proc in jobs:
+        proc.join()
+
+    return proc_fctx_dict
+
+def get_default_processes_count(in_frame, out_frame):
     # Some simple heuristics to decide how many processes will be used for rendering
     cpu_count = multiprocessing.cpu_count()
     threads = cpu_count - 2
@@ -1481,40 +1643,139 @@ def render_frame_sequence(script, script_file, generator_length, in_frame, out_f
     if threads < 2:
         threads = 1
     # This gets diminshing returns so let's cap it at 8.
-    if threads > 8:
-        threads = 8
+    if threads > DEFAULT_MAX_PROCESSES:
+        threads = DEFAULT_MAX_PROCESSES
     # If we are rendering a very small amount of frames, there isn't much benefit to use multiple processes.
     if out_frame - in_frame < threads * 2:
         threads = 1
 
-    result_queue = multiprocessing.Queue()
-    
-    jobs = []
-    for i in range(threads):
-        
-        render_data = ( script, script_file, generator_length, in_frame, out_frame, out_folder, \
-                        profile_file_path, editors_data_json, start_out_from_frame_one)
-        
-        proc_info = (i, threads, result_queue)
-        p = multiprocessing.Process(target=_render_process_launch, args=(render_data, proc_info))
-        jobs.append(p)
-        p.start()
+    return threads
 
+def get_process_stats_message(proc_fctx_dict):
+    """
+    **proc_fctx_dict(dict)** Dictionary returned by *fluxity.render_frame_sequence()*.
+    
+    Process statistics dicts have keys *frames*, *chunks*, *init_time*, *render_time* and *output_time*. Times are seconds spent in script *init_script()* and *init_render()* methods, in script *render_frame()* method and in writing or passing on rendered frames.
+    
+    **Returns:** (str) Render statistics for each process as a human readable multiline string.
+    """
+    if not(FLUXITY_PROCESS_STATS in proc_fctx_dict):
+        return ""
+
+    lines = []
+    process_stats = proc_fctx_dict[FLUXITY_PROCESS_STATS]
+    for procnum in sorted(process_stats.keys()):
+        stats = process_stats[procnum]
+        if stats["frames"] > 0:
+            frame_time = stats["render_time"] / stats["frames"]
+        else:
+            frame_time = 0.0
+        lines.append("process %d: %d frames in %d chunks, init %.2f s, render %.2f s (%.3f s/frame), output %.2f s" % \
+                     (procnum, stats["frames"], stats["chunks"], stats["init_time"], stats["render_time"], frame_time, stats["output_time"]))
+
+    return "\n".join(lines)
+
+def _add_process_results(proc_fctx_dict, results_dict):
+    process_stats = results_dict.pop(FLUXITY_PROCESS_STATS, None)
+    proc_fctx_dict.update(results_dict)
+    if process_stats != None:
+        if not(FLUXITY_PROCESS_STATS in proc_fctx_dict):
+            proc_fctx_dict[FLUXITY_PROCESS_STATS] = {}
+        proc_fctx_dict[FLUXITY_PROCESS_STATS][process_stats["process"]] = process_stats
+
+def _stream_rendered_frames(jobs, result_queue, frame_buffer, in_frame, out_frame, frame_callback):
+    # Render processes send frame numbers as frames get written to shared buffer and results dict when done.
+    # Frames arrive out of order from processes and are passed to callback in frame order.
     proc_fctx_dict = {}
+    ready_frames = set()
+    next_frame = in_frame
+    done_count = 0
+    while done_count < len(jobs) or (next_frame in ready_frames):
+        if next_frame in ready_frames:
+            ready_frames.remove(next_frame)
+            frame_data = frame_buffer.get_frame_data(next_frame)
+            keep_rendering = frame_callback(next_frame, frame_data)
+            frame_data.release()
+            if keep_rendering == False:
+                _terminate_render_processes(jobs)
+                return proc_fctx_dict
+            next_frame += 1
+            frame_buffer.frame_consumed(next_frame)
+            continue
+
+        msg = result_queue.get()
+        if type(msg) == dict:
+            done_count += 1
+            _add_process_results(proc_fctx_dict, msg)
+            if str(FLUXITY_ERROR_MSG) in msg:
+                # Other processes would just render frames we will not use.
+                _terminate_render_processes(jobs)
+                return proc_fctx_dict
+        else:
+            ready_frames.add(msg)
+
     for proc in jobs:
-        results_dict = result_queue.get()
         proc.join()
-        proc_fctx_dict.update(results_dict)
 
     return proc_fctx_dict
+
+def _terminate_render_processes(jobs):
+    for proc in jobs:
+        if proc.is_alive():
+            proc.terminate()
+    for proc in jobs:
+        proc.join()
+
+def _get_profile_dimensions(profile_file_path):
+    priv_context = FluxityContextPrivate(None)
+    profile_data = priv_context.load_profile(profile_file_path)
+    return (profile_data[PROFILE_WIDTH], profile_data[PROFILE_HEIGHT])
+
+
+class _SharedFrameBuffer:
+    """
+    Ring buffer of rendered frames in shared memory, frame is written to slot *frame % slots_count*.
+    
+    Render process can write a frame only after frame that was in its slot has been consumed, 
+    so buffer never holds more than *slots_count* frames starting from next frame to be consumed.
+    """
+    def __init__(self, frame_size, slots_count, first_frame):
+        self.frame_size = frame_size
+        self.slots_count = slots_count
+        self.shm = shared_memory.SharedMemory(create=True, size=frame_size * slots_count)
+        self.next_frame = multiprocessing.Value("l", first_frame)
+        self.slot_freed = multiprocessing.Condition(self.next_frame.get_lock())
+        
+    def write_frame(self, frame, frame_data):
+        # Called in render processes.
+        with self.slot_freed:
+            self.slot_freed.wait_for(lambda: frame < self.next_frame.value + self.slots_count)
+        offset = (frame % self.slots_count) * self.frame_size
+        self.shm.buf[offset:offset + self.frame_size] = frame_data
+
+    def get_frame_data(self, frame):
+        offset = (frame % self.slots_count) * self.frame_size
+        return self.shm.buf[offset:offset + self.frame_size]
+
+    def frame_consumed(self, next_frame):
+        with self.slot_freed:
+            self.next_frame.value = next_frame
+            self.slot_freed.notify_all()
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
         
 def _render_process_launch(render_data, proc_info):
 
     try:
+        init_start_time = time.perf_counter()
+        
         script, script_file, generator_length, in_frame, out_frame, out_folder, \
         profile_file_path, editors_data_json, start_out_from_frame_one = render_data
         
-        procnum, threads_count, result_queue = proc_info
+        procnum, first_chunk, chunk_queue, result_queue, frame_buffer, report_frames = proc_info
      
         # Used to communicate to app what happened.
         results_dict = {}
@@ -1546,14 +1807,39 @@ def _render_process_launch(render_data, proc_info):
         fctx.priv_context.start_out_from_frame_one = start_out_from_frame_one
         fctx.priv_context.in_frame = in_frame
         fctx.priv_context.process_id = procnum
-        
-        for frame in range(in_frame + procnum, out_frame, threads_count):
-            fctx.priv_context.create_frame_surface(frame)
-            w, h = fctx.get_dimensions()
-            fscript.call_render_frame(frame, fctx, w, h)
-            fctx.priv_context.write_out_frame()
+
+        stats = {"process":procnum, "frames":0, "chunks":0, "render_time":0.0, "output_time":0.0}
+        stats["init_time"] = time.perf_counter() - init_start_time
+
+        chunk = first_chunk
+        if chunk == None:
+            chunk = chunk_queue.get()
+        while chunk != None:
+            chunk_in, chunk_out = chunk
+            for frame in range(chunk_in, chunk_out):
+                render_start_time = time.perf_counter()
+                fctx.priv_context.create_frame_surface(frame)
+                w, h = fctx.get_dimensions()
+                fscript.call_render_frame(frame, fctx, w, h)
+                output_start_time = time.perf_counter()
+                if frame_buffer != None:
+                    frame_surface = fctx.priv_context.frame_surface
+                    frame_surface.flush()
+                    frame_buffer.write_frame(frame, frame_surface.get_data())
+                    result_queue.put(frame)
+                else:
+                    fctx.priv_context.write_out_frame()
+                    if report_frames == True:
+                        result_queue.put(frame)
+                output_end_time = time.perf_counter()
+                stats["render_time"] += output_start_time - render_start_time
+                stats["output_time"] += output_end_time - output_start_time
+                stats["frames"] += 1
+            stats["chunks"] += 1
+            chunk = chunk_queue.get()
 
         results_dict[str(procnum)] = str(fctx.priv_context.first_rendered_frame_path)
+        results_dict[FLUXITY_PROCESS_STATS] = stats
         if len(fctx.log_msg) > 0:
             results_dict[str(FLUXITY_LOG_MSG)] = str(fctx.log_msg)
         
@@ -24,6 +24,7 @@ from gi.repository import GObject
 from gi.repository import Pango
 
 import copy
+import json
 import os
 import subprocess
 import sys
@@ -36,6 +37,7 @@ except:
 
 import appconsts
 import callbackbridge
+import ccrutils
 import editorlayout
 import editorpersistance
 from editorstate import PROJECT
@@ -47,6 +49,7 @@ import medialinker
 import motionheadless
 import proxyheadless
 import renderconsumer
+import renderworker
 import respaths
 import stabilizeheadless
 import stabilizedvideoheadless
@@ -75,6 +78,8 @@ FFMPEG_ATTR_SCREENSIZE = "%SCREENSIZE"
 FFMPEG_ATTR_SCREENSIZE_2 = "%SCREEN%SIZE%TWO%"
 FFMPEG_ATTR_PROXYFILE = "%PROXYFILE"
 
+MAX_RENDER_WORKERS = 4
+
 
 _status_polling_thread = None
 
@@ -85,6 +90,10 @@ _remove_list = [] # objects are removed from GUI with delay to give user time to
 
 _jobs_render_progress_window = None
 
+_render_workers = [] # RenderWorkerProcess objects
+_render_workers_started = 0 # Used to give each worker its own log file.
+_worker_jobs_queue = [] # (job, launcher, args) tuples waiting for a free render worker
+
  # If multiple files are transcoded with completion action ProxyRenderJobQueueObject.TRANSCODE_COMPLETED_ACTION_REPLACE_MEDIA_ITEM
  # then paths data is collect in this dict and replace action is done for all in a single go.
  # _transcode_multi_replace: old_media_path->replace_media_path
@@ -101,6 +110,7 @@ class JobProxy: # This object represents a job in the job queue.
         self.progress = 0.0 # 0.0. - 1.0
         self.text = ""
         self.elapsed = 0.0 # in fractional seconds
+        self.status_pushed = False # True after render process has pushed status through status channel, polling is then not needed.
 
         # callback_object have to implement interface:
         #     start_render()
@@ -141,7 +151,7 @@ class ProcessCommandListRunner(threading.Thread):
         
     def run(self):
         if self.logging == False:
-            process = subprocess.Popen(self.command_list)
+            process = start_status_channel_process(self.command_list)
         else:
             FLOG = open(userfolders.get_cache_dir() + "log_job_ProcessCommandListRunner", 'w')
             process = subprocess.Popen(self.command_list, stdin=FLOG, stdout=FLOG, stderr=FLOG)
@@ -352,6 +362,16 @@ class AbstractJobQueueObject(JobProxy):
                                             self.progress, self.text, self.elapsed)
         return job_queue_message
 
+    def render_failed(self, error_msg):
+        print("Render job", self.get_job_name(), "failed:", error_msg)
+        self.progress = -1.0
+        self.text = _("Failed") + " - " + self.get_job_name()
+        self.status = CANCELLED
+        _remove_list.append(self)
+
+        _jobs_list_view.fill_data_model(_jobs)
+        GLib.timeout_add(4000, _remove_jobs)
+
     def create_job_queue_proxy(self):
         self.status = QUEUED
         self.progress = 0.0
@@ -408,9 +428,7 @@ class MotionRenderJobQueueObject(AbstractJobQueueObject):
         parent_folder_arg = "parent_folder:" + str(self.parent_folder)
         command_list.append(parent_folder_arg)
 
-        # We need to wait() in thread.
-        command_list_runner = ProcessCommandListRunner(command_list)
-        command_list_runner.start()
+        launch_headless_render(self, command_list)
         
     def update_render_status(self):
         GLib.idle_add(self._update_from_gui_thread)
@@ -505,7 +523,7 @@ class StablizeDataRenderJobQueueObject(AbstractJobQueueObject):
         write_file_arg = "write_file:" + str(self.write_file)
         command_list.append(write_file_arg)
         
-        subprocess.Popen(command_list)
+        launch_headless_render(self, command_list)
         
     def update_render_status(self):
         GLib.idle_add(self._update_from_gui_thread)
@@ -586,7 +604,7 @@ class StablizedMediaItemDataRenderJobQueueObject(AbstractJobQueueObject):
         write_file_arg = "write_file:" + str(self.write_file)
         command_list.append(write_file_arg)
         
-        subprocess.Popen(command_list)
+        launch_headless_render(self, command_list)
         
     def update_render_status(self):
         GLib.idle_add(self._update_from_gui_thread)
@@ -659,9 +677,7 @@ class StabilizedMediaItemVideoRenderJobQueueObject(AbstractJobQueueObject):
         parent_folder_arg = "parent_folder:" + str(self.parent_folder)
         command_list.append(parent_folder_arg)
 
-        # We need to wait() in thread.
-        command_list_runner = ProcessCommandListRunner(command_list)
-        command_list_runner.start()
+        launch_headless_render(self, command_list)
         
     def update_render_status(self):
         GLib.idle_add(self._update_from_gui_thread)
@@ -743,9 +759,7 @@ class TrackingDataRenderJobQueueObject(AbstractJobQueueObject):
         data_file_arg = "data_file_path:" + str(self.data_file_path)
         command_list.append(data_file_arg)
 
-        # We need to wait() in thread.
-        command_list_runner = ProcessCommandListRunner(command_list)
-        command_list_runner.start()
+        launch_headless_render(self, command_list)
         
     def update_render_status(self):
         GLib.idle_add(self._update_from_gui_thread)
@@ -834,10 +848,7 @@ class ProxyRenderJobQueueObject(AbstractJobQueueObject):
             parent_folder_arg = "parent_folder:" + str(self.parent_folder)
             command_list.append(parent_folder_arg)
 
-            # We need to wait() in thread.
-            command_list_runner = ProcessCommandListRunner(command_list)
-            command_list_runner.logging = True
-            command_list_runner.start()
+            launch_headless_render(self, command_list)
         else:
             # FFMPEG CLI proxy rendering.
             self.is_mlt_render = False
@@ -997,6 +1008,218 @@ class FFmpegRenderThread(threading.Thread):
         self.completed = True 
 
 
+# ----------------------------------------------------------------- render workers
+class RenderWorkerProcess:
+    """
+    Persistent flowbladerenderworker process that runs headless render jobs one at a time.
+    """
+    def __init__(self, worker_index):
+        self.job = None # Job queue object being rendered.
+
+        log_file = open(userfolders.get_cache_dir() + "log_render_worker_" + str(worker_index), 'w')
+        command_list = [sys.executable, respaths.LAUNCH_DIR + "flowbladerenderworker"]
+        self.process = subprocess.Popen(command_list, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=log_file, bufsize=0)
+        log_file.close()
+
+        self.events_reader = StatusChannelReader(self.process.stdout, self._events_received, self._events_closed)
+
+    def is_running(self):
+        return self.process.poll() == None
+
+    def run_job(self, job, launcher, args):
+        """
+        Returns False if job could not be sent to worker.
+        """
+        job_line = json.dumps({"id":job.get_session_id(), "launcher":launcher, "args":args})
+        try:
+            self.process.stdin.write((job_line + "\n").encode("utf-8"))
+        except (BrokenPipeError, OSError):
+            return False
+
+        self.job = job
+        return True
+
+    def shutdown(self):
+        # Worker exits after its current job when stdin is closed.
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def _events_received(self, events):
+        _status_channel_events(events, self)
+
+    def _events_closed(self):
+        self.process.wait()
+        _render_worker_exited(self)
+
+
+class StatusChannelReader:
+    """
+    Reads JSON line events from render process pipe in GTK thread when data is available.
+    """
+    def __init__(self, pipe_file, events_callback, closed_callback=None):
+        self.pipe_file = pipe_file # Binary file object
+        self.events_callback = events_callback # events_callback(events_list)
+        self.closed_callback = closed_callback
+        self.buffer = b""
+        GLib.io_add_watch(pipe_file.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self._data_available)
+
+    def _data_available(self, fd, condition):
+        try:
+            data = os.read(fd, 65536)
+        except OSError:
+            data = b""
+
+        if len(data) == 0:
+            self.pipe_file.close()
+            if self.closed_callback != None:
+                self.closed_callback()
+            return False # Removes watch.
+
+        lines = (self.buffer + data).split(b"\n")
+        self.buffer = lines.pop() # Incomplete last line
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                print("Invalid status channel line:", line)
+
+        if len(events) > 0:
+            self.events_callback(events)
+        return True
+
+
+def start_status_channel_process(command_list):
+    """
+    Starts headless render process that pushes its status and completed messages
+    to application through a pipe instead of writing message files. Returns Popen object.
+    """
+    read_fd, write_fd = os.pipe()
+    env = dict(os.environ)
+    env[ccrutils.STATUS_CHANNEL_FD_ENV] = str(write_fd)
+    try:
+        process = subprocess.Popen(command_list, env=env, pass_fds=(write_fd,))
+    finally:
+        os.close(write_fd)
+
+    StatusChannelReader(os.fdopen(read_fd, "rb", buffering=0), _status_channel_events)
+    return process
+
+
+def launch_headless_render(job, command_list):
+    """
+    Runs headless render in a persistent render worker process if its launcher 
+    can be run in workers, otherwise starts a new process for it.
+    """
+    launcher = os.path.basename(command_list[1])
+    if launcher in renderworker.WORKER_JOBS:
+        _worker_jobs_queue.append((job, launcher, command_list[2:]))
+        _run_worker_jobs()
+    else:
+        # We need to wait() in thread.
+        command_list_runner = ProcessCommandListRunner(command_list)
+        command_list_runner.start()
+
+def get_render_workers_count():
+    # MLT renders use multiple threads, leave some cores for them.
+    workers_count = (os.cpu_count() or 1) // 2
+    if workers_count < 1:
+        workers_count = 1
+    if workers_count > MAX_RENDER_WORKERS:
+        workers_count = MAX_RENDER_WORKERS
+    return workers_count
+
+def shutdown_render_workers():
+    global _render_workers, _worker_jobs_queue
+    for worker in _render_workers:
+        worker.shutdown()
+    _render_workers = []
+    _worker_jobs_queue = []
+
+def _run_worker_jobs():
+    while len(_worker_jobs_queue) > 0:
+        job, launcher, args = _worker_jobs_queue[0]
+        if job.status == CANCELLED:
+            _worker_jobs_queue.pop(0)
+            continue
+
+        worker = _get_idle_render_worker()
+        if worker == None:
+            return
+
+        if worker.run_job(job, launcher, args) == True:
+            _worker_jobs_queue.pop(0)
+        else:
+            # Worker has exited.
+            _render_workers.remove(worker)
+            worker.shutdown()
+
+def _get_idle_render_worker():
+    for worker in _render_workers:
+        if worker.job == None and worker.is_running() == True:
+            return worker
+
+    running_workers = [worker for worker in _render_workers if worker.is_running() == True]
+    if len(running_workers) >= get_render_workers_count():
+        return None
+
+    global _render_workers_started
+    worker = RenderWorkerProcess(_render_workers_started)
+    _render_workers_started += 1
+    _render_workers.append(worker)
+    return worker
+
+def _status_channel_events(events, worker=None):
+    updated_jobs = []
+    for event in events:
+        if event["event"] in (renderworker.JOB_COMPLETED, renderworker.JOB_FAILED):
+            if worker != None:
+                _render_worker_job_done(worker, event)
+            continue
+
+        if not(event["event"] in (ccrutils.STATUS_EVENT, ccrutils.RENDER_COMPLETED_EVENT)):
+            continue
+
+        ccrutils.set_pushed_event(event["event"], event["id"], event["data"])
+        job = _get_job_for_session(event["id"])
+        if job != None and not(job in updated_jobs):
+            updated_jobs.append(job)
+
+    # Jobs get one update for all events read at once.
+    for job in updated_jobs:
+        if job.status == RENDERING:
+            job.status_pushed = True
+            job.callback_object.update_render_status()
+
+def _get_job_for_session(session_id):
+    for job in _jobs:
+        if str(job.proxy_uid) == str(session_id):
+            return job
+    return None
+
+def _render_worker_job_done(worker, event):
+    job = worker.job
+    worker.job = None
+    if event["event"] == renderworker.JOB_FAILED and job != None:
+        job.render_failed(event["data"])
+
+    _run_worker_jobs()
+
+def _render_worker_exited(worker):
+    if worker in _render_workers:
+        _render_workers.remove(worker)
+
+    # Jobs that were being rendered when worker crashed are failed, the rest get new workers.
+    if worker.job != None:
+        job = worker.job
+        worker.job = None
+        job.render_failed("Render worker exited with code " + str(worker.process.returncode))
+
+    _run_worker_jobs()
+
+
 # ----------------------------------------------------------------- polling
 class ContainerStatusPollingThread(threading.Thread):
     
@@ -1009,8 +1232,9 @@ class ContainerStatusPollingThread(threading.Thread):
     def run(self):
 
         while self.abort == False:
+            # Jobs with status channels push their updates.
             for job in _jobs:
-                if job.status == RENDERING:
+                if job.status == RENDERING and job.status_pushed == False:
                     job.callback_object.update_render_status() # Make sure these methods enter/exit Gtk threads.
 
             # Handling post-app-close jobs rendering.
@@ -1033,4 +1257,5 @@ def shutdown_polling():
         return
     
     _status_polling_thread.shutdown()
+    shutdown_render_workers()
 
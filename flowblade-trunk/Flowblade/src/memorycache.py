@@ -0,0 +1,128 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <https://github.com/jliljebl/flowblade/>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Bounded memory cache for data that can be reloaded from disk when needed, e.g. audio
+waveforms and timeline clip thumbnails.
+
+Cache has capacity in bytes and least recently used items are dropped when
+capacity is exceeded. Keys are (namespace, key) tuples so that different data
+types can share a single memory budget.
+"""
+
+from collections import OrderedDict
+
+# Cache namespaces.
+WAVEFORM = "waveform"
+CLIP_THUMBNAIL = "clip_thumbnail"
+FILMSTRIP = "filmstrip"
+
+DEFAULT_CAPACITY_MB = 256
+MB = 1024 * 1024
+
+_cache = None
+
+
+class LRUMemoryCache:
+
+    def __init__(self, capacity_bytes):
+        self.capacity_bytes = capacity_bytes
+        self.size_bytes = 0
+        self.items = OrderedDict() # (namespace, key) -> (value, size_bytes), most recently used last
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, cache_key):
+        try:
+            value, size_bytes = self.items[cache_key]
+        except KeyError:
+            self.misses += 1
+            raise
+
+        self.items.move_to_end(cache_key)
+        self.hits += 1
+        return value
+
+    def __contains__(self, cache_key):
+        return cache_key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, cache_key):
+        try:
+            return self[cache_key]
+        except KeyError:
+            return None
+
+    def put(self, cache_key, value, size_bytes):
+        if cache_key in self.items:
+            self.remove(cache_key)
+
+        self.items[cache_key] = (value, size_bytes)
+        self.size_bytes += size_bytes
+        self._evict()
+
+    def remove(self, cache_key):
+        try:
+            value, size_bytes = self.items.pop(cache_key)
+            self.size_bytes -= size_bytes
+        except KeyError:
+            pass
+
+    def clear_namespace(self, namespace):
+        for cache_key in list(self.items.keys()):
+            if cache_key[0] == namespace:
+                self.remove(cache_key)
+
+    def clear(self):
+        self.items = OrderedDict()
+        self.size_bytes = 0
+
+    def set_capacity(self, capacity_bytes):
+        self.capacity_bytes = capacity_bytes
+        self._evict()
+
+    def get_stats(self):
+        return {"items": len(self.items), "size_bytes": self.size_bytes, "capacity_bytes": self.capacity_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _evict(self):
+        # Always keep the most recently added item even if it alone exceeds capacity.
+        while self.size_bytes > self.capacity_bytes and len(self.items) > 1:
+            cache_key, (value, size_bytes) = self.items.popitem(last=False)
+            self.size_bytes -= size_bytes
+            self.evictions += 1
+
+
+# ------------------------------------------------------- shared cache
+def get_cache():
+    global _cache
+    if _cache == None:
+        _cache = LRUMemoryCache(DEFAULT_CAPACITY_MB * MB)
+    return _cache
+
+def set_capacity_mb(capacity_mb):
+    get_cache().set_capacity(int(capacity_mb) * MB)
+
+def get_surface_size_bytes(surface):
+    # cairo.ImageSurface
+    return surface.get_stride() * surface.get_height()
@@ -25,6 +25,7 @@ Main functionality of the module is to replace unpickleable
 SwigPyObject MLT objects with pickleable python objects for save, 
 and then create MLT objects from pickled objects when project is loaded.
 """
+import concurrent.futures
 import copy
 import glob
 import fnmatch
@@ -32,6 +33,7 @@ import hashlib
 import os
 import pickle
 import sys
+import threading
 
 from gi.repository import GLib
 
@@ -52,9 +54,9 @@ import utils
 
 # Unpickleable attributes for all objects
 # These are removed at save and recreated at load.
-PROJECT_REMOVE = ['profile','c_seq']
-SEQUENCE_REMOVE = ['profile','field','multitrack','tractor','monitor_clip','vectorscope','audiowave','rgbparade','outputfilter','watermark_filter']
-PLAY_LIST_REMOVE = ['this','sequence','get_name','gain_filter','pan_filter']
+PROJECT_REMOVE = ['profile','c_seq','media_index']
+SEQUENCE_REMOVE = ['profile','field','multitrack','tractor','monitor_clip','vectorscope','audiowave','rgbparade','outputfilter','watermark_filter','clip_index']
+PLAY_LIST_REMOVE = ['this','sequence','get_name','gain_filter','pan_filter','clip_starts','clip_start','get_clip_index_at']
 CLIP_REMOVE = ['this','clip_length']
 TRANSITION_REMOVE = ['this']
 FILTER_REMOVE = ['mlt_filter','mlt_filters']
@@ -63,6 +65,9 @@ MEDIA_FILE_REMOVE = ['icon']
 # Used to flag a not found relative path
 NOT_FOUND = "/not_found_not_found/not_found"
         
+# Max threads used to resolve media paths and create icons on load.
+MEDIA_LOAD_THREADS = 16
+
 # Used to send messages when loading project, set at callsite.
 load_dialog = None
 
@@ -93,6 +98,25 @@ _xml_new_paths_for_profile_change = None
 # MLT removed quite few services for 7.0 and we need to inform users if any of those cannot be loaded.
 dead_compositors = 0
 
+# Delta save data. Pickled sequences from last save are kept here and are reused in next save 
+# for sequences that have not been changed, see save_project().
+_saved_sequences_project = None
+_saved_sequences_preview_scale = None
+_saved_sequence_blobs = {} # sequence uid -> pickled pickleable sequence bytes
+
+
+class _PickledSequence:
+    """
+    Already pickled sequence in project save data. Pickling this writes out sequence 
+    bytes as is, and unpickling project file creates Sequence object from them, 
+    so saves done with or without cached sequences load the same way.
+    """
+    def __init__(self, blob):
+        self.blob = blob
+
+    def __reduce__(self):
+        return (pickle.loads, (self.blob,))
+
 
 class FileProducerNotFoundError(Exception):
 
@@ -116,7 +140,25 @@ def _show_msg(msg):
 # -------------------------------------------------- SAVE
 def save_project(project, file_path, changed_profile_desc=None):
     """
-    Creates pickleable project object
+    Creates pickleable project object and writes it to file.
+    """
+    save_data = get_project_save_data(project, changed_profile_desc)
+    write_project_save_data(save_data, file_path)
+
+def save_project_in_thread(project, file_path, done_callback):
+    """
+    Creates save data in GUI thread and writes it to file in a worker thread.
+    done_callback(file_path, error) is called in GUI thread after write, 'error' is None if save succeeded.
+    """
+    save_data = get_project_save_data(project)
+    save_thread = ProjectSaveThread(save_data, file_path, done_callback)
+    save_thread.start()
+    return save_thread
+
+def get_project_save_data(project, changed_profile_desc=None):
+    """
+    Returns pickled project. Returned bytes are a snapshot of project that 
+    is not changed by later edits.
     """
     print("Saving project...")# + os.path.basename(file_path))
     
@@ -184,19 +226,93 @@ def save_project(project, file_path, changed_profile_desc=None):
     s_proj.media_files = media_files
 
     # Replace sequences with pickleable objects
-    sequences = []
-    for i in range(0, len(project.sequences)):
-        add_seq = project.sequences[i]
-        sequences.append(get_p_sequence(add_seq))
-    s_proj.sequences = sequences
+    s_proj.sequences = _get_p_sequences(project, changed_profile_desc)
 
     # Remove unpickleable attributes
     remove_attrs(s_proj, PROJECT_REMOVE)
 
-    # Write out file.
+    return pickle.dumps(s_proj)
+
+def write_project_save_data(save_data, file_path):
     with atomicfile.AtomicFileWriter(file_path, "wb") as afw:
         outfile = afw.get_file()
-        pickle.dump(s_proj, outfile)
+        outfile.write(save_data)
+
+
+class ProjectSaveThread(threading.Thread):
+    
+    def __init__(self, save_data, file_path, done_callback):
+        threading.Thread.__init__(self)
+        self.save_data = save_data
+        self.file_path = file_path
+        self.done_callback = done_callback
+
+    def run(self):
+        error = None
+        try:
+            write_project_save_data(self.save_data, self.file_path)
+        except Exception as e:
+            error = e
+
+        GLib.idle_add(self.done_callback, self.file_path, error)
+
+
+def _get_p_sequences(project, changed_profile_desc):
+    # Save data for sequences is cached between saves and unchanged sequences are written
+    # from cache. Current sequence is always pickled again because many edits e.g. filter
+    # parameter changes are done without creating edit actions.
+    global _saved_sequences_project, _saved_sequences_preview_scale, _saved_sequence_blobs
+    if (changed_profile_desc != None or snapshot_paths != None 
+        or project_proxy_mode == appconsts.CONVERTING_TO_USE_PROXY_MEDIA 
+        or project_proxy_mode == appconsts.CONVERTING_TO_USE_ORIGINAL_MEDIA):
+        # These saves change paths or in/out points and data cannot be used for normal saves.
+        if project is editorstate.project:
+            for seq in project.sequences:
+                build_sequence(seq)
+        return [get_p_sequence(seq) for seq in project.sequences]
+
+    if _saved_sequences_project is not project or _saved_sequences_preview_scale != project.preview_scale:
+        _saved_sequence_blobs = {}
+    _saved_sequences_project = project
+    _saved_sequences_preview_scale = project.preview_scale
+
+    sequences = []
+    blobs = {}
+    for seq in project.sequences:
+        try:
+            if seq is project.c_seq:
+                raise KeyError(seq.uid)
+            blob = _saved_sequence_blobs[seq.uid]
+        except KeyError:
+            if is_sequence_built(seq):
+                blob = pickle.dumps(get_p_sequence(seq))
+            else:
+                blob = pickle.dumps(_get_unbuilt_p_sequence(seq))
+        blobs[seq.uid] = blob
+        sequences.append(_PickledSequence(blob))
+
+    # Deleted sequences are dropped here.
+    _saved_sequence_blobs = blobs
+
+    return sequences
+
+def _get_unbuilt_p_sequence(seq):
+    # Unbuilt sequence is still in pickleable form, clip index may have been created for lookups.
+    s_seq = copy.copy(seq)
+    remove_attrs(s_seq, SEQUENCE_REMOVE)
+    return s_seq
+
+def sequence_changed(seq):
+    """
+    Must be called when a sequence that is not current sequence is changed
+    or current sequence changes, so that changes are saved on next save.
+    """
+    _saved_sequence_blobs.pop(seq.uid, None)
+
+def clear_saved_sequences():
+    global _saved_sequences_project, _saved_sequence_blobs
+    _saved_sequences_project = None
+    _saved_sequence_blobs = {}
 
 def get_p_sequence(sequence):
     """
@@ -422,32 +538,29 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
     
     previewscale.update_project_profile_to_preview_scaling(project)
 
-    for k, media_file in project.media_files.items():
+    # Paths for media files are resolved concurrently because stat calls and relative path 
+    # searches are slow on network storage, results are applied here in load order.
+    media_files = list(project.media_files.values())
+    # Progress is shown here as paths get resolved, worker threads do not write messages.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MEDIA_LOAD_THREADS) as executor:
+        futures = [executor.submit(_get_media_file_load_paths, media_file) for media_file in media_files]
+        done = 0
+        for future in concurrent.futures.as_completed(futures):
+            done = done + 1
+            _show_msg(_("Resolving media file paths") + " " + str(done) + " / " + str(len(futures)))
+        load_paths = [future.result() for future in futures]
+
+    for media_file, paths in zip(media_files, load_paths):
         media_file.current_frame = 0 # this is always reset on load, value is not considered persistent.
 
         # Avoid crash in case path attribute is missing (color clips).
         # All code in loop below handles issues not related to color clips.
-        if not hasattr(media_file, "path"):
+        if paths == None:
             continue
-            
-        # Try to find relative path files if needed for non-proxy media files
-        orig_path = media_file.path # looking for missing path changes it and we need save this info for user info dialog on missing asset
-        if media_file.is_proxy_file == False:
-            if media_file.type != appconsts.PATTERN_PRODUCER and media_file.type != appconsts.IMAGE_SEQUENCE:
-                media_file.path = get_media_asset_path(media_file.path, _load_file_path)
-            elif media_file.type == appconsts.IMAGE_SEQUENCE:
-                media_file.path = get_img_seq_media_path(media_file.path, _load_file_path)
-        else:
-            # Try to fix missing proxy project media files.
-            # This is all just best effort, proxy files should never be deleted during editing
-            # and proxy projects should not be moved.
-            if media_file.type != appconsts.PATTERN_PRODUCER and media_file.type != appconsts.IMAGE_SEQUENCE:
-                media_file.path = get_media_asset_path(media_file.path, _load_file_path)
-                if media_file.path == NOT_FOUND:
-                    fixed_second_path = get_media_asset_path(media_file.second_file_path, _load_file_path)
-                    if fixed_second_path != NOT_FOUND:
-                        media_file.path = fixed_second_path
-                        media_file.second_file_path = fixed_second_path
+
+        orig_path, path, second_file_path, use_original_media = paths
+        media_file.path = path
+        media_file.second_file_path = second_file_path
 
         if media_file.path == NOT_FOUND:
             raise FileProducerNotFoundError(orig_path)
@@ -458,47 +571,31 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
         proxy_path_dict[media_file.path] = media_file.second_file_path
         
         # Try to fix possible missing proxy files for media assets if we are in proxy mode.
-        if not os.path.isfile(media_file.path) and media_file.is_proxy_file and project_proxy_mode == appconsts.USE_PROXY_MEDIA:
-            if os.path.isfile(media_file.second_file_path): # Original media file exists, use it
-                media_file.set_as_original_media_file()
+        if use_original_media == True:
+            media_file.set_as_original_media_file()
 
         _show_msg("Loading Media Item: " + media_file.name)
 
-    # Add MLT objects to sequences.
-    global all_clips, sync_clips
-    seq_count = 1
+    # Add MLT objects to current sequence. Other sequences are kept as python data 
+    # and MLT objects for them are created when first needed, see build_sequence().
     for seq in project.sequences:
-            
         persistancecompat.FIX_MISSING_SEQUENCE_ATTRS(seq)
+        seq.lazy_load_version = project.SAVEFILE_VERSION
 
-        _show_msg(_("Building sequence ") + str(seq_count))
-        all_clips = {}
-        sync_clips = []
-                
-        seq.profile = project.profile
-        fill_sequence_mlt(seq, project.SAVEFILE_VERSION)
+    _show_msg(_("Building sequence ") + str(project.c_seq_index + 1))
+    build_sequence(project.sequences[project.c_seq_index])
 
-        handle_seq_watermark(seq)
-
-        if not hasattr(seq, "seq_len"):
-            seq.update_edit_tracks_length()
-
-        seq_count = seq_count + 1
-
-    all_clips = {}
-    sync_clips = []
-    
     # Bins need fix for added attr.
     for bin in project.bins:
         persistancecompat.FIX_MISSING_BIN_ATTRS(bin)
     persistancecompat.FIX_MISSING_BIN_ATTRS(project.c_bin)
  
     if icons_and_thumnails == True:
-        count = 1
-        for k, media_file in project.media_files.items():
-            _show_msg(_("Loading icons") +  " " + str(count))
-            media_file.create_icon()
-            count = count + 1
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MEDIA_LOAD_THREADS) as executor:
+            count = 1
+            for icon_created in executor.map(_create_media_file_icon, media_files):
+                _show_msg(_("Loading icons") +  " " + str(count))
+                count = count + 1
     
     project.c_seq = project.sequences[project.c_seq_index]
     if icons_and_thumnails == True:
@@ -506,6 +603,97 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
     
     return project
 
+def _get_media_file_load_paths(media_file):
+    """
+    Returns (orig_path, path, second_file_path, use_original_media) for media file 
+    or None for media without path. Called from worker threads, must not modify media file.
+    """
+    if not hasattr(media_file, "path"):
+        return None
+
+    # Try to find relative path files if needed for non-proxy media files
+    orig_path = media_file.path # looking for missing path changes it and we need save this info for user info dialog on missing asset
+    path = media_file.path
+    second_file_path = media_file.second_file_path
+    if media_file.is_proxy_file == False:
+        if media_file.type != appconsts.PATTERN_PRODUCER and media_file.type != appconsts.IMAGE_SEQUENCE:
+            path = get_media_asset_path(path, _load_file_path, False)
+        elif media_file.type == appconsts.IMAGE_SEQUENCE:
+            path = get_img_seq_media_path(path, _load_file_path, False)
+    else:
+        # Try to fix missing proxy project media files.
+        # This is all just best effort, proxy files should never be deleted during editing
+        # and proxy projects should not be moved.
+        if media_file.type != appconsts.PATTERN_PRODUCER and media_file.type != appconsts.IMAGE_SEQUENCE:
+            path = get_media_asset_path(path, _load_file_path, False)
+            if path == NOT_FOUND:
+                fixed_second_path = get_media_asset_path(second_file_path, _load_file_path, False)
+                if fixed_second_path != NOT_FOUND:
+                    path = fixed_second_path
+                    second_file_path = fixed_second_path
+
+    use_original_media = False
+    if path != NOT_FOUND and media_file.is_proxy_file and project_proxy_mode == appconsts.USE_PROXY_MEDIA:
+        if not os.path.isfile(path) and os.path.isfile(second_file_path): # Original media file exists, use it
+            use_original_media = True
+
+    return (orig_path, path, second_file_path, use_original_media)
+
+def _create_media_file_icon(media_file):
+    # Called from worker threads, media files create only their own icon surfaces.
+    media_file.create_icon()
+    return True
+
+def build_sequence(seq):
+    """
+    Creates MLT objects for sequence if it was left unbuilt on load. 
+    Must be called before MLT objects of a non-current sequence are used.
+    Raises FileProducerNotFoundError and leaves sequence unbuilt if media is missing.
+    """
+    if not hasattr(seq, "lazy_load_version"):
+        return
+
+    global all_clips, sync_clips
+    all_clips = {}
+    sync_clips = []
+
+    # fill_sequence_mlt() sets sequence being built as current sequence.
+    c_seq = getattr(editorstate.project, "c_seq", None)
+
+    # Py data is kept so that sequence stays unbuilt if some media is missing.
+    py_tracks = seq.tracks
+    py_compositors = seq.compositors
+
+    seq.profile = editorstate.project.profile
+    try:
+        fill_sequence_mlt(seq, seq.lazy_load_version)
+    except FileProducerNotFoundError:
+        seq.tracks = py_tracks
+        seq.compositors = py_compositors
+        all_clips = {}
+        sync_clips = []
+        editorstate.project.c_seq = c_seq
+        if c_seq != None and c_seq is not seq:
+            resync.sequence_changed(c_seq)
+        raise
+    del seq.lazy_load_version
+
+    handle_seq_watermark(seq)
+
+    if not hasattr(seq, "seq_len"):
+        seq.update_edit_tracks_length()
+
+    all_clips = {}
+    sync_clips = []
+
+    if c_seq != None and c_seq is not seq:
+        editorstate.project.c_seq = c_seq
+        # Building added sync clips of built sequence into current sequence sync data.
+        resync.sequence_changed(c_seq)
+
+def is_sequence_built(seq):
+    return not hasattr(seq, "lazy_load_version")
+
 def fill_sequence_mlt(seq, SAVEFILE_VERSION):
     """
     Replaces sequences py objects with mlt objects
@@ -603,6 +791,9 @@ def fill_sequence_mlt(seq, SAVEFILE_VERSION):
     # This sets MLT properties that actually do mute
     seq.set_tracks_mute_state()
 
+    # Clips were added to tracks directly.
+    seq.tracks_clips_changed()
+
     seq.length = None
 
 def fill_track_mlt(mlt_track, py_track):
@@ -750,6 +941,7 @@ def append_clip(track, clip, clip_in, clip_out):
     clip.clip_out = clip_out
     track.clips.append(clip) # py
     track.append(clip, clip_in, clip_out) # mlt
+    track.sequence.clip_added_to_track(clip, track)
     resync.clip_added_to_timeline(clip, track)
 
 # --------------------------------------------------------- watermarks
@@ -764,23 +956,23 @@ def handle_seq_watermark(seq):
         seq.watermark_file_path = None
 
 # --------------------------------------------------------- relative paths
-def get_media_asset_path(path, load_file_path):
+def get_media_asset_path(path, load_file_path, show_msg=True):
     # Load order absolute, relative
     if editorpersistance.prefs.media_load_order == appconsts.LOAD_ABSOLUTE_FIRST:
         if not os.path.isfile(path):
-            path = get_relative_path(load_file_path, path)
+            path = get_relative_path(load_file_path, path, show_msg)
         return path
     # Load order relative, absolute
     elif editorpersistance.prefs.media_load_order == appconsts.LOAD_RELATIVE_FIRST:
         abspath = path
-        path = get_relative_path(load_file_path, path)
+        path = get_relative_path(load_file_path, path, show_msg)
         if path == NOT_FOUND:
             path = abspath
         return path
     else: # Only look in existing absolute path
         return path
 
-def get_img_seq_media_path(path, load_file_path):
+def get_img_seq_media_path(path, load_file_path, show_msg=True):
     asset_folder, asset_file_name = os.path.split(path)
     
     look_up_file = asset_folder + "/" + utils.get_img_seq_glob_lookup_name(asset_file_name)
@@ -791,19 +983,20 @@ def get_img_seq_media_path(path, load_file_path):
             # Absolute path file present
             return path
         # Look for relative path
-        path = get_img_seq_relative_path(load_file_path, path)
+        path = get_img_seq_relative_path(load_file_path, path, show_msg)
     # Load order relative, absolute
     elif editorpersistance.prefs.media_load_order == appconsts.LOAD_RELATIVE_FIRST:
         abspath = path
-        path = get_img_seq_relative_path(load_file_path, path)
+        path = get_img_seq_relative_path(load_file_path, path, show_msg)
         if path == NOT_FOUND:
             path = abspath
         return path
     return path
 
-def get_relative_path(project_file_path, asset_path):
+def get_relative_path(project_file_path, asset_path, show_msg=True):
     name = os.path.basename(asset_path)
-    _show_msg(_("Relative file search for ")  + name + "...")
+    if show_msg == True:
+        _show_msg(_("Relative file search for ")  + name + "...")
     matches = []
     asset_folder, asset_file_name = os.path.split(asset_path)
     project_folder, project_file_name =  os.path.split(project_file_path)
@@ -818,9 +1011,10 @@ def get_relative_path(project_file_path, asset_path):
     else:
         return NOT_FOUND # no relative path found
 
-def get_img_seq_relative_path(project_file_path, asset_path):
+def get_img_seq_relative_path(project_file_path, asset_path, show_msg=True):
     name = os.path.basename(asset_path)
-    _show_msg(_("Relative file search for ")  + name + "...")
+    if show_msg == True:
+        _show_msg(_("Relative file search for ")  + name + "...")
     asset_folder, asset_file_name = os.path.split(asset_path)
     look_up_file_name = utils.get_img_seq_glob_lookup_name(asset_file_name)
     
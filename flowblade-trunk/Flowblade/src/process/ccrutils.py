@@ -21,11 +21,18 @@
 """
 Module provides utility methods for modules creating headless render procesesses.
 Created originally for container clips rendering, hence ContainerClipsRenderingUTILS.
+
+Render processes started by application with a status channel push status and completed
+messages to application as JSON lines instead of writing message files. Application
+keeps pushed messages here and message files are only read for sessions that have not pushed
+anything.
 """
 
+import json
 import os
 import pickle
 import sys
+import threading
 
 import appconsts
 import atomicfile
@@ -41,6 +48,22 @@ ABORT_MSG_FILE = "abort"
 RENDER_DATA_FILE = "render_data"
 RANGE_RENDER_DATA_DICT = "proc_fctx_dict"
 
+# Environment variable with file descriptor of status channel pipe given to render process.
+STATUS_CHANNEL_FD_ENV = "FLOWBLADE_STATUS_FD"
+
+# Status channel events.
+STATUS_EVENT = "status"
+RENDER_COMPLETED_EVENT = "render_completed"
+
+# Application side pushed messages.
+_pushed_status_messages = {} # session_id -> latest status message
+_pushed_completed_sessions = set()
+
+# Render process side.
+_session_id = None
+_status_push_callback = None # callback(event, session_id, data) or None if messages are written to files
+_status_channel_checked = False
+
 _session_folder = None
 _clip_frames_folder_internal = None
 _rendered_frames_folder_internal = None
@@ -51,6 +74,7 @@ _render_data = None
 # ----------------------------------------------------- interface with message files, used by main app
 # We are using message files to communicate with application.
 def clear_flag_files(parent_folder, session_id):
+    clear_pushed_messages(session_id)
     folder = _get_session_folder(parent_folder, session_id)
     
     completed_msg = folder + "/" + COMPLETED_MSG_FILE
@@ -96,6 +120,9 @@ def read_misc_session_data(parent_folder, session_id, file_name):
     return misc_data
         
 def session_render_complete(parent_folder, session_id):
+    if str(session_id) in _pushed_completed_sessions:
+        return True
+
     folder = _get_session_folder(parent_folder, session_id)
     completed_msg_path = folder + "/" + COMPLETED_MSG_FILE
 
@@ -113,6 +140,11 @@ def get_session_status(parent_folder, session_id):
     return (step, frame, length, elapsed)
 
 def get_session_status_message(parent_folder, session_id):
+    try:
+        return _pushed_status_messages[str(session_id)]
+    except KeyError:
+        pass
+
     try:
         status_msg_file = _get_session_folder(parent_folder, session_id) + "/" + STATUS_MSG_FILE
         with open(status_msg_file) as f:
@@ -121,6 +153,16 @@ def get_session_status_message(parent_folder, session_id):
     except:
         return None
 
+def set_pushed_event(event, session_id, data):
+    if event == STATUS_EVENT:
+        _pushed_status_messages[str(session_id)] = data
+    elif event == RENDER_COMPLETED_EVENT:
+        _pushed_completed_sessions.add(str(session_id))
+
+def clear_pushed_messages(session_id):
+    _pushed_status_messages.pop(str(session_id), None)
+    _pushed_completed_sessions.discard(str(session_id))
+
 def read_range_render_data(parent_folder, session_id):
     try:
         folder = _get_session_folder(parent_folder, session_id)
@@ -158,7 +200,8 @@ def get_render_folder_for_session_id(parent_folder, session_id):
 
 # ------------------------------------------------------ headless session folders and files, used by render processes
 def init_session_folders(parent_folder, session_id):
-    global _session_folder, _clip_frames_folder_internal, _rendered_frames_folder_internal
+    global _session_id, _session_folder, _clip_frames_folder_internal, _rendered_frames_folder_internal
+    _session_id = session_id
     _session_folder = _get_session_folder(parent_folder, session_id)
     _clip_frames_folder_internal = _session_folder + CLIP_FRAMES_DIR
     _rendered_frames_folder_internal = _session_folder + RENDERED_FRAMES_DIR
@@ -175,6 +218,7 @@ def delete_internal_folders(parent_folder, session_id):
     # This works only if clip frames and rendered frames folder are empty already.
     # This is used by motinheadless.py that uses container clips folders only to communicate render status
     # back and forth.
+    clear_pushed_messages(session_id)
     _session_folder = _get_session_folder(parent_folder, session_id)
     _clip_frames_folder_internal = _session_folder + CLIP_FRAMES_DIR
     _rendered_frames_folder_internal = _session_folder + RENDERED_FRAMES_DIR
@@ -221,7 +265,16 @@ def preview_frames_folder():
     else:
         return _render_data.render_dir + appconsts.CC_PREVIEW_RENDER_DIR
         
+def set_status_push_callback(callback):
+    # Render workers push messages through their own events pipe.
+    global _status_push_callback, _status_channel_checked
+    _status_push_callback = callback
+    _status_channel_checked = True
+
 def write_status_message(msg):
+    if _push_event(STATUS_EVENT, msg) == True:
+        return
+
     try:
         status_msg_file = session_folder_saved_global() + "/" + STATUS_MSG_FILE
         with atomicfile.AtomicFileWriter(status_msg_file, "w") as afw:
@@ -231,12 +284,35 @@ def write_status_message(msg):
         pass # this failing because we can't get file access will show as progress hickup to user, we don't care
 
 def write_completed_message():
+    if _push_event(RENDER_COMPLETED_EVENT, None) == True:
+        return
+
     completed_msg_file = session_folder_saved_global() + "/" + COMPLETED_MSG_FILE
     script_text = "##completed##" # let's put something in here
     with atomicfile.AtomicFileWriter(completed_msg_file, "w") as afw:
         script_file = afw.get_file()
         script_file.write(script_text)
 
+def _push_event(event, data):
+    # Returns False if message needs to be written into file.
+    global _status_push_callback, _status_channel_checked
+    if _status_channel_checked == False:
+        _status_channel_checked = True
+        if STATUS_CHANNEL_FD_ENV in os.environ:
+            try:
+                _status_push_callback = StatusChannelWriter(int(os.environ[STATUS_CHANNEL_FD_ENV])).write_event
+            except (ValueError, OSError) as e:
+                print("Status channel could not be opened, using message files:", e)
+
+    if _status_push_callback == None:
+        return False
+
+    try:
+        _status_push_callback(event, _session_id, data)
+    except (BrokenPipeError, OSError):
+        return False
+    return True
+
 def write_range_render_data(proc_fctx_dict):
     out_file_path = session_folder_saved_global() + "/" + RANGE_RENDER_DATA_DICT
     with atomicfile.AtomicFileWriter(out_file_path, "wb") as afw:
@@ -275,6 +351,20 @@ def abort_requested():
     else:
         return False
 
+class StatusChannelWriter:
+    """
+    Writes status channel events into pipe given to render process.
+    """
+    def __init__(self, fd):
+        self.channel = os.fdopen(fd, "w", buffering=1)
+        self.lock = threading.Lock()
+
+    def write_event(self, event, session_id, data=None):
+        # Render threads and process main thread can both write events.
+        with self.lock:
+            self.channel.write(json.dumps({"event":event, "id":session_id, "data":data}) + "\n")
+
+
 # ---- Debug helper
 def prints_to_log_file(log_file):
     so = se = open(log_file, 'w', buffering=1)
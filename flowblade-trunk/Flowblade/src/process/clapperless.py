@@ -23,10 +23,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import logging, time, struct, subprocess, sys, os, array, argparse
+import logging, time, struct, subprocess, sys, os, argparse
 import tempfile, hashlib, re
 import numpy
 
+import atomicfile
 import userfolders
 
 OFFSETS_DATA_FILE = "audio_offsets_data"
@@ -34,6 +35,22 @@ OFFSETS_DATA_FILE_ID_DEFAULT = "idstr_default"
 
 MAGIC_SEPARATOR = "##¤¤%%¤¤##¤¤%%¤¤##"
 
+ENVELOPE_CACHE_PREFIX = "clapperless-"
+ENVELOPE_READ_SECONDS = 60 # Audio is read and envelope computed in chunks of this length.
+
+# Offset search modes, set by the command line option --search
+SEARCH_AUTO = "auto"
+SEARCH_FULL = "full"
+SEARCH_HIERARCHICAL = "hierarchical"
+
+HIERARCHICAL_MIN_LENGTH = 2**17 # Correlation length in blocks for auto mode to use hierarchical search, ~87 min at 25 blocks/s.
+DECIMATION = 16 # Blocks averaged for coarse envelopes.
+COARSE_CANDIDATES = 3 # Best coarse correlation peaks refined at full rate.
+REFINE_RADIUS = 2 * DECIMATION # Full rate shifts searched on both sides of coarse candidates.
+
+# Offsets with normalized correlation below this are reported as unreliable.
+LOW_CONFIDENCE = 0.3
+
 __version__ = "0.99.8"
 
 """
@@ -85,6 +102,8 @@ def submax(left, middle, right):
     """
     L = middle - left   # L and R are both positive if middle is the
     R = middle - right  # observed max of the integer samples
+    if R + L == 0:
+        return 0.0 # flat, no better estimate than middle
     return 0.5 * (R - L) / (R + L)
     # Derivation: Consider a quadratic q(x) := P(0) - P(x).  Then q(x) has
     # two roots, one at 0 and one at z, and the extreme is at (0+z)/2
@@ -117,18 +136,62 @@ def rigidalign(reference, targets):
     @rtype: Sequence(Number)
 
     """
+    return [shift for shift, confidence in align(reference, targets, SEARCH_FULL)]
+
+def align(reference, targets, search=SEARCH_AUTO):
+    """
+    Like rigidalign() but returns list of (shift, confidence) tuples.
+
+    Confidence is normalized cross-correlation of reference and target
+    at found shift, values below LOW_CONFIDENCE mean that shift is
+    likely wrong.
+
+    SEARCH_HIERARCHICAL first correlates envelopes decimated by DECIMATION
+    to find candidate shifts and then searches only windows around best
+    candidates at full rate, so no FFT of full length envelopes is needed.
+    SEARCH_AUTO uses it when correlation length is larger than
+    HIERARCHICAL_MIN_LENGTH.
+    """
+    if search == SEARCH_AUTO:
+        if len(reference) + max(len(t) for t in targets) - 1 > HIERARCHICAL_MIN_LENGTH:
+            search = SEARCH_HIERARCHICAL
+        else:
+            search = SEARCH_FULL
+
+    reference = reference - numpy.mean(reference)
+    targets = [t - numpy.mean(t) for t in targets]
+    if search == SEARCH_HIERARCHICAL:
+        shifts = _hierarchical_shifts(reference, targets)
+    else:
+        shifts = _full_shifts(reference, targets)
+
+    results = []
+    for i in range(len(targets)):
+        confidence = _normalized_correlation(reference, targets[i], int(round(shifts[i])))
+        # Sign reversed to move the target instead of the reference
+        results.append((-shifts[i], confidence))
+    return results
+
+def _cross_correlations(reference, targets, L):
+    # All targets are transformed and correlated with the single reference
+    # transform in batched FFTs, rows are zero padded to length L.
+    fref = numpy.fft.rfft(reference, L).conj()
+    batch = numpy.zeros((len(targets), L))
+    for i in range(len(targets)):
+        batch[i, :len(targets[i])] = targets[i]
+    return numpy.fft.irfft(fref * numpy.fft.rfft(batch, axis=1), L, axis=1)
+
+def _full_shifts(reference, targets):
     # L is the maximum size of a cross-correlation between the
     # reference and any of the targets.
     L = len(reference) + max(len(t) for t in targets) - 1
     # We round up L to the next power of 2 for speed in the FFT.
     L = nextpow2(L)
-    reference = reference - numpy.mean(reference)
-    fref = numpy.fft.rfft(reference, L).conj()
+    xcorrs = _cross_correlations(reference, targets, L)
+
     shifts = []
-    for t in targets:
-        t = t - numpy.mean(t)
-        # Compute cross-correlation
-        xcorr = numpy.fft.irfft(fref * numpy.fft.rfft(t, L))
+    for i in range(len(targets)):
+        xcorr = xcorrs[i]
         # shift maximizes dotproduct(t[shift:],reference)
         # int() to convert numpy.int32 to python int
         shift = int(numpy.argmax(xcorr))
@@ -137,12 +200,89 @@ def rigidalign(reference, targets):
                                  xcorr[(shift + 1) % L])
         shift = shift + subsample_shift
         # shift is now a float indicating the interpolated maximum
-        if shift >= len(t):  # Negative shifts appear large and positive
-            shift -= L       # This corrects them to be negative
-        shifts.append(-shift)
-        # Sign reversed to move the target instead of the reference
+        if shift >= len(targets[i]):  # Negative shifts appear large and positive
+            shift -= L                # This corrects them to be negative
+        shifts.append(shift)
     return shifts
 
+def _hierarchical_shifts(reference, targets):
+    coarse_reference = _decimate(reference, DECIMATION)
+    coarse_targets = [_decimate(t, DECIMATION) for t in targets]
+    L = nextpow2(len(coarse_reference) + max(len(t) for t in coarse_targets) - 1)
+    xcorrs = _cross_correlations(coarse_reference, coarse_targets, L)
+
+    shifts = []
+    for i in range(len(targets)):
+        t = targets[i]
+        best_shift = 0
+        best_value = None
+        for coarse_shift in _get_peak_shifts(xcorrs[i], len(coarse_targets[i]), L):
+            center = coarse_shift * DECIMATION
+            for shift in range(center - REFINE_RADIUS, center + REFINE_RADIUS + 1):
+                value = _correlation(reference, t, shift)
+                if best_value == None or value > best_value:
+                    best_shift = shift
+                    best_value = value
+
+        # Maximum may be just outside refined window.
+        left = _correlation(reference, t, best_shift - 1)
+        right = _correlation(reference, t, best_shift + 1)
+        while left > best_value or right > best_value:
+            if left > right:
+                best_shift, best_value, right = best_shift - 1, left, best_value
+                left = _correlation(reference, t, best_shift - 1)
+            else:
+                best_shift, best_value, left = best_shift + 1, right, best_value
+                right = _correlation(reference, t, best_shift + 1)
+
+        shifts.append(best_shift + submax(left, best_value, right))
+    return shifts
+
+def _get_peak_shifts(xcorr, target_length, L):
+    # Shifts for COARSE_CANDIDATES highest values of xcorr that are not next to each other.
+    peaks = []
+    for index in numpy.argsort(xcorr)[::-1]:
+        index = int(index)
+        if all(abs(index - peak) > 1 for peak in peaks):
+            peaks.append(index)
+            if len(peaks) == COARSE_CANDIDATES:
+                break
+
+    shifts = []
+    for index in peaks:
+        if index >= target_length:  # Negative shifts appear large and positive
+            index -= L
+        shifts.append(index)
+    return shifts
+
+def _decimate(envelope, factor):
+    count = len(envelope) // factor
+    return numpy.mean(envelope[:count * factor].reshape(count, factor), 1)
+
+def _overlap(reference, target, shift):
+    # Parts of reference and target that are compared when target is shifted, 
+    # reference[n] is compared to target[n + shift].
+    start = max(0, -shift)
+    end = min(len(reference), len(target) - shift)
+    if end <= start:
+        return None, None
+    return reference[start:end], target[start + shift:end + shift]
+
+def _correlation(reference, target, shift):
+    ref_part, target_part = _overlap(reference, target, shift)
+    if ref_part is None:
+        return 0.0
+    return float(numpy.dot(ref_part, target_part))
+
+def _normalized_correlation(reference, target, shift):
+    ref_part, target_part = _overlap(reference, target, shift)
+    if ref_part is None:
+        return 0.0
+    norm = numpy.sqrt(numpy.dot(ref_part, ref_part) * numpy.dot(target_part, target_part))
+    if norm == 0:
+        return 0.0
+    return float(numpy.dot(ref_part, target_part) / norm)
+
 class Envelope:
     
     def __init__(self, filename, args):
@@ -169,7 +309,7 @@ class Envelope:
         # use filename with optionale time slice info for caching
         if args.use_cache:
             self.read_cache(filename)
-        if self.envelope:
+        if self.envelope is not None:
             return
 
         logging.info("read file: %s" % filename)
@@ -240,24 +380,32 @@ class Envelope:
                 sys.exit(1)
 
         blocksize=int((samplerate/args.rate))
+        block_bytes = blocksize * framesize
+        read_size = block_bytes * args.rate * ENVELOPE_READ_SECONDS
 
-        self.envelope = array.array('f')
+        # Each chunk is reshaped to one row per envelope block and averaged with
+        # single numpy calls, partial block at end of stream is dropped.
+        envelope_parts = []
         sec = 0
-        fframes = args.rate
-        while fframes == args.rate:
-            sz = blocksize * framesize * fframes # = 1sec
-            data = sp.stdout.read(sz)
-            if len(data) < sz:
-                fframes = int(len(data) / (blocksize * framesize))
-                data = data[:(fframes * blocksize * framesize)]
-            sec +=1
-            sys.stderr.write(time.strftime('\r%H:%M:%S', time.gmtime(sec)))
-            a = array.array('h', data)
-            a_abs =  numpy.abs(a)
-            a_abs.shape = (fframes, blocksize)
-            a_mean = numpy.mean(a_abs, 1)
-            self.envelope.extend(a_mean)
+        while True:
+            data = sp.stdout.read(read_size)
+            usable = len(data) - len(data) % block_bytes
+            if usable > 0:
+                samples = numpy.frombuffer(data, dtype='<i2', count=usable // 2)
+                blocks = numpy.abs(samples.astype(numpy.int32)).reshape(-1, blocksize * framesize // 2)
+                envelope_parts.append(numpy.mean(blocks, 1, dtype=numpy.float64).astype(numpy.float32))
+                sec += len(blocks) // args.rate
+                sys.stderr.write(time.strftime('\r%H:%M:%S', time.gmtime(sec)))
+            if len(data) < read_size:
+                break
         sys.stderr.write('\n')
+        sp.stdout.close()
+        sp.wait()
+
+        if len(envelope_parts) > 0:
+            self.envelope = numpy.concatenate(envelope_parts)
+        else:
+            self.envelope = numpy.zeros(0, dtype=numpy.float32)
 
         fframes = len(self.envelope)
         duration_hms =  time.strftime('%H:%M:%S',
@@ -269,29 +417,40 @@ class Envelope:
             self.write_cache()
             
     def read_cache(self, name):
-        hash = "%s-%s" % (os.path.basename(sys.argv[0]),
-                          hashlib.md5(name.encode('utf-8')).hexdigest())
+        # Cache key has file size and modification time so that envelopes are
+        # computed again for changed files, rate changes envelope too.
+        try:
+            file_stat = os.stat(self.filename)
+        except OSError:
+            logging.debug("no envelope cache for: %s" % self.filename)
+            self.cachename = None
+            self.envelope = None
+            return
+        key = "%s|%d|%d|%d" % (name, file_stat.st_size, file_stat.st_mtime_ns, self.args.rate)
+        hash = ENVELOPE_CACHE_PREFIX + hashlib.md5(key.encode('utf-8')).hexdigest()
         self.cachename = os.path.join(self.args.cache_dir[0], hash)
         if os.access(self.cachename, os.R_OK):
             logging.debug("use cache file: %s" % self.cachename)
-            f = open(self.cachename, 'rb')
-            size = struct.unpack('L', f.read(struct.calcsize('L')))[0]
-            self.envelope = array.array('f')
-            self.envelope.fromfile(f, size)
+            with open(self.cachename, 'rb') as f:
+                size = struct.unpack('L', f.read(struct.calcsize('L')))[0]
+                self.envelope = numpy.fromfile(f, dtype=numpy.float32, count=size)
+            if len(self.envelope) != size:
+                logging.debug("envelope cache file is truncated")
+                self.envelope = None
         else:
             logging.debug("no envelope cache found")
             self.envelope = None
 
     def write_cache(self):
         # cachename is still calculated by search... 
+        if self.cachename == None:
+            return
         logging.debug("write to cachefile: %s" % self.cachename)
         if os.path.isdir(self.args.cache_dir[0]):
-            f = open(self.cachename, 'wb')
-            f.write(struct.pack('L', len(self.envelope)))
-            self.envelope.tofile(f)
-            #logging.debug("write cache of size %d ends with: %s" %
-            #              (len(self.envelope),  self.envelope[-10:]))
-            f.close()
+            with atomicfile.AtomicFileWriter(self.cachename, 'wb') as afw:
+                f = afw.get_file()
+                f.write(struct.pack('L', len(self.envelope)))
+                self.envelope.astype(numpy.float32).tofile(f)
         else:
             logging.error("cache_dir ist no directory: %s" %
                           self.args.cache_dir[0])
@@ -314,6 +473,9 @@ def cl_parser():
         help="should be equal to frames per second [default: 25]")
     parser.add_argument('--idstr',  default="idstr_default", type=str,
         help="id for file used to cimmunicate result [default: idstr_default]")
+    parser.add_argument('-s', '--search', default=SEARCH_AUTO,
+        choices=[SEARCH_AUTO, SEARCH_FULL, SEARCH_HIERARCHICAL],
+        help="offset search, hierarchical is faster for long files [default: auto]")
     parser.add_argument('-c', '--use-cache', action='store_true')
     parser.add_argument('--cache-dir', nargs=1,default=[tempfile.gettempdir()],
                         help="default: %s" % tempfile.gettempdir())
@@ -327,18 +489,22 @@ def process_files(args):
     envelopes = [Envelope(n, args) for n in args.files]
     reference = envelopes[0].envelope
 
-    envelopes_envelope = list([x.envelope for x in envelopes])
+    # Reference is not aligned with itself.
+    envelopes_envelope = list([x.envelope for x in envelopes[1:]])
     logging.info("calculate offsets...")
-    offsets = rigidalign(reference, envelopes_envelope)
+    offsets = align(reference, envelopes_envelope, args.search)
     logging.debug("got offsets: %s" % offsets) 
 
+    envelopes[0].offset = 0.0
+    envelopes[0].confidence = 1.0
     for n in range(len(offsets)):
-        envelopes[n].offset = offsets[n]
+        envelopes[n + 1].offset, envelopes[n + 1].confidence = offsets[n]
       
     offsets_output = []
     for e in envelopes[1:]:
-        offset = e.offset
-        offsets_output.append((e.filename, offset))
+        if e.confidence < LOW_CONFIDENCE:
+            logging.warning("low confidence %.2f for offset of: %s" % (e.confidence, e.filename))
+        offsets_output.append((e.filename, e.offset, e.confidence))
     
     return offsets_output
 
@@ -351,8 +517,8 @@ def main():
     # Write out offsets data
     out_str = ""
     for file_offset in offsets_output:
-        f, offset = file_offset
-        out_str = out_str + f + MAGIC_SEPARATOR + str(offset) + "\n"
+        f, offset, confidence = file_offset
+        out_str = out_str + f + MAGIC_SEPARATOR + str(offset) + MAGIC_SEPARATOR + str(confidence) + "\n"
     
     userfolders.init()
     output_file = userfolders.get_cache_dir() + OFFSETS_DATA_FILE + "_" + args.idstr
@@ -44,6 +44,7 @@ import editorpersistance
 import fluxity
 import mltinit
 import mltprofiles
+import rawvideoencoder
 import renderconsumer
 import respaths
 import toolsencoding
@@ -59,8 +60,10 @@ STATUS_MSG_FILE = ccrutils.STATUS_MSG_FILE
 ABORT_MSG_FILE = ccrutils.ABORT_MSG_FILE
 RENDER_DATA_FILE = ccrutils.RENDER_DATA_FILE
 
+# Seconds between status message writes and abort checks when rendering frames.
+STATUS_UPDATE_INTERVAL = 0.2
+
 _render_thread = None
-_frame_range_update_thread = None
 
 
 # ----------------------------------------------------- module interface to render process with message files, used by main app
@@ -160,11 +163,17 @@ class FluxityHeadlessRunnerThread(threading.Thread):
 
         editors_data_json = json.dumps(self.fluxity_plugin_edit_data["editors_list"]) # See fluxity.FluxityContext.get_script_data()
         render_length = self.range_out - self.range_in 
+        self.status_render_length = render_length
+        self.last_status_write_time = 0.0
+
+        # Video renders stream frames to ffmpeg if encoding can be done with it, otherwise
+        # frames are written as PNGs and encoded with MLT.
+        if self.render_data.do_video_render == True:
+            encoder = self.get_raw_video_encoder()
+            if encoder.can_encode() == True:
+                self.stream_render_video(user_script, script_file, profile_file_path, editors_data_json, render_length, encoder)
+                return
 
-        global _frame_range_update_thread
-        _frame_range_update_thread = FrameRangeUpdateThread(rendered_frames_folder, render_length)
-        _frame_range_update_thread.start()
-        
         proc_fctx_dict = fluxity.render_frame_sequence(   user_script,
                                                           script_file,
                                                           self.generator_length,
@@ -173,35 +182,27 @@ class FluxityHeadlessRunnerThread(threading.Thread):
                                                           rendered_frames_folder, 
                                                           profile_file_path, 
                                                           editors_data_json,
-                                                          True)
+                                                          True,
+                                                          progress_callback=self.frames_done_update)
+        if self.abort == True:
+            return
+
+        # All frames have been written when render_frame_sequence() returns.
+        print(fluxity.get_process_stats_message(proc_fctx_dict))
         ccrutils.write_range_render_data(proc_fctx_dict)
         
-        # Exit on error without waiting frame render to complete.
+        # Exit on error.
         error_msg, log_msg = self.get_range_render_messages(proc_fctx_dict)
         if error_msg != None:
             ccrutils.write_completed_message()
-            _frame_range_update_thread.abort = True
             return
-            
-        # Wait all frames to be rendered
-        while len(os.listdir(rendered_frames_folder)) != render_length:
-            if self.abort == True:
-                _frame_range_update_thread.abort = True
-                return
-            time.sleep(0.5)
-        
-        _frame_range_update_thread.abort = True
                 
         # Render video
         if self.render_data.do_video_render == True:
             # Render consumer
             args_vals_list = toolsencoding.get_args_vals_list_for_render_data(self.render_data)
             profile = mltprofiles.get_profile_for_index(self.render_data.profile_index) 
-            
-            if self.render_data.save_internally == True:
-                file_path = ccrutils.session_folder_saved_global() + "/" + appconsts.CONTAINER_CLIP_VIDEO_CLIP_NAME + self.render_data.file_extension
-            else:
-                file_path = self.render_data.render_dir +  "/" + self.render_data.file_name + self.render_data.file_extension
+            file_path = self.get_video_file_path()
         
             consumer = renderconsumer.get_mlt_render_consumer(file_path, profile, args_vals_list)
 
@@ -238,6 +239,68 @@ class FluxityHeadlessRunnerThread(threading.Thread):
         # Write out completed flag file.
         ccrutils.write_completed_message()
         
+    def stream_render_video(self, user_script, script_file, profile_file_path, editors_data_json, render_length, encoder):
+        self.encoder = encoder
+        
+        encoder.start()
+        proc_fctx_dict = fluxity.render_frame_sequence(   user_script,
+                                                          script_file,
+                                                          self.generator_length,
+                                                          self.range_in, 
+                                                          self.range_out, 
+                                                          ccrutils.rendered_frames_folder(), 
+                                                          profile_file_path, 
+                                                          editors_data_json,
+                                                          True,
+                                                          self.stream_frame_callback)
+        print(fluxity.get_process_stats_message(proc_fctx_dict))
+        if self.abort == True:
+            encoder.abort()
+            return
+
+        error_msg, log_msg = self.get_range_render_messages(proc_fctx_dict)
+        if error_msg != None:
+            encoder.abort()
+        elif encoder.close() == False:
+            print("Fluxity video encoding failed:", encoder.error_msg)
+            proc_fctx_dict[fluxity.FLUXITY_ERROR_MSG] = encoder.error_msg
+
+        ccrutils.write_range_render_data(proc_fctx_dict)
+        ccrutils.write_completed_message()
+
+    def stream_frame_callback(self, frame, frame_data):
+        # Returning False stops rendering.
+        if self.encoder.write_frame(frame_data) == False:
+            return False
+
+        return self.frames_done_update(self.encoder.frames_written)
+
+    def frames_done_update(self, frames_done):
+        # Returning False stops rendering.
+        now = time.monotonic()
+        if now - self.last_status_write_time > STATUS_UPDATE_INTERVAL:
+            self.last_status_write_time = now
+            if self.abort_requested() == True:
+                return False
+
+            elapsed = now - self.start_time
+            msg = "1 " + str(frames_done) + " " + str(self.status_render_length + 1) + " " + str(elapsed)
+            ccrutils.write_status_message(msg)
+
+        return True
+
+    def get_raw_video_encoder(self):
+        args_vals_list = toolsencoding.get_args_vals_list_for_render_data(self.render_data)
+        profile = mltprofiles.get_profile_for_index(self.render_data.profile_index) 
+        frames_profile = mltprofiles.get_profile(self.profile_desc)
+        return rawvideoencoder.RawVideoEncoder(self.get_video_file_path(), profile, args_vals_list, frames_profile.width(), frames_profile.height())
+
+    def get_video_file_path(self):
+        if self.render_data.save_internally == True:
+            return ccrutils.session_folder_saved_global() + "/" + appconsts.CONTAINER_CLIP_VIDEO_CLIP_NAME + self.render_data.file_extension
+        else:
+            return self.render_data.render_dir +  "/" + self.render_data.file_name + self.render_data.file_extension
+
     def abort_requested(self):
         self.abort = ccrutils.abort_requested()
         return self.abort
@@ -261,27 +324,3 @@ class FluxityHeadlessRunnerThread(threading.Thread):
             log_msg = None
 
         return (error_msg, log_msg)
-    
-class FrameRangeUpdateThread(threading.Thread):
-
-    def __init__(self, rendered_frames_folder, render_length):
-        threading.Thread.__init__(self)
-        self.rendered_frames_folder = rendered_frames_folder
-        self.render_length = render_length
-        self.abort = False
-     
-    def run(self):
-        start_time = time.monotonic() 
-        frame = len(os.listdir(self.rendered_frames_folder))
-        
-        while frame < self.render_length:
-            if self.abort == True:
-                return
-            now = time.monotonic() 
-            elapsed = now - start_time
-            frame = len(os.listdir(self.rendered_frames_folder))
-        
-            msg = "1 " + str(frame) + " " + str(self.render_length + 1) + " " + str(elapsed)
-            ccrutils.write_status_message(msg)
-        
-            time.sleep(0.2)
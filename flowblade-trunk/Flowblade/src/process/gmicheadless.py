@@ -43,6 +43,7 @@ import editorpersistance
 import gmicplayer
 import mltinit
 import mltprofiles
+import rawvideoencoder
 import renderconsumer
 import respaths
 import toolsencoding
@@ -164,19 +165,21 @@ class GMicHeadlessRunnerThread(threading.Thread):
         for frame_file in os.listdir(rendered_frames_folder):
             file_path = os.path.join(rendered_frames_folder, frame_file)
             os.remove(file_path)
-            
+
+        script_file = open(self.script_path)
+        user_script = script_file.read()
+
+        # Video renders pipe clip frames through G'MIC processes into encoder if script and encoding allow it.
+        if self.render_data.do_video_render == True and gmicplayer.script_can_stream(user_script) == True:
+            if self.stream_render_video(user_script, profile) == True:
+                return
+
         self.frames_range_writer = gmicplayer.FramesRangeWriter(self.clip_path, self.frames_update, profile)
         self.frames_range_writer.write_frames(clip_frames_folder + "/", frame_name, self.range_in, self.range_out)
 
         if self.abort == True:
             return
 
-        script_file = open(self.script_path)
-        user_script = script_file.read()
-
-        while len(os.listdir(clip_frames_folder)) != self.length:
-            time.sleep(0.5)
-        
         # Render frames with gmic script
         self.script_renderer = gmicplayer.FolderFramesScriptRenderer(   user_script, 
                                                                         clip_frames_folder,
@@ -199,11 +202,7 @@ class GMicHeadlessRunnerThread(threading.Thread):
             # Render consumer
             args_vals_list = toolsencoding.get_args_vals_list_for_render_data(self.render_data)
             profile = mltprofiles.get_profile_for_index(self.render_data.profile_index) 
-            
-            if self.render_data.save_internally == True:
-                file_path = ccrutils.session_folder_saved_global() + "/" + appconsts.CONTAINER_CLIP_VIDEO_CLIP_NAME + self.render_data.file_extension
-            else:
-                file_path = self.render_data.render_dir +  "/" + self.render_data.file_name + self.render_data.file_extension
+            file_path = self.get_video_file_path()
         
             consumer = renderconsumer.get_mlt_render_consumer(file_path, profile, args_vals_list)
             
@@ -238,6 +237,47 @@ class GMicHeadlessRunnerThread(threading.Thread):
         # Write out completed flag file.
         ccrutils.write_completed_message()
 
+    def stream_render_video(self, user_script, profile):
+        """
+        Returns True if video was rendered or render was aborted by user, False if streaming
+        could not be used or failed and frames need to be rendered using frame folders instead.
+        """
+        args_vals_list = toolsencoding.get_args_vals_list_for_render_data(self.render_data)
+        encoding_profile = mltprofiles.get_profile_for_index(self.render_data.profile_index)
+        encoder = rawvideoencoder.PPMStreamEncoder(self.get_video_file_path(), encoding_profile, args_vals_list)
+        if encoder.can_encode() == False:
+            return False
+
+        encoder.start()
+        self.script_renderer = gmicplayer.StreamFramesScriptRenderer(   user_script,
+                                                                        self.clip_path,
+                                                                        profile,
+                                                                        self.range_in,
+                                                                        self.range_out,
+                                                                        encoder,
+                                                                        self.script_render_update_callback,
+                                                                        self.script_render_output_callback)
+        if self.script_renderer.write_frames() == False:
+            encoder.abort()
+            if self.script_renderer.stream_failed == False or self.abort == True:
+                return True # Aborted by user.
+            print("G'MIC script could not be rendered with piped frames, using frame folders.")
+            return False
+
+        if encoder.close() == False:
+            print("Encoding G'MIC frames failed:", encoder.error_msg)
+            print("Rendering G'MIC script again using frame folders.")
+            return False
+
+        ccrutils.write_completed_message()
+        return True
+
+    def get_video_file_path(self):
+        if self.render_data.save_internally == True:
+            return ccrutils.session_folder_saved_global() + "/" + appconsts.CONTAINER_CLIP_VIDEO_CLIP_NAME + self.render_data.file_extension
+        else:
+            return self.render_data.render_dir +  "/" + self.render_data.file_name + self.render_data.file_extension
+
     def abort_requested(self):
         self.abort = ccrutils.abort_requested()
         return self.abort
@@ -254,7 +294,7 @@ class GMicHeadlessRunnerThread(threading.Thread):
         
     def script_render_update_callback(self, frame_count):
         if self.abort_requested() == True:
-             self.script_renderer.abort = True
+             self.script_renderer.abort_rendering()
              return
         
         # step 1, frame , range
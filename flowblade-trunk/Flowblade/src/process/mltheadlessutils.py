@@ -33,11 +33,30 @@ import ccrutils
 import editorstate
 import editorpersistance
 import mltinit
+import mltprofiles
 import respaths
 import userfolders
 
 
+_app_initialized = False
+_repo = None
+
+
 def mlt_env_init(root_path, parent_folder, session_id):
+    mlt_app_init(root_path)
+    return mlt_session_init(parent_folder, session_id)
+
+def mlt_app_init(root_path):
+    """
+    Initializes process wide Flowblade/MLT state, does nothing if already done.
+
+    Persistent render workers run many jobs in one process and only pay the
+    cost of MLT init and codec and filter probing once.
+    """
+    global _app_initialized, _repo
+    if _app_initialized == True:
+        return
+
     os.nice(10) # make user configurable
 
     try:
@@ -51,8 +70,14 @@ def mlt_env_init(root_path, parent_folder, session_id):
     userfolders.init()
     editorpersistance.load()
 
-    mltinit.init_with_translations()
-    
+    _repo = mltinit.init_with_translations()
+    _app_initialized = True
+
+def mlt_session_init(parent_folder, session_id):
+    # Preferences and profiles can change between jobs run in same process.
+    editorpersistance.load()
+    mltprofiles.load_profile_list()
+
     ccrutils.init_session_folders(parent_folder, session_id)
     
     ccrutils.load_render_data()
@@ -62,5 +87,3 @@ def mlt_env_init(root_path, parent_folder, session_id):
     ccrutils.maybe_init_external_session_folders()
     
     return render_data
-
-
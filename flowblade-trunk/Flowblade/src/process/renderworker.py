@@ -0,0 +1,126 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <https://github.com/jliljebl/flowblade/>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Persistent headless render worker process.
+
+Worker initializes Flowblade/MLT environment once and then runs headless render jobs
+one at a time, so that queued jobs do not each pay for interpreter start, MLT init and
+codec and filter probing.
+
+Jobs are read from stdin as JSON lines with job id, name of launcher script and the same
+args that would be given to launcher when starting a new process for the job. Job
+started, completed and failed events and status messages of renders are written to stdout 
+as JSON lines, all output from renders goes to stderr.
+
+Worker exits when stdin is closed.
+"""
+
+import json
+import os
+import runpy
+import sys
+import threading
+import traceback
+
+import ccrutils
+import mltheadlessutils
+
+
+# Launchers of jobs that can be run in worker and modules that have their render threads.
+# All of these use mltheadlessutils.mlt_env_init() and set module global '_render_thread'.
+# Stabilized video and tracking renders end their process with os._exit() and cannot be run in workers.
+WORKER_JOBS = { "flowbladeproxyheadless":"proxyheadless",
+                "flowblademotionheadless":"motionheadless",
+                "flowbladestabilizeheadless":"stabilizeheadless"}
+
+# Job events.
+JOB_STARTED = "started"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+_events_out = None
+_events_lock = threading.Lock()
+_render_thread_error = None
+
+
+def main(root_path):
+    global _events_out
+
+    # Events get their own copy of stdout, everything printed by renders and MLT goes to stderr.
+    _events_out = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    threading.excepthook = _render_thread_excepthook
+    ccrutils.set_status_push_callback(write_event)
+
+    mltheadlessutils.mlt_app_init(root_path)
+
+    for line in sys.stdin:
+        try:
+            job = json.loads(line)
+        except ValueError:
+            print("Render worker got invalid job:", line)
+            continue
+
+        run_job(root_path, job)
+
+def run_job(root_path, job):
+    global _render_thread_error
+    _render_thread_error = None
+
+    job_id = job["id"]
+    write_event(JOB_STARTED, job_id)
+
+    sys_argv = sys.argv
+    sys_path = list(sys.path)
+    try:
+        module_name = WORKER_JOBS[job["launcher"]]
+        
+        # Launcher parses args from sys.argv and calls module main() that starts render thread.
+        sys.argv = [root_path + "/launch/" + job["launcher"]] + job["args"]
+        runpy.run_path(sys.argv[0])
+        
+        render_thread = sys.modules[module_name]._render_thread
+        if render_thread != None:
+            render_thread.join()
+    except (Exception, SystemExit) as e:
+        traceback.print_exc()
+        write_event(JOB_FAILED, job_id, repr(e))
+        return
+    finally:
+        sys.argv = sys_argv
+        sys.path[:] = sys_path
+
+    if _render_thread_error != None:
+        write_event(JOB_FAILED, job_id, repr(_render_thread_error))
+    else:
+        write_event(JOB_COMPLETED, job_id)
+
+def write_event(event, job_id, data=None):
+    # Render threads write status messages using this too.
+    with _events_lock:
+        _events_out.write(json.dumps({"event":event, "id":job_id, "data":data}) + "\n")
+
+def _render_thread_excepthook(args):
+    # Render threads that raise exceptions fail the job but not the worker.
+    global _render_thread_error
+    _render_thread_error = args.exc_value
+    traceback.print_exception(args.exc_type, args.exc_value, args.exc_traceback)
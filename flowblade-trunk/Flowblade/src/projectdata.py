@@ -23,12 +23,15 @@ Module contains objects used to capture project data.
 """
 
 import cairo
+import concurrent.futures
 import datetime
 try:
     import mlt7 as mlt
 except:
     import mlt
 import hashlib
+import multiprocessing
+import numpy as np
 import os
 import shutil
 
@@ -74,6 +77,9 @@ _project_properties_default_values = {appconsts.P_PROP_TLINE_SHRINK_VERTICAL:Fal
 # Flag used to decide if user should be prompt to save project on project exit.
 media_files_changed_since_last_save = False
 
+# Incremented when media file paths change, Project media indexes are rebuilt when this changes.
+_media_paths_version = 0
+
 class Project:
     """
     Collection of all the data edited as a single unit.
@@ -247,55 +253,76 @@ class Project:
 
         # Add to bin
         if target_bin == None:
-            self.c_bin.file_ids.append(media_object.id)
-        else:
-            target_bin.file_ids.append(media_object.id)
+            target_bin = self.c_bin
+        target_bin.file_ids.append(media_object.id)
+
+        media_index = self._get_media_index()
+        media_index.add_media_file(media_object)
+        media_index.bin_for_id[media_object.id] = target_bin
+
+    def remove_media_file(self, media_file_id):
+        """
+        Removes media file from project, caller removes it from bins.
+        """
+        self.media_files.pop(media_file_id)
+        self.media_index = None # Other media files may have same paths, rebuild is simplest.
 
     def media_file_exists(self, file_path):
-        for key, media_file in list(self.media_files.items()):
-            if media_file.type == appconsts.PATTERN_PRODUCER:
-                continue
-            if media_file.container_data != None:
-                continue
-            if file_path == media_file.path:
-                return True
+        media_file = self._get_media_index().file_by_path_no_container.get(file_path)
+        if media_file != None and (media_file.path != file_path or media_file.container_data != None):
+            media_file = self._get_rebuilt_media_index().file_by_path_no_container.get(file_path)
 
-        return False
+        return media_file != None
 
     def get_bin_for_media_file_id(self, media_file_id):
-        for bin in self.bins:
-            for file_id in bin.file_ids:
-                if file_id == media_file_id:
-                    return bin
-        return None
+        # Bin file_ids lists are edited in many places, so indexed bin is checked and index is rebuilt if needed.
+        bin = self._get_media_index().bin_for_id.get(media_file_id)
+        if bin == None or not(media_file_id in bin.file_ids) or not(bin in self.bins):
+            bin = self._get_rebuilt_media_index().bin_for_id.get(media_file_id)
+        return bin
         
     def get_media_file_for_path(self, file_path):
-        for key, media_file in list(self.media_files.items()):
-            if media_file.type == appconsts.PATTERN_PRODUCER:
-                continue
-            if file_path == media_file.path:
-                return media_file
-        return None
+        media_file = self._get_media_index().file_by_path.get(file_path)
+        if media_file != None and media_file.path != file_path:
+            media_file = self._get_rebuilt_media_index().file_by_path.get(file_path)
+        return media_file
 
     def get_media_file_for_second_path(self, file_path):
-        for key, media_file in list(self.media_files.items()):
-            if media_file.type == appconsts.PATTERN_PRODUCER:
-                continue            
-            if file_path == media_file.second_file_path:
-                return media_file
-        return None
+        media_file = self._get_media_index().file_by_second_path.get(file_path)
+        if media_file != None and media_file.second_file_path != file_path:
+            media_file = self._get_rebuilt_media_index().file_by_second_path.get(file_path)
+        return media_file
 
     def get_media_file_for_container_data(self, container_data):
-        for key, media_file in list(self.media_files.items()):
-            if media_file.type == appconsts.PATTERN_PRODUCER:
-                continue
-            if media_file.container_data == None:
-                continue
-            if media_file.container_data.program == container_data.program and \
-                media_file.container_data.unrendered_media == container_data.unrendered_media:
-                return media_file
-        return None
-        
+        key = (container_data.program, container_data.unrendered_media)
+        media_file = self._get_media_index().file_by_container_data.get(key)
+        if media_file != None and (media_file.container_data == None or _get_container_data_key(media_file.container_data) != key):
+            media_file = self._get_rebuilt_media_index().file_by_container_data.get(key)
+        return media_file
+
+    def _get_media_index(self):
+        # Index is not saved, it is created when first needed after load.
+        media_index = getattr(self, "media_index", None)
+        if media_index == None or media_index.version != _media_paths_version:
+            media_index = self._get_rebuilt_media_index()
+        return media_index
+
+    def _get_rebuilt_media_index(self):
+        self.media_index = MediaIndex(self)
+        return self.media_index
+
+    def media_index_is_consistent(self):
+        """
+        Returns True if maintained media index gives same results as a newly built one.
+        """
+        media_index = self._get_media_index()
+        built_index = MediaIndex(self)
+        return (media_index.bin_for_id == built_index.bin_for_id
+                and media_index.file_by_path == built_index.file_by_path 
+                and media_index.file_by_path_no_container == built_index.file_by_path_no_container
+                and media_index.file_by_second_path == built_index.file_by_second_path
+                and media_index.file_by_container_data == built_index.file_by_container_data)
+
     def delete_media_file_from_current_bin(self, media_file):
         global media_files_changed_since_last_save
         media_files_changed_since_last_save = True
@@ -574,6 +601,7 @@ class MediaFile:
     def add_proxy_file(self, proxy_path):
         self.has_proxy_file = True
         self.second_file_path = proxy_path
+        media_paths_changed()
 
     def add_existing_proxy_file(self, proxy_width, proxy_height, file_extesion):
         proxy_path = self.create_proxy_path(proxy_width, proxy_height, file_extesion)
@@ -582,10 +610,12 @@ class MediaFile:
     def set_as_proxy_media_file(self):
         self.path, self.second_file_path = self.second_file_path, self.path
         self.is_proxy_file = True
+        media_paths_changed()
 
     def set_as_original_media_file(self):
         self.path, self.second_file_path = self.second_file_path, self.path
         self.is_proxy_file = False
+        media_paths_changed()
 
     def matches_project_profile(self):
         if (not hasattr(self, "info")): # to make really sure that old projects don't crash,
@@ -630,6 +660,40 @@ class BinColorClip:
         self.icon = icon
 
 
+class MediaIndex:
+    """
+    Hash indexes for media file lookups done by Project. 
+    
+    Like linear searches they replace, indexes give first added media file 
+    for a key, and pattern producers are not indexed.
+    """
+    def __init__(self, project):
+        self.version = _media_paths_version
+        self.file_by_path = {}
+        self.file_by_path_no_container = {}
+        self.file_by_second_path = {}
+        self.file_by_container_data = {}
+        self.bin_for_id = {} # media file id -> Bin
+
+        for media_file in project.media_files.values():
+            self.add_media_file(media_file)
+
+        for bin in reversed(project.bins):
+            for file_id in bin.file_ids:
+                self.bin_for_id[file_id] = bin # First bin wins when iterating in reverse.
+
+    def add_media_file(self, media_file):
+        if media_file.type == appconsts.PATTERN_PRODUCER:
+            return
+
+        self.file_by_path.setdefault(media_file.path, media_file)
+        self.file_by_second_path.setdefault(media_file.second_file_path, media_file)
+        if media_file.container_data == None:
+            self.file_by_path_no_container.setdefault(media_file.path, media_file)
+        else:
+            self.file_by_container_data.setdefault(_get_container_data_key(media_file.container_data), media_file)
+
+
 class Bin:
     """
     Group of media files
@@ -642,6 +706,14 @@ class Bin:
                            # Project.add_media_file(...)
 
 
+def media_paths_changed():
+    global _media_paths_version
+    _media_paths_version += 1
+
+def _get_container_data_key(container_data):
+    return (container_data.program, container_data.unrendered_media)
+
+
 class ProducerNotValidError(Exception):
     def __init__(self, value, file_path):
         self.value = value
@@ -654,26 +726,54 @@ class ProducerNotValidError(Exception):
 class Thumbnailer:
     def __init__(self):
         self.profile = None
+        self.prepared_images = {} # file path -> (thumbnail_path, length, info) or exception raised writing it, see prepare_images()
 
     def set_context(self, profile):
         self.profile = profile
-    
+
+    def prepare_images(self, file_paths):
+        """
+        Writes thumbnail images for files concurrently. Results are
+        returned by following write_image() calls for the same files.
+        """
+        if len(file_paths) == 0:
+            return
+
+        workers = max(1, min(len(file_paths), multiprocessing.cpu_count()))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(self._get_write_image_result, file_paths)
+            for file_path, result in zip(file_paths, results):
+                self.prepared_images[file_path] = result
+
+    def clear_prepared_images(self):
+        self.prepared_images = {}
+
     def write_image(self, file_path):
         """
         Writes thumbnail image from file producer
         """
+        try:
+            result = self.prepared_images.pop(file_path)
+        except KeyError:
+            return self._write_image(file_path)
+
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _get_write_image_result(self, file_path):
+        # Errors are raised when file is added so that one file does not stop others being prepared.
+        try:
+            return self._write_image(file_path)
+        except Exception as err:
+            return err
+
+    def _write_image(self, file_path):
         # Get data
         md_str = hashlib.md5(file_path.encode('utf-8')).hexdigest()
         thumbnail_path = userfolders.get_thumbnail_dir() + md_str + ".png"
-        render_image_path = userfolders.get_cache_dir() + "thumbnail%03d.png"
 
-        # Create consumer
-        consumer = mlt.Consumer(self.profile, "avformat", 
-                                     render_image_path)
-        consumer.set("real_time", 0)
-        consumer.set("vcodec", "png")
-
-        # Create one frame producer
+        # Create producer
         producer = mlt.Producer(self.profile, str(file_path))
         if producer.is_valid() == False:
             msg = _("MLT reports that file is not a valid media producer.")
@@ -682,21 +782,14 @@ class Thumbnailer:
         info = utils.get_file_producer_info(producer)
 
         length = producer.get_length()
-        frame = length // 2
-        producer = producer.cut(frame, frame)
 
-        # Connect and write image
-        consumer.connect(producer)
-        consumer.run()
-        
-        # consumer.run() blocks until done so the thubnailfile is now ready to be copied.
-        icon = cairo.ImageSurface.create_from_png(userfolders.get_cache_dir() + "thumbnail001.png")
-        scaled_icon = cairo.ImageSurface(cairo.FORMAT_ARGB32, appconsts.THUMB_WIDTH * 4, appconsts.THUMB_HEIGHT * 4)
-        cr = cairo.Context(scaled_icon)
-        cr.scale(float(appconsts.THUMB_WIDTH * 4) / float(icon.get_width()), float(appconsts.THUMB_HEIGHT * 4) / float(icon.get_height()))
-        cr.set_source_surface(icon, 0, 0)
-        cr.paint()
-        scaled_icon.write_to_png(thumbnail_path)
+        # Get middle frame image from producer scaled to thumbnail size and write it.
+        producer.set_speed(0)
+        producer.seek(length // 2)
+        frame = producer.get_frame()
+        frame.set("consumer_deinterlace", 1)
+        icon = get_mlt_frame_cairo_surface(frame, appconsts.THUMB_WIDTH * 4, appconsts.THUMB_HEIGHT * 4)
+        icon.write_to_png(thumbnail_path)
         
         return (thumbnail_path, length, info)
 
@@ -711,6 +804,22 @@ class Thumbnailer:
         return producer.get_length()
 
 
+def get_mlt_frame_cairo_surface(frame, width, height):
+    """
+    Returns cairo.ImageSurface with MLT frame image scaled to given size.
+    """
+    mlt_rgb = frame.get_image(mlt.mlt_image_rgba, width, height)
+
+    # MLT Provides images in which R <-> B are switched from what Cairo wants them.
+    buf = np.frombuffer(mlt_rgb, dtype=np.uint8)
+    buf.shape = (height, width, 4)
+    out = np.copy(buf)
+    out[:, :, 0] = buf[:, :, 2]
+    out[:, :, 2] = buf[:, :, 0]
+    stride = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_RGB24, width)
+    return cairo.ImageSurface.create_for_data(out, cairo.FORMAT_RGB24, width, height, stride)
+
+
 # ----------------------------------- project and media log events
 class ProjectEvent:
     def __init__(self, event_type, data):
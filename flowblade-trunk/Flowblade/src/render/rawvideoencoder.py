@@ -0,0 +1,248 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <https://github.com/jliljebl/flowblade/>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Encodes raw cairo ARGB32 frames or PPM images written from Python into a video file by
+piping them to ffmpeg CLI.
+
+Used by headless renderers that create frames themselves or get them from other processes
+so that frames do not need to be written out as PNG files and read back with an MLT image
+sequence producer.
+
+Encoding is described with the same MLT avformat consumer args list that is used for
+MLT renders, args are translated into ffmpeg CLI args here. Encodings that have args with
+no known ffmpeg CLI equivalent get None from get_ffmpeg_output_args() and need to be
+rendered with MLT. Like MLT renders of image sequences, encodings with audio codec get
+a silent audio stream.
+"""
+
+import shutil
+import subprocess
+import tempfile
+
+import userfolders
+
+
+# MLT avformat consumer args that map to differently named ffmpeg CLI args.
+RENAMED_ARGS = {"vcodec":"-c:v", "vb":"-b:v", "b":"-b:v", "vprofile":"-profile:v", "qscale":"-q:v", "pix_fmt":"-pix_fmt"}
+
+# Video codec AVOptions that ffmpeg CLI accepts with same name.
+PASSED_ARGS = set(["g", "bf", "crf", "preset", "tune", "minrate", "maxrate", "bufsize", "b_strategy", "subcmp", "cmp",
+                   "coder", "flags", "flags2", "qmin", "qmax", "subq", "qcomp", "qdiff", "trellis", "threads", "movflags",
+                   "rc", "rc_lookahead", "cq", "b_ref_mode", "temporal-aq", "quality", "speed", "slices", "tile-columns",
+                   "frame-parallel", "auto-alt-ref", "lag-in-frames", "row-mt", "arnr_max_frames", "arnr_strength",
+                   "arnr_type", "vendor", "level", "slicecrc", "refs", "partitions", "wpredp"])
+
+# MLT avformat consumer audio args to ffmpeg CLI args.
+AUDIO_ARGS = {"acodec":"-c:a", "ab":"-b:a", "ar":"-ar", "ac":"-ac"}
+
+# Args that turn off audio.
+NO_AUDIO_ARGS = set(["an", "audio_off"])
+
+# MLT consumer only args and args that MLT silently ignores with current libavcodec.
+IGNORED_ARGS = set(["s", "aspect", "mlt_image_format", "progressive", "real_time", "rescale", "hq", "me_method"])
+
+# MLT avformat consumer finds these formats from file extension, ffmpeg CLI needs muxer name.
+FORMAT_NAMES = {"mkv":"matroska"}
+
+# Output pixel formats with alpha channel.
+ALPHA_PIX_FMTS = set(["rgba", "argb", "bgra", "abgr"])
+
+# Colorspace values of MLT profiles to ffmpeg scale filter matrix and stream colorspace tag.
+COLOR_MATRIXES = {601:("bt601", "smpte170m"), 709:("bt709", "bt709"), 2020:("bt2020", "bt2020nc")}
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") != None
+
+def get_ffmpeg_output_args(args_vals_list):
+    """
+    Returns ffmpeg CLI output args list for MLT avformat consumer args or None if
+    some arg cannot be translated or if encoding needs alpha channel.
+    """
+    out_args = []
+    for k, v in args_vals_list:
+        k = str(k)
+        v = str(v)
+        if k in IGNORED_ARGS or k in AUDIO_ARGS or k in NO_AUDIO_ARGS:
+            continue
+        elif k == "pix_fmt" and (v.startswith("yuva") or v in ALPHA_PIX_FMTS):
+            # Frames piped here have premultiplied alpha, alpha encodings are left for MLT.
+            return None
+        elif k == "f":
+            out_args.append("-f")
+            v = FORMAT_NAMES.get(v, v)
+        elif k in RENAMED_ARGS:
+            out_args.append(RENAMED_ARGS[k])
+        elif k in PASSED_ARGS:
+            out_args.append("-" + k)
+        else:
+            return None
+        out_args.append(v)
+
+    return out_args
+
+def get_ffmpeg_audio_args(args_vals_list):
+    """
+    Returns ffmpeg CLI audio output args list for MLT avformat consumer args 
+    or None if encoding has no audio.
+    """
+    audio_args = []
+    has_audio_codec = False
+    for k, v in args_vals_list:
+        k = str(k)
+        if k in NO_AUDIO_ARGS:
+            return None
+        if k in AUDIO_ARGS:
+            audio_args.extend([AUDIO_ARGS[k], str(v)])
+            if k == "acodec":
+                has_audio_codec = True
+
+    if has_audio_codec == False:
+        return None
+
+    return audio_args
+
+
+class RawVideoEncoder:
+    """
+    ffmpeg process that reads frames from stdin and encodes them into file.
+
+    Frames are cairo.FORMAT_ARGB32 pixel data with stride 4 * width, in_width x in_height size.
+    Frames are scaled to size of profile and encoded with profile frame rate.
+    """
+    def __init__(self, file_path, profile, args_vals_list, in_width, in_height):
+        self.file_path = file_path
+        self.profile = profile
+        self.output_args = get_ffmpeg_output_args(args_vals_list)
+        self.audio_args = get_ffmpeg_audio_args(args_vals_list)
+        self.in_width = in_width
+        self.in_height = in_height
+        self.frame_size = in_width * in_height * 4
+        self.frames_written = 0
+        self.process = None
+        self.error_msg = None
+        self.log_file = None
+
+    def can_encode(self):
+        return self.output_args != None and ffmpeg_available()
+
+    def get_frame_rate(self):
+        return str(self.profile.frame_rate_num()) + "/" + str(self.profile.frame_rate_den())
+
+    def get_input_args(self):
+        in_size = str(self.in_width) + "x" + str(self.in_height)
+        return ["-f", "rawvideo", "-pix_fmt", "bgra", "-s", in_size, "-r", self.get_frame_rate(), "-i", "pipe:0"]
+
+    def get_command_list(self):
+        scale = "scale=" + str(self.profile.width()) + ":" + str(self.profile.height())
+        colorspace_tag_args = []
+        try:
+            color_matrix, colorspace_tag = COLOR_MATRIXES[self.profile.colorspace()]
+            scale += ":out_color_matrix=" + color_matrix + ":out_range=tv"
+            colorspace_tag_args = ["-colorspace", colorspace_tag]
+        except KeyError:
+            pass
+
+        command_list = ["ffmpeg", "-y", "-v", "error", "-nostdin"]
+        command_list.extend(self.get_input_args())
+        if self.audio_args != None:
+            # Silent audio stream ends with piped frames.
+            command_list.extend(["-f", "lavfi", "-i", "anullsrc", "-map", "0:v", "-map", "1:a", "-shortest"])
+            command_list.extend(self.audio_args)
+        else:
+            command_list.append("-an")
+        command_list.extend(["-vf", scale])
+        command_list.extend(colorspace_tag_args)
+        command_list.extend(self.output_args)
+        command_list.append(str(self.file_path))
+
+        return command_list
+
+    def start(self):
+        # ffmpeg messages go to a file, a pipe that is only read at close() could fill up and block frame writes.
+        self.log_file = tempfile.TemporaryFile(prefix="log_raw_video_encoder_", dir=userfolders.get_cache_dir())
+        self.process = subprocess.Popen(self.get_command_list(), stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.log_file)
+
+    def write_frame(self, frame_data):
+        """
+        Returns False if ffmpeg process has exited.
+        """
+        if self.frame_size != None and len(frame_data) != self.frame_size:
+            self.error_msg = "Frame data size " + str(len(frame_data)) + " does not match frame size " + str(self.frame_size)
+            return False
+
+        try:
+            self.process.stdin.write(frame_data)
+        except (BrokenPipeError, OSError) as e:
+            self.error_msg = "ffmpeg stopped reading frames, " + str(e)
+            return False
+
+        self.frames_written += 1
+        return True
+
+    def close(self):
+        """
+        Waits for ffmpeg to finish encoding, returns True if video file was created.
+        """
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+        self.process.wait()
+        ffmpeg_msg = self._read_log()
+        if self.process.returncode != 0:
+            if self.error_msg == None:
+                self.error_msg = "ffmpeg exited with code " + str(self.process.returncode)
+            self.error_msg += "\n" + ffmpeg_msg
+            return False
+
+        return self.error_msg == None
+
+    def abort(self):
+        if self.process != None and self.process.poll() == None:
+            self.process.kill()
+            self.process.wait()
+        self._read_log()
+
+    def _read_log(self):
+        # Returns ffmpeg messages and deletes log file.
+        if self.log_file == None:
+            return ""
+        self.log_file.seek(0)
+        ffmpeg_msg = self.log_file.read().decode("utf-8", "replace").strip()
+        self.log_file.close()
+        self.log_file = None
+        return ffmpeg_msg
+
+
+class PPMStreamEncoder(RawVideoEncoder):
+    """
+    ffmpeg process that reads binary PPM or PGM images from stdin and encodes them into file.
+
+    Frames can be of any size, they are scaled to size of profile and encoded with profile frame rate.
+    """
+    def __init__(self, file_path, profile, args_vals_list):
+        RawVideoEncoder.__init__(self, file_path, profile, args_vals_list, 0, 0)
+        self.frame_size = None
+
+    def get_input_args(self):
+        return ["-f", "image2pipe", "-c:v", "ppm", "-framerate", self.get_frame_rate(), "-i", "pipe:0"]
@@ -29,8 +29,9 @@ from editorstate import current_sequence
 # Setting sync means calculating and saving the position difference between where first frames of clips
 # would be on the timeline.
 #
-# After every edit sync states of all child clips is calculated, and it 
-# gets displayed to the user in the next timeline redraw using red, green and gray colors
+# After every edit sync states of child clips on tracks changed by the edit and child clips with 
+# parent clips on changed tracks are calculated, and it gets displayed to the user in the next timeline 
+# redraw using red, green and gray colors
 
 # Maps child clip -> track
 sync_children = {}
@@ -38,10 +39,18 @@ sync_children = {}
 # Maps parent -> children list. Used to implement dual sync trim feature.
 sync_parents = {}
 
+# Maps child clip -> parent it was added under in sync_parents.
+child_parents = {}
+
 # This is used to maintain sync_parents dict when edit is implemented
 # by removing and adding clip to timeline.
 edit_removed_parents = {}
 
+# Tracks with clips added or removed and child clips with sync set since last sync states calculation.
+changed_tracks = set()
+changed_children = set()
+all_sync_states_changed = True
+
 # ----------------------------------------- sync display updating
 
 def start_edit():
@@ -53,21 +62,26 @@ def start_edit():
 def clip_added_to_timeline(clip, track):
     if clip.sync_data != None:
         sync_children[clip] = track
+        changed_children.add(clip)
 
-        if isinstance(clip.sync_data.master_clip, int): # loading at persistance.py calls this twice for sync clips.
+        master_clip = clip.sync_data.master_clip
+        if isinstance(master_clip, int): # loading at persistance.py calls this twice for sync clips.
             return
-        if clip.sync_data.master_clip in sync_parents:
-            for child_clip in sync_parents[clip.sync_data.master_clip]:
-                if child_clip == clip:
-                    return # Don't save same clip twice, we are using length of list to test if dual sync trim edit can be done.
-            sync_parents[clip.sync_data.master_clip].append(clip)
+        if child_parents.get(clip) is master_clip and master_clip in sync_parents:
+            return # Don't save same clip twice, we are using length of list to test if dual sync trim edit can be done.
+        _remove_from_parent_children(clip)
+        if master_clip in sync_parents:
+            if clip not in sync_parents[master_clip]:
+                sync_parents[master_clip].append(clip)
         else:
-            sync_parents[clip.sync_data.master_clip] = [clip]
+            sync_parents[master_clip] = [clip]
+        child_parents[clip] = master_clip
     
     # Restore clip to sync_parents list if it was removed during edit.
     try:
         children = edit_removed_parents[clip]
-        sync_parents[clip] = children
+        if len(children) > 0:
+            sync_parents[clip] = children
     except:
         pass
 
@@ -90,15 +104,43 @@ def clip_removed_from_timeline(clip):
 
     # Remove from parents child list and clear parent from parent list if
     # no children remaining.
-    remove_list = []
-    for parent, child_list in sync_parents.items():
-        if clip in child_list:
-            child_list.remove(clip)
-            if len(child_list) == 0:
-                remove_list.append(parent)
-    for parent in remove_list:
+    _remove_from_parent_children(clip)
+
+def _remove_from_parent_children(clip):
+    try:
+        parent = child_parents.pop(clip)
+    except KeyError:
+        return
+
+    try:
+        child_list = sync_parents[parent]
+    except KeyError:
+        # Parent removed during edit, its children list is in edit_removed_parents 
+        # and gets restored if parent is added back.
+        try:
+            _remove_from_child_list(edit_removed_parents[parent], clip)
+        except KeyError:
+            pass
+        return
+
+    _remove_from_child_list(child_list, clip)
+    if len(child_list) == 0:
         sync_parents.pop(parent)
 
+def _remove_from_child_list(child_list, clip):
+    for i in range(0, len(child_list)):
+        if child_list[i] is clip:
+            child_list.pop(i)
+            break
+
+def track_clips_changed(track):
+    # Called from sequence.Sequence when clips are added to or removed from track.
+    changed_tracks.add(track)
+
+def all_tracks_changed():
+    global all_sync_states_changed
+    all_sync_states_changed = True
+
 def print_sync_parents():
     print("---sync parents:")
     for key, value in sync_parents.items():
@@ -126,22 +168,34 @@ def clip_sync_cleared(clip):
         pass
 
 def sequence_changed(new_sequence):
-    global sync_children
+    global sync_children, child_parents
     sync_children = {}
+    child_parents = {}
     for track in new_sequence.tracks:
         for clip in track.clips:
             clip_added_to_timeline(clip, track)
+    all_tracks_changed()
     calculate_and_set_child_clip_sync_states()
 
 def calculate_and_set_child_clip_sync_states():
+    """
+    Sets sync states for child clips that may have changed since last call.
+    """
+    global changed_tracks, changed_children, all_sync_states_changed
+
+    clip_indexes = {} # track -> {clip:index}, created only for tracks that have changed child or parent clips.
     for child_clip, track in sync_children.items():
-        child_index = track.clips.index(child_clip)
+        parent_track = child_clip.sync_data.master_clip_track
+        if not(all_sync_states_changed or track in changed_tracks
+               or parent_track in changed_tracks or child_clip in changed_children):
+            continue
+
+        child_index = _get_clip_indexes(track, clip_indexes)[child_clip]
         child_clip_start = track.clip_start(child_index) - child_clip.clip_in
 
         parent_clip = child_clip.sync_data.master_clip
-        parent_track = child_clip.sync_data.master_clip_track 
         try:
-            parent_index = parent_track.clips.index(parent_clip)
+            parent_index = _get_clip_indexes(parent_track, clip_indexes)[parent_clip]
         except:
             child_clip.sync_data.sync_state = appconsts.SYNC_PARENT_GONE
             continue
@@ -156,22 +210,38 @@ def calculate_and_set_child_clip_sync_states():
         
         child_clip.sync_diff = pos_offset - child_clip.sync_data.pos_offset
 
+    changed_tracks = set()
+    changed_children = set()
+    all_sync_states_changed = False
+
+def _get_clip_indexes(track, clip_indexes):
+    # Replaces track.clips.index(clip) calls with a dict created once per track.
+    try:
+        return clip_indexes[track]
+    except KeyError:
+        track_indexes = {}
+        for i in range(0, len(track.clips)):
+            track_indexes[track.clips[i]] = i
+        clip_indexes[track] = track_indexes
+        return track_indexes
+
 def get_resync_data_list_for_clip_list(clips_list):
     # Input is list of (clip, track) tuples
     # Returns list of tuples with data needed to do resync.
     # Return tuples are of type (clip, track, index, child_clip_start_on_timeline, pos_off)
     resync_data = []
+    clip_indexes = {}
 
     for clip_track_tuple in clips_list:
         child_clip, track = clip_track_tuple
-        child_index = track.clips.index(child_clip)
+        child_index = _get_clip_indexes(track, clip_indexes)[child_clip]
         child_clip_pos_on_tline = track.clip_start(child_index)
         child_clip_start = child_clip_pos_on_tline - child_clip.clip_in
 
         parent_clip = child_clip.sync_data.master_clip
         parent_track = child_clip.sync_data.master_clip_track
         try:
-            parent_index = parent_track.clips.index(parent_clip)
+            parent_index = _get_clip_indexes(parent_track, clip_indexes)[parent_clip]
         except:
             # Parent clip no longer awailable
             continue
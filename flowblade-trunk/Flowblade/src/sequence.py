@@ -31,12 +31,14 @@ import hashlib
 import os
 
 import appconsts
+import clipstarts
 import edit
 import editorstate
 import mltfilters
 import mlttransitions
 import mltrefhold
 import patternproducer
+import resync
 import tlineypage
 import utils
 
@@ -97,6 +99,58 @@ AUDIO_MIX_DOWN_TRACK = 0
 SCOPE_MIX_VALUES = [0.0, 0.2, 0.5, 0.8, 1.0]
 _scope_over_lay_mix = 2
 
+class ClipIndex:
+    """
+    Clip lookup data for clips on sequence tracks excluding black background track.
+    Clip ids and clip objects map to clips and tracks, and media paths to clip counts.
+    """
+    def __init__(self):
+        self.clips_for_id = {} # clip.id -> list of clips, copied clips may share id.
+        self.track_for_clip = {} # id(clip) -> (clip, track, path), clip object is kept here so that id(clip) stays unique.
+        self.path_counts = {}
+
+    def add(self, clip, track):
+        path = getattr(clip, "path", None)
+        self.clips_for_id.setdefault(clip.id, []).append(clip)
+        self.track_for_clip[id(clip)] = (clip, track, path)
+        if path != None:
+            self.path_counts[path] = self.path_counts.get(path, 0) + 1
+
+    def remove(self, clip):
+        try:
+            indexed_clip, track, path = self.track_for_clip.pop(id(clip))
+        except KeyError:
+            return
+
+        id_clips = self.clips_for_id[clip.id]
+        for i in range(0, len(id_clips)):
+            if id_clips[i] is clip:
+                id_clips.pop(i)
+                break
+        if len(id_clips) == 0:
+            del self.clips_for_id[clip.id]
+
+        if path != None:
+            count = self.path_counts[path] - 1
+            if count == 0:
+                del self.path_counts[path]
+            else:
+                self.path_counts[path] = count
+
+    def get_clip(self, clip_id):
+        try:
+            return self.clips_for_id[clip_id][0]
+        except KeyError:
+            return None
+
+    def contains(self, clip):
+        return id(clip) in self.track_for_clip
+
+    def get_track(self, clip):
+        clip, track, path = self.track_for_clip[id(clip)]
+        return track
+
+
 class Sequence:
     """
     Multitrack MLT object
@@ -147,6 +201,9 @@ class Sequence:
         
         self.field = self.tractor.field()
         self.multitrack = self.tractor.multitrack()
+
+        # Clip lookup index for clips on tracks, created when first needed, see _get_clip_index().
+        self.clip_index = None
         
         self.vectorscope = mlt.Filter(self.profile, "frei0r.vectorscope")
         mltrefhold.hold_ref(self.vectorscope) # ?? is this just some anti-crash hack attempt that was not removed
@@ -208,6 +265,7 @@ class Sequence:
         # Add black clip to black bg track
         self.tracks[0].clips.append(black_track_clip) # py
         self.tracks[0].append(black_track_clip, 0, 0) # mlt
+        clipstarts.clips_changed(self.tracks[0])
 
         # Create fulltrack compositors if needed.
         if self.compositing_mode == appconsts.COMPOSITING_MODE_STANDARD_FULL_TRACK:
@@ -268,6 +326,11 @@ class Sequence:
         # Add data attr
         track.type = type
         track.sequence = self
+
+        # Replace MLT methods that walk all clips with lookups from cached clip start table.
+        track.clip_starts = None
+        track.clip_start = lambda index: clipstarts.get_clip_start(track, index)
+        track.get_clip_index_at = lambda frame: clipstarts.get_clip_index_at(track, frame)
         
         # Add state attr
         track.active = True
@@ -506,7 +569,7 @@ class Sequence:
         clip.mute_filter = None #
         clip.stream_indexes = None # a, v stream indexes when not muted
         clip.clip_length = lambda: _clip_length(clip) # MLT producer.get_length() gives producer max length.
-        clip.waveform_data = None
+        clip.waveform_data = None # DEPRECATED, waveforms are kept in memorycache so that they can be dropped from memory.
         clip.color = None # None means that clip type default color is displayed
         clip.markers = []
         clip.container_data = None
@@ -582,26 +645,58 @@ class Sequence:
         if test_clip == None:
             return False
 
-        for i in range(1, len(self.tracks)):
-            track = self.tracks[i]
-            for clip in track.clips:
-                if clip == test_clip:
-                    return True
-        
-        return False
+        return self._get_clip_index().contains(test_clip)
 
     def clip_for_media_path_is_in_sequence(self, path_list):
-        for i in range(1, len(self.tracks)):
-            track = self.tracks[i]
-            for clip in track.clips:
-                try:
-                    if clip.path in path_list:
-                        return True
-                except:
-                    pass
+        clip_index = self._get_clip_index()
+        for path in path_list:
+            if path in clip_index.path_counts:
+                return True
                     
         return False
 
+    # ------------------------------------------ clip index
+    def _get_clip_index(self):
+        # Sequences that were created by loading do not have attribute before MLT objects are built.
+        clip_index = getattr(self, "clip_index", None)
+        if clip_index == None:
+            clip_index = ClipIndex()
+            for i in range(1, len(self.tracks)):
+                track = self.tracks[i]
+                for clip in track.clips:
+                    clip_index.add(clip, track)
+            self.clip_index = clip_index
+        return clip_index
+
+    def clip_added_to_track(self, clip, track):
+        """
+        Called from edit.py when clip is added to track clips list.
+        """
+        clipstarts.clips_changed(track)
+        resync.track_clips_changed(track)
+        clip_index = getattr(self, "clip_index", None)
+        if clip_index != None and track.id != 0:
+            clip_index.add(clip, track)
+
+    def clip_removed_from_track(self, clip, track):
+        """
+        Called from edit.py when clip is removed from track clips list.
+        """
+        clipstarts.clips_changed(track)
+        resync.track_clips_changed(track)
+        clip_index = getattr(self, "clip_index", None)
+        if clip_index != None and track.id != 0:
+            clip_index.remove(clip)
+
+    def tracks_clips_changed(self):
+        """
+        Must be called when track clips lists are changed without edit.py functions.
+        """
+        self.clip_index = None
+        for track in self.tracks:
+            clipstarts.clips_changed(track)
+        resync.all_tracks_changed()
+
     # ------------------------------------------ blanks
     def create_and_insert_blank(self, track, index, length):
         """
@@ -817,6 +912,7 @@ class Sequence:
         track = self.tracks[-1] # Always last track
         track.clear() # # TRIM INIT CRASH HACK, see clear_hidden_track there may be blank clip here
         track.clips = []
+        self.tracks_clips_changed()
     
         # Display trimmmed clip on hidden track by creating copy of it.
         # File producer
@@ -851,6 +947,7 @@ class Sequence:
         """
         clips = self.tracks[-1].clips
         self.tracks[-1].clips = []
+        self.tracks_clips_changed()
         for i in range(0, len(clips)):
             clip = clips[i]
             if clip.is_blanck_clip:
@@ -877,6 +974,7 @@ class Sequence:
         
         self.tracks[-1].clips = []
         self.tracks[-1].clear()
+        self.tracks_clips_changed()
 
         edit._insert_blank(self.tracks[-1], 0, seq_len) # TRIM INIT CRASH HACK. This being empty crashes a lot, so far unexplained.
         
@@ -894,6 +992,7 @@ class Sequence:
         # Needed for timeline render updates
         self.tracks[-1].clips = []
         self.tracks[-1].clear()
+        self.tracks_clips_changed()
 
         seq_len = self.seq_len
         if seq_len < 1:
@@ -910,6 +1009,7 @@ class Sequence:
                 continue
             track_v1.remove(i)
             track_v1.clips.pop(i)
+            self.tracks_clips_changed()
             length = clip.clip_out - clip.clip_in + 1
             white_clip = self._create_white_clip(length)
             edit._insert_clip(track_v1, white_clip, i, white_clip.clip_in, white_clip.clip_out)
@@ -1025,6 +1125,7 @@ class Sequence:
 
         self.tracks[0].clips.append(black_track_clip) # py
         self.tracks[0].append(black_track_clip, 0, 0) # mlt
+        clipstarts.clips_changed(self.tracks[0])
         
         # LOOK TO GET RID OF THIS, WE ARE CREATING A NEW BLACK CLIP PER CHANGE OF SEQUENCE!
 
@@ -1319,25 +1420,22 @@ class Sequence:
         """
         Returns clip or None if not found.
         """
-        for i in range(1, len(self.tracks)):
-            track = self.tracks[i]
-            for j in range(0, len(track.clips)):
-                clip = track.clips[j]
-                if clip.id == clip_id:
-                    return clip
-
-        return None
+        return self._get_clip_index().get_clip(clip_id)
 
     def get_track_and_index_for_id(self, clip_id):
         """
-        Returns clip or None if not found.
+        Returns (track, clip index) or (None, None) if not found.
         """
-        for i in range(1, len(self.tracks)):
-            track = self.tracks[i]
-            for j in range(0, len(track.clips)):
-                clip = track.clips[j]
-                if clip.id == clip_id:
-                    return (track, j)
+        clip_index = self._get_clip_index()
+        clip = clip_index.get_clip(clip_id)
+        if clip == None:
+            return (None, None)
+
+        # Clip index in track changes with edits and is computed when asked.
+        track = clip_index.get_track(clip)
+        for j in range(0, len(track.clips)):
+            if track.clips[j] is clip:
+                return (track, j)
 
         return (None, None)
         
@@ -1506,6 +1604,7 @@ def _copy_track_contents(from_track, to_track, to_sequence):
     
     from_track.clear()
     from_track.clips = []
+    from_track.sequence.tracks_clips_changed()
 
     # Copy track attributes.
     to_sequence.set_track_mute_state(to_track.id, from_track.mute_state)
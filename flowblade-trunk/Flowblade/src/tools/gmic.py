@@ -1212,12 +1212,6 @@ class GmicEffectRendererer(threading.Thread):
         if self.abort == True:
             return
         
-        # Render effect for frames
-        GLib.idle_add(self._show_percentage_and_fraction, "<small>" + _("Waiting for frames write to complete...") + "</small>", None)
-         
-        while len(os.listdir(folder)) != self.length:
-            time.sleep(0.5)
-        
         # Render frames with gmic script
         self.script_renderer = gmicplayer.FolderFramesScriptRenderer(   self.user_script, 
                                                                         folder,
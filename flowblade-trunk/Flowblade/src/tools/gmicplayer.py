@@ -30,9 +30,11 @@ except:
 import os
 from os import listdir
 from os.path import isfile, join
+import queue
 import re
 import sys
 import subprocess
+import threading
 import time
 
 import editorstate
@@ -43,6 +45,19 @@ import utils
 TICKER_DELAY = 0.25
 RENDER_TICKER_DELAY = 0.05
 
+MAX_DEFAULT_GMIC_WORKERS = 8 # Concurrent gmic processes when rendering frame folders.
+FRAMES_WRITE_UPDATE_INTERVAL = 0.2 # Seconds between progress callbacks when writing clip frames.
+STREAM_QUEUE_FRAMES_PER_WORKER = 2 # Clip frames read ahead per gmic worker when streaming frames.
+
+# G'MIC commands that read or write files, scripts using them can not be rendered with frames piped through gmic.
+GMIC_FILE_COMMANDS = set(["i", "input", "o", "output", "m", "command"])
+
+# MLT 7 renamed image formats.
+if hasattr(mlt, "mlt_image_rgb"):
+    MLT_IMAGE_RGB = mlt.mlt_image_rgb
+else:
+    MLT_IMAGE_RGB = mlt.mlt_image_rgb24
+
 _current_profile = None
 
 SDL_1 = 1
@@ -255,10 +270,12 @@ class FramesRangeWriter:
         self.profile = profile
         self.callback = callback
         self.running = True
+        self.stopped_event = threading.Event()
 
     def write_frames(self, clip_folder, frame_name, mark_in, mark_out):
         """
-        Writes thumbnail image from file producer
+        Writes range of frames from file producer as PNG files, returns when all frames have been written
+        or shutdown() has been called.
         """
         # Get data
         render_path = clip_folder + frame_name + "_%04d." + "png"
@@ -267,6 +284,7 @@ class FramesRangeWriter:
         self.consumer.set("real_time", -1)
         self.consumer.set("rescale", "bicubic")
         self.consumer.set("vcodec", "png")
+        self.consumer.set("terminate_on_pause", 1) # Consumer stops after last frame of cut has been written.
     
         self.frame_producer = self.producer.cut(mark_in, mark_out)
 
@@ -274,27 +292,35 @@ class FramesRangeWriter:
         self.frame_producer.set_speed(0)
         self.frame_producer.seek(0)
         self.frame_producer.set_speed(1)
-        self.consumer.start()
-                
-        while self.running: # set false at shutdown() for abort
-            if self.frame_producer.frame() >= mark_out:
-                
-                self.callback(self.frame_producer.frame() - mark_in)
-                time.sleep(2.0) # This seems enough, other methods produced bad waits
-                                # IF WE CAN REMOVE THIS WAIT. THAT WOULD BE GOOD.
-
-                self.running = False
-            else:
-                self.callback(self.frame_producer.frame()) # This is wrong for container clips but we fix it there not break G'mic tool, lazy yeah...
-                time.sleep(0.2)
+
+        progress_thread = threading.Thread(target=self._progress_updates)
+        progress_thread.daemon = True
+        progress_thread.start()
+
+        # Consumer.run() blocks until consumer sends 'consumer-stopped' event.
+        self.consumer.run()
+
+        aborted = (self.running == False)
+        self.running = False
+        self.stopped_event.set()
+        progress_thread.join()
+
+        if aborted == False:
+            self.callback(self.frame_producer.frame() - mark_in)
+
+    def _progress_updates(self):
+        while self.stopped_event.wait(FRAMES_WRITE_UPDATE_INTERVAL) == False:
+            if self.running == False:
+                return
+            self.callback(self.frame_producer.frame()) # This is wrong for container clips but we fix it there not break G'mic tool, lazy yeah...
     
     def shutdown(self):
         if self.running == False:
             return
 
+        self.running = False
         self.consumer.stop()
         self.frame_producer.set_speed(0)
-        self.running = False
 
 
 class FolderFramesInfo:
@@ -392,7 +418,7 @@ class FolderFramesInfo:
 class FolderFramesScriptRenderer:
 
     def __init__(   self, user_script, folder, out_folder, frame_name, update_callback, 
-                    render_output_callback, nice=0, re_render_existing=True, out_frame_offset=0):
+                    render_output_callback, nice=0, re_render_existing=True, out_frame_offset=0, workers_count=None):
         self.user_script = user_script
         self.folder = folder
         self.out_folder = out_folder
@@ -402,27 +428,29 @@ class FolderFramesScriptRenderer:
         self.nice = nice # Not used currently, but if we find a way to set this it is good to have it here available, so keeping this for now.
         self.re_render_existing = re_render_existing
         self.out_frame_offset = out_frame_offset
+        if workers_count == None:
+            workers_count = get_default_workers_count()
+        self.workers_count = max(1, workers_count)
+
+        self.running_processes = set()
+        self.processes_lock = threading.Lock()
 
         self.abort = False
 
     def write_frames(self):
-        clip_frames = os.listdir(self.folder)
+        # Frames are rendered in file name order so that progress moves from start to end.
+        clip_frames = sorted(os.listdir(self.folder))
 
         frame_count = 1
+        render_commands = []
         for clip_frame in clip_frames:
-
-            if self.abort == True:
-                return
-            
-            self.do_update_callback(frame_count)
-
             file_numbers_list = re.findall(r'\d+', clip_frame)
             filled_number_str = str(int(file_numbers_list[0]) + self.out_frame_offset).zfill(4)
 
             clip_frame_path = str(os.path.join(self.folder, clip_frame))
             rendered_file_path = str(self.out_folder + self.frame_name + "_" + filled_number_str + ".png")
             
-            # Create command list and launch process.
+            # Create command list.
             command_list = [editorstate.gmic_path, clip_frame_path]
             user_script_commands = self.user_script.split(" ")
             command_list.extend(user_script_commands)
@@ -434,26 +462,80 @@ class FolderFramesScriptRenderer:
                     frame_count = frame_count + 1
                     continue
 
-            if frame_count == 1: # first frame displays shell output and does error checking
-                FLOG = open(userfolders.get_cache_dir() + "log_gmic_preview", 'w')
-                p = subprocess.Popen(command_list, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-                p.wait()
-                FLOG.close()
- 
-                # read log
-                f = open(userfolders.get_cache_dir() + "log_gmic_preview", 'r')
-                out = f.read()
-                f.close()
-
-                self.do_render_output_callback(p, out)
-            else:
-                FLOG = open(userfolders.get_cache_dir() + "log_gmic_preview", 'w')
-                p = subprocess.Popen(command_list, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-                p.wait()
-                FLOG.close()
+            render_commands.append(command_list)
+
+        if len(render_commands) == 0 or self.abort == True:
+            return
+
+        self.do_update_callback(frame_count)
+        if frame_count == 1: # first frame displays shell output and does error checking
+            FLOG = open(userfolders.get_cache_dir() + "log_gmic_preview", 'w')
+            p = subprocess.Popen(render_commands.pop(0), stdin=FLOG, stdout=FLOG, stderr=FLOG)
+            p.wait()
+            FLOG.close()
+
+            # read log
+            f = open(userfolders.get_cache_dir() + "log_gmic_preview", 'r')
+            out = f.read()
+            f.close()
+
+            self.do_render_output_callback(p, out)
+            frame_count = frame_count + 1
+
+        # Rest of the frames are rendered with concurrent gmic processes.
+        commands_queue = queue.Queue()
+        for command_list in render_commands:
+            commands_queue.put(command_list)
+        done_queue = queue.Queue()
+
+        workers = []
+        for i in range(0, min(self.workers_count, len(render_commands))):
+            worker = threading.Thread(target=self._render_worker, args=(commands_queue, done_queue))
+            workers.append(worker)
+            worker.start()
+
+        workers_running = len(workers)
+        while workers_running > 0:
+            returncode = done_queue.get()
+            if returncode == None: # Worker exited.
+                workers_running -= 1
+                continue
+
+            if self.abort == True:
+                self._stop_running_processes()
+                continue
 
+            self.do_update_callback(frame_count)
             frame_count = frame_count + 1
 
+        for worker in workers:
+            worker.join()
+
+    def _render_worker(self, commands_queue, done_queue):
+        try:
+            while self.abort == False:
+                try:
+                    command_list = commands_queue.get_nowait()
+                except queue.Empty:
+                    return
+
+                p = subprocess.Popen(command_list, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                with self.processes_lock:
+                    self.running_processes.add(p)
+                p.wait()
+                with self.processes_lock:
+                    self.running_processes.discard(p)
+
+                done_queue.put(p.returncode)
+        finally:
+            done_queue.put(None)
+
+    def _stop_running_processes(self):
+        with self.processes_lock:
+            for p in self.running_processes:
+                if p.poll() == None:
+                    p.kill()
+
     def do_update_callback(self, frame_count):
         self.update_callback(frame_count)
 
@@ -462,6 +544,181 @@ class FolderFramesScriptRenderer:
 
     def abort_rendering(self):
         self.abort = True
+        self._stop_running_processes()
+
+
+class StreamFramesScriptRenderer(FolderFramesScriptRenderer):
+    """
+    Renders G'MIC script for a range of clip frames without writing any image files.
+
+    Frames are read from MLT producer and piped to gmic processes as PPM images, rendered
+    frames are read from gmic stdout and given to encoder in frame order.
+    """
+    def __init__(   self, user_script, clip_path, profile, mark_in, mark_out, encoder, update_callback, 
+                    render_output_callback, workers_count=None):
+        FolderFramesScriptRenderer.__init__(self, user_script, None, None, None, update_callback, render_output_callback, 
+                                            workers_count=workers_count)
+        self.clip_path = clip_path
+        self.profile = profile
+        self.mark_in = mark_in
+        self.mark_out = mark_out
+        self.encoder = encoder # rawvideoencoder.PPMStreamEncoder
+        self.producer = None
+        self.stream_failed = False
+
+    def write_frames(self):
+        """
+        Returns True if all frames were rendered and given to encoder. 
+        
+        If rendering was aborted or failed False is returned. Failures set self.stream_failed True
+        and script needs to be rendered using frame folders.
+        """
+        self.producer = mlt.Producer(self.profile, str(self.clip_path))
+
+        # First frame displays shell output and does error checking.
+        frame_count = 1
+        self.do_update_callback(frame_count)
+        try:
+            p, out, err = self._render_frame(self._get_ppm_frame(self.mark_in))
+        except Exception as e:
+            print("G'MIC render failed for first frame:", e)
+            self.stream_failed = True
+            return False
+        self.do_render_output_callback(p, err.decode("utf-8", "replace"))
+        if p.returncode != 0 or len(out) == 0:
+            self.stream_failed = True
+            return False
+        if self.encoder.write_frame(out) == False:
+            print("Encoding G'MIC frames failed:", self.encoder.error_msg)
+            self.stream_failed = True
+            return False
+
+        # Rest of the frames are read in one thread and rendered with concurrent gmic processes.
+        frames_queue = queue.Queue(self.workers_count * STREAM_QUEUE_FRAMES_PER_WORKER)
+        done_queue = queue.Queue()
+        reader = threading.Thread(target=self._frames_reader, args=(frames_queue, ))
+        reader.start()
+
+        workers = []
+        for i in range(0, self.workers_count):
+            worker = threading.Thread(target=self._stream_render_worker, args=(frames_queue, done_queue))
+            workers.append(worker)
+            worker.start()
+
+        rendered_frames = {}
+        next_frame = self.mark_in + 1
+        workers_running = len(workers)
+        while workers_running > 0:
+            msg = done_queue.get()
+            if msg == None: # Worker exited.
+                workers_running -= 1
+                continue
+
+            if self.abort == True:
+                continue
+
+            frame, returncode, out = msg
+            if returncode != 0:
+                print("G'MIC render failed for frame", frame, "return code", returncode)
+                self.stream_failed = True
+                self.abort_rendering()
+                continue
+
+            rendered_frames[frame] = out
+            while next_frame in rendered_frames:
+                if self.encoder.write_frame(rendered_frames.pop(next_frame)) == False:
+                    print("Encoding G'MIC frames failed:", self.encoder.error_msg)
+                    self.stream_failed = True
+                    self.abort_rendering()
+                    break
+                frame_count = frame_count + 1
+                self.do_update_callback(frame_count)
+                next_frame += 1
+
+        reader.join()
+        for worker in workers:
+            worker.join()
+
+        return self.abort == False
+
+    def _frames_reader(self, frames_queue):
+        try:
+            for frame in range(self.mark_in + 1, self.mark_out + 1):
+                if self.abort == True:
+                    break
+                frames_queue.put((frame, self._get_ppm_frame(frame)))
+        except Exception as e:
+            print("Reading frames for G'MIC failed:", e)
+            self.stream_failed = True
+            self.abort_rendering()
+        finally:
+            for i in range(0, self.workers_count):
+                frames_queue.put(None) # Tells worker that there are no more frames.
+
+    def _stream_render_worker(self, frames_queue, done_queue):
+        try:
+            while True:
+                item = frames_queue.get()
+                if item == None:
+                    return
+                if self.abort == True:
+                    continue # Frames reader needs queue to be emptied to exit.
+
+                frame, ppm_frame = item
+                try:
+                    p, out, err = self._render_frame(ppm_frame)
+                    returncode = p.returncode
+                except Exception as e:
+                    # Reported as failed frame, worker keeps emptying queue until it gets exit message.
+                    print("G'MIC render failed for frame", frame, e)
+                    returncode = -1
+                    out = None
+                done_queue.put((frame, returncode, out))
+        finally:
+            done_queue.put(None)
+
+    def _render_frame(self, ppm_frame):
+        command_list = [editorstate.gmic_path, "-.ppm"]
+        command_list.extend(self.user_script.split(" "))
+        command_list.append("-output")
+        command_list.append("-.ppm")
+
+        p = subprocess.Popen(command_list, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with self.processes_lock:
+            self.running_processes.add(p)
+        out, err = p.communicate(ppm_frame)
+        with self.processes_lock:
+            self.running_processes.discard(p)
+
+        return (p, out, err)
+
+    def _get_ppm_frame(self, frame):
+        w = self.profile.width()
+        h = self.profile.height()
+        self.producer.seek(frame)
+        mlt_frame = self.producer.get_frame()
+        mlt_frame.set("consumer_deinterlace", 1)
+        mlt_frame.set("rescale.interp", "bicubic")
+        rgb = mlt_frame.get_image(MLT_IMAGE_RGB, w, h)
+        return ("P6\n" + str(w) + " " + str(h) + "\n255\n").encode("ascii") + bytes(rgb)
+
+
+def script_can_stream(user_script):
+    # Scripts that read or write files of their own need frame folders.
+    for token in user_script.split():
+        if token.lstrip("-+") in GMIC_FILE_COMMANDS:
+            return False
+    return True
+
+
+def get_default_workers_count():
+    # Leave one core for producing and encoding frames.
+    workers_count = (os.cpu_count() or 1) - 1
+    if workers_count < 1:
+        workers_count = 1
+    if workers_count > MAX_DEFAULT_GMIC_WORKERS:
+        workers_count = MAX_DEFAULT_GMIC_WORKERS
+    return workers_count
 
 
 # ---- Debug helper
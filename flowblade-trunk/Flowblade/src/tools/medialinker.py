@@ -644,6 +644,7 @@ def _relink_project_media_paths():
             continue
         if media_file.path in relinked_paths:
             media_file.path = relinked_paths[media_file.path]
+    projectdata.media_paths_changed()
 
     for seq in target_project.sequences:
 
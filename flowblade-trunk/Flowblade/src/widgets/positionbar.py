@@ -478,11 +478,12 @@ class ClipWaveformArea:
         cr.rectangle(0,0,w,h)
         cr.fill()
 
-        if clip.is_blanck_clip == False and clip.waveform_data == None and editorstate.display_all_audio_levels == True \
+        waveform_data = None
+        if clip.is_blanck_clip == False and editorstate.display_all_audio_levels == True \
             and clip.media_type != appconsts.IMAGE and clip.media_type != appconsts.IMAGE_SEQUENCE and clip.media_type != appconsts.PATTERN_PRODUCER:
-            clip.waveform_data = audiowaveformrenderer.get_waveform_data(clip)
+            waveform_data = audiowaveformrenderer.get_waveform_data(clip)
         
-        if  clip.waveform_data != None: 
+        if  waveform_data != None: 
             r, g, b = WAVEFORM_AREA_BG_COLOR
             cr.set_source_rgb(r * 1.9, g * 1.9, b * 1.9)
 
@@ -513,7 +514,7 @@ class ClipWaveformArea:
                 try:
                     x = media_start_pos_pix + f * pix_per_frame
                     
-                    wh = bar_height * clip.waveform_data[f]
+                    wh = bar_height * waveform_data[f]
                     if wh < 1:
                         wh = 1
                     cr.rectangle(x, y_pad + (bar_height - wh), draw_pix_per_frame, wh)
@@ -44,8 +44,10 @@ from editorstate import PROJECT
 from editorstate import EDIT_MODE
 from editorstate import current_proxy_media_paths
 import editorstate
+import filmstrip
 import gui
 import guiutils
+import memorycache
 import respaths
 import snapping
 import utils
@@ -339,9 +341,6 @@ fake_current_frame = None
 # Used to draw indicators that tell if more frames are available while trimming.
 trim_status = appconsts.ON_BETWEEN_FRAME
 
-# Dict for clip thumbnails path -> image.
-clip_thumbnails = {}
-
 
 
 # ------------------------------------------------------------------- module functions
@@ -419,9 +418,10 @@ def load_icons_and_set_colors():
     COLUMN_ACTIVE_COLOR = gui.get_accent_color(theme, system_accent_color)
 
 def update_clip_thumbnail(media_file):
-    global clip_thumbnails
+    _cache_clip_thumbnail(media_file.path, media_file.icon)
 
-    clip_thumbnails[media_file.path] = media_file.icon
+def _cache_clip_thumbnail(path, thumb_img):
+    memorycache.get_cache().put((memorycache.CLIP_THUMBNAIL, path), thumb_img, memorycache.get_surface_size_bytes(thumb_img))
 
 def set_tracks_height_consts():
     global ID_PAD_Y_HIGH, ID_PAD_Y, ID_PAD_Y_SMALL, MUTE_ICON_POS, MUTE_ICON_POS_NORMAL, \
@@ -1870,8 +1870,8 @@ class TimeLineCanvas:
 
         proxy_paths = current_proxy_media_paths()
 
-        global clip_thumbnails
-                
+        thumbnails_cache = memorycache.get_cache()
+
         # Draw clips in draw range
         for i in range(start, end):
 
@@ -2058,55 +2058,66 @@ class TimeLineCanvas:
                         
                     text_x_add = 115
                     cr.save()
-                    try: # paint thumbnail
-                        thumb_img = clip_thumbnails[clip.path]
+                    # Video clips display filmstrip when it is available, others and
+                    # video clips waiting for filmstrip display media icon.
+                    clip_filmstrip = None
+                    if clip.media_type == appconsts.VIDEO and clip.container_data == None and clip.slowmo_data == None:
+                        clip_filmstrip = filmstrip.get_filmstrip(clip.path)
+                    
+                    if clip_filmstrip != None:
                         self.create_round_rect_path(cr, scale_in + 5, y + 4.5, scale_length - 10, track_height - 8, 3.0)
                         cr.clip()
-                        cr.set_source_surface(thumb_img,scale_in, y - 20)
-                        cr.paint()
-                    except: # thumbnail not found  in dict, get it and  paint it.
-                        try:
-                            if clip.container_data == None:
-                                if clip.slowmo_data == None:
-                                    # normal clip
-                                    media_file = PROJECT().get_media_file_for_path(clip.path)
-                                    thumb_img = media_file.icon
-                                else:
-                                    # slowmo clip
-                                    slowmo_type, orig_media_file_path, \
-                                    slowmo_clip_media_area, slowmo_speed_data,\
-                                    orig_media_in, orig_media_out = clip.slowmo_data
-                                    media_file = PROJECT().get_media_file_for_path(orig_media_file_path)
-                                    if media_file != None:
+                        clip_filmstrip.draw(cr, scale_in, y - 20, clip_in, pix_per_frame, clip.get_length(), scale_in + scale_length, width)
+                    else:
+                        try: # paint thumbnail
+                            thumb_img = thumbnails_cache[(memorycache.CLIP_THUMBNAIL, clip.path)]
+                            self.create_round_rect_path(cr, scale_in + 5, y + 4.5, scale_length - 10, track_height - 8, 3.0)
+                            cr.clip()
+                            cr.set_source_surface(thumb_img,scale_in, y - 20)
+                            cr.paint()
+                        except: # thumbnail not found  in dict, get it and  paint it.
+                            try:
+                                if clip.container_data == None:
+                                    if clip.slowmo_data == None:
+                                        # normal clip
+                                        media_file = PROJECT().get_media_file_for_path(clip.path)
                                         thumb_img = media_file.icon
                                     else:
-                                        # Original media file not present and we don't want to start rendering, 
-                                        # so we'll just use a default slowmo icon.
-                                        icon = cairo.ImageSurface.create_from_png(respaths.IMAGE_PATH + "slowmo.png")
-                                        scaled_icon = cairo.ImageSurface(cairo.FORMAT_ARGB32, appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT)
-                                        cr2 = cairo.Context(scaled_icon)
-                                        cr2.scale(float(appconsts.THUMB_WIDTH) / float(icon.get_width()), float(appconsts.THUMB_HEIGHT) / float(icon.get_height()))
-                                        cr2.set_source_surface(icon, 0, 0)
-                                        cr2.paint()
-                                        thumb_img = scaled_icon
+                                        # slowmo clip
+                                        slowmo_type, orig_media_file_path, \
+                                        slowmo_clip_media_area, slowmo_speed_data,\
+                                        orig_media_in, orig_media_out = clip.slowmo_data
+                                        media_file = PROJECT().get_media_file_for_path(orig_media_file_path)
+                                        if media_file != None:
+                                            thumb_img = media_file.icon
+                                        else:
+                                            # Original media file not present and we don't want to start rendering, 
+                                            # so we'll just use a default slowmo icon.
+                                            icon = cairo.ImageSurface.create_from_png(respaths.IMAGE_PATH + "slowmo.png")
+                                            scaled_icon = cairo.ImageSurface(cairo.FORMAT_ARGB32, appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT)
+                                            cr2 = cairo.Context(scaled_icon)
+                                            cr2.scale(float(appconsts.THUMB_WIDTH) / float(icon.get_width()), float(appconsts.THUMB_HEIGHT) / float(icon.get_height()))
+                                            cr2.set_source_surface(icon, 0, 0)
+                                            cr2.paint()
+                                            thumb_img = scaled_icon
                                                 
-                            else:
-                                media_file = PROJECT().get_media_file_for_path(clip.path)
-                                if media_file != None:
-                                    thumb_img = media_file.icon
                                 else:
-                                    thumb_img = clip.container_data.get_rendered_thumbnail()
-
-                            cr.rectangle(scale_in + 4, y + 3.5, scale_length - 8, track_height - 6)
-                            cr.clip()
-                            cr.set_source_surface(thumb_img, scale_in, y - 20)
-                            cr.paint()
-                            clip_thumbnails[clip.path] = thumb_img
-                        except:
-                            pass # This fails for rendered fades and transitions.
+                                    media_file = PROJECT().get_media_file_for_path(clip.path)
+                                    if media_file != None:
+                                        thumb_img = media_file.icon
+                                    else:
+                                        thumb_img = clip.container_data.get_rendered_thumbnail()
+
+                                cr.rectangle(scale_in + 4, y + 3.5, scale_length - 8, track_height - 6)
+                                cr.clip()
+                                cr.set_source_surface(thumb_img, scale_in, y - 20)
+                                cr.paint()
+                                _cache_clip_thumbnail(clip.path, thumb_img)
+                            except:
+                                pass # This fails for rendered fades and transitions.
                     
                     if clip.selected:
-                        if scale_length - 8 < appconsts.THUMB_WIDTH:
+                        if scale_length - 8 < appconsts.THUMB_WIDTH or clip_filmstrip != None:
                             ow = scale_length - 8 
                         else:
                             ow = appconsts.THUMB_WIDTH
@@ -2118,11 +2129,12 @@ class TimeLineCanvas:
 
             # Draw audio levels data if needed.
             # Init data rendering if data needed and not available.
-            if clip.is_blanck_clip == False and clip.waveform_data == None and editorstate.display_all_audio_levels == True \
+            waveform_data = None
+            if clip.is_blanck_clip == False and editorstate.display_all_audio_levels == True \
                 and clip.media_type != appconsts.IMAGE and clip.media_type != appconsts.IMAGE_SEQUENCE and clip.media_type != appconsts.PATTERN_PRODUCER:
-                clip.waveform_data = audiowaveformrenderer.get_waveform_data(clip)
+                waveform_data = audiowaveformrenderer.get_waveform_data(clip)
             # Draw data if available large enough scale
-            if clip.is_blanck_clip == False and clip.waveform_data != None and scale_length > FILL_MIN and editorstate.display_all_audio_levels == True:
+            if clip.is_blanck_clip == False and waveform_data != None and scale_length > FILL_MIN and editorstate.display_all_audio_levels == True:
                 r, g, b = clip_bg_col
                 cr.set_source_rgb(r * 1.9, g * 1.9, b * 1.9)
                 
@@ -2142,17 +2154,6 @@ class TimeLineCanvas:
                     y_pad = WAVEFORM_PAD_SMALL
                     bar_height = WAVEFORM_HEIGHT_SMALL
                 
-                # Draw all frames only if pixels per frame > 2, otherwise.
-                # draw only every other or fewer frames.
-                draw_pix_per_frame = pix_per_frame
-                if draw_pix_per_frame < 2:
-                    draw_pix_per_frame = 2
-                    step = int(2 // pix_per_frame)
-                    if step < 1:
-                        step = 1
-                else:
-                    step = 1
-
                 # Draw only frames in display.
                 draw_first = clip_in
                 draw_last = clip_out + 1
@@ -2163,18 +2164,27 @@ class TimeLineCanvas:
 
                 # Get media frame 0 position in screen pixels.
                 media_start_pos_pix = scale_in - clip_in * pix_per_frame
-                
-                # Draw level bar for each frame in draw range.
-                for f in range(draw_first, draw_last, step):
-                    try:
-                        x = media_start_pos_pix + f * pix_per_frame
-                        h = bar_height * clip.waveform_data[f]
-                        if h < 1:
-                            h = 1
-                        cr.rectangle(x, y + y_pad + (bar_height - h), draw_pix_per_frame, h)
-                    except:
-                        # This is just dirty fix a when 23.98 fps does not work.
-                        break
+
+                # Use levels data resolution that has about one value per pixel
+                # and draw all levels as a single path.
+                mip_level = waveform_data.get_mip_level(1.0 / pix_per_frame)
+                bin_frames = mip_level.bin_frames
+                bin_width = bin_frames * pix_per_frame
+                first_bin = draw_first // bin_frames
+                last_bin = min((draw_last - 1) // bin_frames + 1, len(mip_level))
+                base_y = y + y_pad + bar_height
+
+                x = media_start_pos_pix + first_bin * bin_width
+                cr.move_to(x, base_y)
+                for b in range(first_bin, last_bin):
+                    x = media_start_pos_pix + b * bin_width
+                    h = bar_height * mip_level.get_max(b)
+                    if h < 1:
+                        h = 1
+                    cr.line_to(x, base_y - h)
+                    cr.line_to(x + bin_width, base_y - h)
+                cr.line_to(x + bin_width, base_y)
+                cr.close_path()
 
                 cr.fill()
                 cr.restore()
@@ -2286,7 +2296,7 @@ class TimeLineCanvas:
                         cr.move_to(scale_in + TEXT_X + centering, y + track_height - 3)
                         cr.show_text(str(clip.sync_diff))
 
-            if clip.waveform_data == None and editorstate.display_all_audio_levels == True and scale_length > FILL_MIN:
+            if waveform_data == None and editorstate.display_all_audio_levels == True and scale_length > FILL_MIN:
                 if clip.media_type != appconsts.IMAGE and clip.media_type != appconsts.IMAGE_SEQUENCE and clip.media_type != appconsts.PATTERN_PRODUCER:
                     cr.set_source_surface(LEVELS_RENDER_ICON, int(scale_in) + 4, y + 8)
                     cr.paint()